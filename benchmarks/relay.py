@@ -0,0 +1,81 @@
+"""
+Relay engines throughput benchmark.
+
+Pushes a payload through ``TcpTransport`` to a local echo server and reads it back
+for every relay mode::
+
+    python benchmarks/relay.py --size 256 --modes stream pump protocol splice
+"""
+
+import argparse
+import asyncio
+import time
+from ipaddress import IPv4Address
+
+import soxy
+
+_CHUNK = b'\x00' * 65536
+
+
+async def _echo_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while data := await reader.read(65536):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def _measure(relay: str, size: int) -> float:
+    echo_server = await asyncio.start_server(_echo_handler, '127.0.0.1', 0)
+    echo_port = echo_server.sockets[0].getsockname()[1]
+
+    async def on_client_connected(_: soxy.Connection) -> list[soxy.Address]:
+        return [soxy.Address(ip=IPv4Address('127.0.0.1'), port=echo_port)]
+
+    async def start_messaging(_: soxy.Connection, __: soxy.Connection) -> None:
+        pass
+
+    async def on_remote_unreachable(_: soxy.Connection, __: soxy.Address) -> None:
+        pass
+
+    transport = soxy.TcpTransport(port=0, relay=relay)
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    async with transport as server:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+        async def send() -> None:
+            for _ in range(size // len(_CHUNK)):
+                writer.write(_CHUNK)
+                await writer.drain()
+
+        started = time.perf_counter()
+        sender = asyncio.create_task(send())
+        received = 0
+        while received < size:
+            received += len(await reader.read(1 << 20))
+        elapsed = time.perf_counter() - started
+        await sender
+        writer.close()
+        await writer.wait_closed()
+        # let the proxy notice the EOF and close the remote side
+        await asyncio.sleep(0.1)
+    echo_server.close()
+    await echo_server.wait_closed()
+    return elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256, help='payload size in MiB')
+    parser.add_argument(
+        '--modes', nargs='+', default=['stream', 'pump', 'protocol', 'splice'], help='relay modes to compare'
+    )
+    args = parser.parse_args()
+    size = args.size << 20
+    for relay in args.modes:
+        elapsed = await _measure(relay, size)
+        print(f'{relay:>10}: {args.size / elapsed:10.1f} MiB/s ({elapsed:.2f}s)')  # noqa: T201
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Ruleset lookup benchmark.
+
+Compares a linear pass over proxying rules, as ``Ruleset`` used to do, with the
+compiled prefix tries and the decision cache for repeated flows for growing numbers
+of rules, then measures domain checks against growing blocklists of ``*.domain`` patterns::
+
+    python benchmarks/ruleset.py --rules 10 1000 100000 --domains 10 1000000 --lookups 20000
+"""
+
+import argparse
+import logging
+import random
+import time
+from ipaddress import IPv4Address, IPv4Network
+from unittest.mock import Mock
+
+import soxy
+
+
+def _make_rules(count: int, rng: random.Random) -> list[soxy.ProxyingRule]:
+    return [
+        soxy.ProxyingRule(
+            from_addresses=IPv4Network((rng.getrandbits(32) >> 8 << 8, 24)),
+            to_addresses=IPv4Network((rng.getrandbits(32) >> 16 << 16, 16)),
+        )
+        for _ in range(count)
+    ]
+
+
+def _make_requests(count: int, rng: random.Random) -> list[tuple[soxy.Connection, soxy.Address]]:
+    requests = []
+    for _ in range(count):
+        client = Mock(spec=soxy.Connection)
+        client.address = soxy.Address(ip=IPv4Address(rng.getrandbits(32)), port=12345)
+        requests.append((client, soxy.Address(ip=IPv4Address(rng.getrandbits(32)), port=443)))
+    return requests
+
+
+def _measure(rules_count: int, lookups: int) -> tuple[float, float, float, float]:
+    rng = random.Random(rules_count)
+    rules = _make_rules(rules_count, rng)
+    requests = _make_requests(lookups, rng)
+
+    started = time.perf_counter()
+    ruleset = soxy.Ruleset(allow_connecting_rules=[], allow_proxying_rules=rules)
+    compile_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for client, destination in requests:
+        any(rule(client, destination, None) for rule in rules)
+    linear = (time.perf_counter() - started) / lookups
+
+    started = time.perf_counter()
+    for client, destination in requests:
+        ruleset.should_allow_proxying(client, destination, None)
+    compiled = (time.perf_counter() - started) / lookups
+
+    ruleset = soxy.Ruleset(allow_connecting_rules=[], allow_proxying_rules=rules, decision_cache_size=lookups)
+    for client, destination in requests:
+        ruleset.should_allow_proxying(client, destination, None)
+    started = time.perf_counter()
+    for client, destination in requests:
+        ruleset.should_allow_proxying(client, destination, None)
+    cached = (time.perf_counter() - started) / lookups
+    return compile_time, linear, compiled, cached
+
+
+def _measure_domains(domains_count: int, lookups: int) -> float:
+    rng = random.Random(domains_count)
+    ruleset = soxy.Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[],
+        block_proxying_rules=[
+            soxy.ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=f'*.blocked{index}.com')
+            for index in range(domains_count)
+        ],
+    )
+    client = Mock(spec=soxy.Connection)
+    client.address = soxy.Address(ip=IPv4Address('127.0.0.1'), port=12345)
+    names = [f'cdn.www.blocked{rng.randrange(domains_count * 2)}.com' for _ in range(lookups)]
+    started = time.perf_counter()
+    for name in names:
+        ruleset.should_allow_domain(client, name)
+    return (time.perf_counter() - started) / lookups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--domains', type=int, nargs='+', default=[10, 1000000])
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    for rules_count in args.rules:
+        # the linear pass is slow for big lists, fewer lookups keep the run short
+        lookups = max(100, min(args.lookups, args.lookups * 1000 // rules_count))
+        compile_time, linear, compiled, cached = _measure(rules_count, lookups)
+        print(
+            f'{rules_count:>8} rules: linear {linear * 1e6:>10.2f} us, compiled {compiled * 1e6:>6.2f} us, '
+            f'x{linear / compiled:.0f} (compile {compile_time:.2f}s), cached {cached * 1e6:.2f} us',
+        )
+    for domains_count in args.domains:
+        print(f'{domains_count:>8} domain patterns: {_measure_domains(domains_count, args.lookups) * 1e6:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Event loop threads benchmark.
+
+Serves SOCKS5 from one event loop, then from several loops in threads of the same process
+sharing the ruleset, and counts how many CONNECT requests with a short echo exchange the
+proxy completes per second. Clients and the echo server run in separate processes, so the
+proxy process only runs the proxy::
+
+    python benchmarks/threads.py --threads 1 2 4 8 --clients 4 --duration 5
+
+Loop threads run in parallel only on free-threaded builds (``python3.14t``), with the GIL
+they share one core and the numbers show the cost of the extra loops.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import socket
+import struct
+import sys
+import time
+from ipaddress import IPv4Network
+
+import soxy
+from soxy._workers import LoopThread
+
+_CONCURRENCY = 64
+_PAYLOAD = b'x' * 64
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def _echo_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while data := await reader.read(65536):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def _serve_echo(port: int) -> None:
+    server = await asyncio.start_server(_echo_handler, '127.0.0.1', port, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+def _run_echo(port: int) -> None:
+    asyncio.run(_serve_echo(port))
+
+
+async def _request(proxy_port: int, echo_port: int) -> None:
+    reader, writer = await asyncio.open_connection('127.0.0.1', proxy_port)
+    try:
+        writer.write(b'\x05\x01\x00')
+        await reader.readexactly(2)
+        writer.write(b'\x05\x01\x00\x01' + socket.inet_aton('127.0.0.1') + struct.pack('!H', echo_port))
+        await reader.readexactly(10)
+        writer.write(_PAYLOAD)
+        await reader.readexactly(len(_PAYLOAD))
+    finally:
+        writer.close()
+
+
+async def _load(proxy_port: int, echo_port: int, duration: float) -> int:
+    deadline = time.monotonic() + duration
+    done = 0
+
+    async def client() -> None:
+        nonlocal done
+        while time.monotonic() < deadline:
+            try:
+                await _request(proxy_port, echo_port)
+            except (OSError, asyncio.IncompleteReadError):
+                continue
+            done += 1
+
+    await asyncio.gather(*(client() for _ in range(_CONCURRENCY)))
+    return done
+
+
+def _run_clients(proxy_port: int, echo_port: int, duration: float, results: multiprocessing.Queue) -> None:
+    results.put(asyncio.run(_load(proxy_port, echo_port, duration)))
+
+
+def _make_ruleset(rules: int) -> soxy.Ruleset:
+    everything = IPv4Network('0.0.0.0/0')
+    return soxy.Ruleset(
+        allow_connecting_rules=[soxy.ConnectingRule(from_addresses=IPv4Network('127.0.0.0/8'))],
+        allow_proxying_rules=[soxy.ProxyingRule(from_addresses=everything, to_addresses=everything)],
+        block_proxying_rules=[
+            soxy.ProxyingRule(from_addresses=everything, to_addresses=f'*.blocked{index}.com') for index in range(rules)
+        ],
+    )
+
+
+def _measure(threads: int, ruleset: soxy.Ruleset, echo_port: int, clients: int, duration: float) -> float:
+    port = _free_port()
+    loops = [
+        LoopThread(
+            soxy.Proxy(
+                protocol=soxy.Socks5(),
+                transport=soxy.TcpTransport(port=port, reuse_port=True),
+                ruleset=ruleset,
+            ),
+        )
+        for _ in range(threads)
+    ]
+    for loop in loops:
+        loop.start()
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_run_clients, args=(port, echo_port, duration, results)) for _ in range(clients)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        requests = sum(results.get() for _ in processes)
+    finally:
+        for process in processes:
+            process.join()
+        # let the proxy notice the last EOFs and close the remote sides
+        time.sleep(0.5)
+        for loop in loops:
+            loop.stop()
+    return requests / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help='numbers of loop threads')
+    parser.add_argument('--clients', type=int, default=2, help='client processes')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per measurement')
+    parser.add_argument('--rules', type=int, default=100000, help='blocked domain patterns of the shared ruleset')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'GIL {"enabled" if gil else "disabled"}, {args.clients} client processes, {args.rules} rules')  # noqa: T201
+    ruleset = _make_ruleset(args.rules)
+    echo_port = _free_port()
+    echo = multiprocessing.Process(target=_run_echo, args=(echo_port,), daemon=True)
+    echo.start()
+    time.sleep(0.5)
+    try:
+        for threads in args.threads:
+            rate = _measure(threads, ruleset, echo_port, args.clients, args.duration)
+            print(f'{threads:>3} loop threads: {rate:10.0f} requests/s')  # noqa: T201
+    finally:
+        echo.terminate()
+
+
+if __name__ == '__main__':
+    main()
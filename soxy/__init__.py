@@ -1,4 +1,5 @@
 from soxy._config import Config
+from soxy._dns import DnsResolver
 from soxy._errors import (
     AuthorizationError,
     ConfigError,
@@ -7,9 +8,13 @@ from soxy._errors import (
     RejectError,
     ResolveDomainError,
 )
+from soxy._geoip import GeoIPDatabase, GeoIPSet
+from soxy._interpreters import interpreter_pool
 from soxy._logger import logger
 from soxy._proxy import Proxy
-from soxy._ruleset import ConnectingRule, ProxyingRule, Ruleset
+from soxy._ranges import IPRangeSet
+from soxy._resolvers import CachingResolver, ResolvedAddresses
+from soxy._ruleset import ConnectingRule, PortSet, ProxyingRule, Ruleset, UserRules
 from soxy._socks import Socks4, Socks5
 from soxy._tcp import TcpTransport
 from soxy._types import (
@@ -27,20 +32,29 @@ __license__ = 'GPL-3.0'
 __all__ = [
     'Address',
     'AuthorizationError',
+    'CachingResolver',
     'Config',
     'ConfigError',
     'ConnectingRule',
     'Connection',
+    'DnsResolver',
+    'GeoIPDatabase',
+    'GeoIPSet',
+    'IPRangeSet',
     'PackageError',
+    'PortSet',
     'ProtocolError',
     'Proxy',
     'ProxyingRule',
     'RejectError',
     'ResolveDomainError',
+    'ResolvedAddresses',
     'Resolver',
     'Ruleset',
     'Socks4',
     'Socks5',
     'TcpTransport',
+    'UserRules',
+    'interpreter_pool',
     'logger',
 ]
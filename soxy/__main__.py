@@ -1,11 +1,22 @@
 import argparse
 import asyncio
+import copy
 import logging
+import signal
+import socket
 import sys
+import time
+import typing
+from contextlib import suppress
 from pathlib import Path
 from tomllib import TOMLDecodeError
 
-from soxy import Config, ConfigError, Proxy, logger
+from soxy import Config, ConfigError, Proxy, Ruleset, logger
+from soxy._check import compile_ruleset, read_flows, replay
+from soxy._workers import LoopThread, Supervisor
+
+if typing.TYPE_CHECKING:
+    from soxy._types import ProxySocks
 
 
 def validate_config_path(config_path: Path) -> None:
@@ -22,24 +33,186 @@ def load_config(config_path: Path) -> Config:
         sys.exit(1)
 
 
-async def async_main(config: Config, logfile: str | None) -> None:
+def log_rule_hits(proxy: Proxy) -> None:
+    for name, rules in proxy.ruleset.rule_hits().items():
+        for rule, hits in rules:
+            logger.info(f'{name} {rule}: {hits} hits')
+
+
+def _load_reloadable(config_path: Path) -> tuple[ProxySocks, Ruleset]:
+    config = Config.from_path(config_path)
+    return config.socks, config.ruleset
+
+
+async def reload_config(proxy: Proxy, config_path: Path, loop_threads: typing.Sequence[LoopThread] = ()) -> None:
+    # big rulesets take a while to compile, the event loop keeps serving meanwhile
+    try:
+        protocol, ruleset = await asyncio.to_thread(_load_reloadable, config_path)
+        proxy.reload(protocol=protocol, ruleset=ruleset)
+    except (ConfigError, OSError) as exc:
+        logger.error(f'🥹: reload failed, keeping the current configuration: {exc}')
+        return
+    # proxies of other threads are reloaded by their own loops, every one with its own protocol
+    # sharing the authers and resolver caches of the new one
+    for thread in loop_threads:
+        thread.call_soon(thread.proxy.reload, copy.copy(protocol), ruleset)
+
+
+async def async_main(config: Config, logfile: str | None, config_path: Path | None = None, threads: int = 1) -> None:
     logging.basicConfig(
         level=logging.INFO,
         filename=logfile,
     )
-    async with Proxy.from_config(config) as app:
-        await app.serve_forever()
+    if threads > 1:
+        config = config.with_transport(reuse_port=True)
+        if getattr(sys, '_is_gil_enabled', lambda: True)():
+            logger.warning('the GIL is enabled, event loop threads will share one core')
+    proxy = Proxy.from_config(config)
+    # loops of other threads share the ruleset and the authers and resolver caches of the protocol
+    loop_threads = [
+        LoopThread(Proxy(protocol=copy.copy(proxy.protocol), transport=config.transport, ruleset=proxy.ruleset))
+        for _ in range(threads - 1)
+    ]
+    loop = asyncio.get_running_loop()
+    # the lock is fair, so reloads run one after another and the last signal wins
+    reload_lock = asyncio.Lock()
+    reloads: set[asyncio.Task[None]] = set()
+
+    async def reload() -> None:
+        async with reload_lock:
+            await reload_config(proxy, typing.cast('Path', config_path), loop_threads)
+
+    def on_sighup() -> None:
+        task = loop.create_task(reload())
+        reloads.add(task)
+        task.add_done_callback(reloads.discard)
+
+    # kill -USR1 <pid> logs how many checks every rule decided, kill -HUP <pid> reloads the configuration
+    with suppress(AttributeError, NotImplementedError):
+        loop.add_signal_handler(signal.SIGUSR1, log_rule_hits, proxy)
+        if config_path is not None:
+            loop.add_signal_handler(signal.SIGHUP, on_sighup)
+    started: list[LoopThread] = []
+    try:
+        async with proxy as app:
+            for thread in loop_threads:
+                await asyncio.to_thread(thread.start)
+                started.append(thread)
+            await app.serve_forever()
+    finally:
+        for thread in started:
+            thread.stop()
+        with suppress(AttributeError, NotImplementedError):
+            loop.remove_signal_handler(signal.SIGUSR1)
+            loop.remove_signal_handler(signal.SIGHUP)
+
+
+def _require_reuse_port() -> None:
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        logger.error('🥹: workers and threads need SO_REUSEPORT, which is not available on this platform')
+        sys.exit(1)
+
+
+def _run_proxy(config_path: Path, logfile: str | None, threads: int = 1) -> None:
+    validate_config_path(config_path)
+    if threads > 1:
+        _require_reuse_port()
+    config = load_config(config_path)
+    asyncio.run(async_main(config, logfile, config_path, threads))
+
+
+def _run_worker(config_path: Path, logfile: str | None, threads: int) -> None:
+    config = load_config(config_path).with_transport(reuse_port=True)
+    asyncio.run(async_main(config, logfile, config_path, threads))
+
+
+def _run_workers(config_path: Path, logfile: str | None, workers: int, threads: int = 1) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        filename=logfile,
+    )
+    validate_config_path(config_path)
+    _require_reuse_port()
+    try:
+        # every worker binds the same address, the kernel spreads connections between them
+        load_config(config_path).with_transport(reuse_port=True).transport  # noqa: B018
+    except ConfigError as exc:
+        logger.error(f'🥹: {exc}')
+        sys.exit(1)
+    Supervisor(target=_run_worker, args=(config_path, logfile, threads), workers=workers).run()
 
 
-def _run_proxy(config_path: Path, logfile: str | None) -> None:
+def check_config(config_path: Path, flows_path: Path | None, *, quiet: bool = False) -> None:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     validate_config_path(config_path)
     config = load_config(config_path)
-    asyncio.run(async_main(config, logfile))
+    try:
+        compiled = compile_ruleset(config)
+        flows = read_flows(flows_path) if flows_path is not None else []
+    except (ConfigError, OSError, ValueError) as exc:
+        logger.error(f'🥹: {exc}')
+        sys.exit(1)
+    logger.info(
+        f'ruleset compiled in {compiled.seconds:.3f}s, {compiled.memory / 2**20:.1f} MiB Python heap, '
+        f'{compiled.mapped / 2**20:.1f} MiB mapped range files',
+    )
+    for name, rules in compiled.ruleset.rule_hits().items():
+        logger.info(f'{name}: {len(rules)} rules')
+    if flows_path is None:
+        return
+    # decisions are logged by the ruleset, which would measure the logging instead of the rules
+    logging.disable(logging.INFO)
+    try:
+        started = time.perf_counter()
+        decisions = replay(compiled.ruleset, flows)
+        seconds = time.perf_counter() - started
+    finally:
+        logging.disable(logging.NOTSET)
+    if not quiet:
+        sys.stdout.writelines(
+            f'{"ALLOWED" if allowed else "BLOCKED"} {flow}\n' for flow, allowed in zip(flows, decisions, strict=True)
+        )
+    allowed_count = sum(decisions)
+    logger.info(
+        f'{len(flows)} flows: {allowed_count} allowed, {len(flows) - allowed_count} blocked, '
+        f'{len(flows) / seconds if seconds else 0:.0f} evaluations per second',
+    )
+
+
+def _check_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog='soxy check',
+        description='Compile the ruleset of the configuration file and replay flows through it.',
+    )
+    parser.add_argument(
+        'config',
+        type=Path,
+        help='Path to configuration file',
+    )
+    parser.add_argument(
+        '--flows',
+        '-f',
+        type=Path,
+        default=None,
+        help='File of "[user@]client destination [domain]" lines to decide, e.g. "10.0.0.5 1.1.1.1:443 one.one".',
+    )
+    parser.add_argument(
+        '--quiet',
+        '-q',
+        action='store_true',
+        help='Report counts and the evaluation rate only, without a decision per flow.',
+    )
+    args = parser.parse_args(argv)
+    check_config(args.config, args.flows, quiet=args.quiet)
 
 
 def main() -> None:
+    if sys.argv[1:2] == ['check']:
+        _check_main(sys.argv[2:])
+        return
     parser = argparse.ArgumentParser(
-        description='Start soxyproxy server with the given configuration file.',
+        description='Start soxyproxy server with the given configuration file. '
+        'Run "soxy check --help" to validate a configuration and benchmark its ruleset.',
     )
     parser.add_argument(
         'config',
@@ -53,10 +226,35 @@ def main() -> None:
         default=None,
         help='Path to log file. If not specified, logs will be printed to terminal.',
     )
+    parser.add_argument(
+        '--workers',
+        '-w',
+        type=int,
+        default=None,
+        help='Number of worker processes sharing the listening address with SO_REUSEPORT, '
+        'restarted by a supervisor when they exit. If not specified, the proxy runs in this process.',
+    )
+    parser.add_argument(
+        '--threads',
+        '-t',
+        type=int,
+        default=None,
+        help='Number of event loop threads of a process sharing the ruleset and caches, each with its own '
+        'SO_REUSEPORT socket. Runs on several cores with free-threaded Python builds.',
+    )
 
     args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error('the number of workers must be positive')
+    if args.threads is not None and args.threads < 1:
+        parser.error('the number of threads must be positive')
     logfile_str = str(args.logfile) if args.logfile else None
-    _run_proxy(args.config, logfile_str)
+    if args.workers is not None:
+        _run_workers(args.config, logfile_str, args.workers, threads=args.threads or 1)
+    elif args.threads is not None:
+        _run_proxy(args.config, logfile_str, threads=args.threads)
+    else:
+        _run_proxy(args.config, logfile_str)
 
 
 if __name__ == '__main__':
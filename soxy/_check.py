@@ -0,0 +1,172 @@
+import time
+import tracemalloc
+import typing
+from ipaddress import ip_address
+from pathlib import Path
+
+from soxy._ranges import IPRangeSet
+from soxy._types import Address
+
+if typing.TYPE_CHECKING:
+    from soxy._config import Config
+    from soxy._ruleset import Ruleset
+    from soxy._types import Connection, IPvAnyAddress
+
+
+class Flow(
+    typing.NamedTuple,
+):
+    client: IPvAnyAddress
+    destination: Address
+    domain_name: str | None = None
+    username: str | None = None
+
+    def __str__(
+        self,
+    ) -> str:
+        client = f'{self.username}@{self.client}' if self.username else str(self.client)
+        ip = self.destination.ip
+        destination = f'[{ip}]:{self.destination.port}' if ip.version == 6 else f'{ip}:{self.destination.port}'  # noqa: PLR2004
+        return f'{client} {destination} {self.domain_name}' if self.domain_name else f'{client} {destination}'
+
+
+class CompiledRuleset(
+    typing.NamedTuple,
+):
+    ruleset: Ruleset
+    seconds: float
+    # Python heap kept by the compiled rules
+    memory: int
+    # memory-mapped range files of address lists
+    mapped: int
+
+
+class _Client:
+    """
+    Stands for a connected client in offline checks, rules only look at its address and username.
+    """
+
+    __slots__ = ('address', 'username')
+
+    def __init__(
+        self,
+        address: Address,
+        username: str | None,
+    ) -> None:
+        self.address = address
+        self.username = username
+
+    def __repr__(
+        self,
+    ) -> str:
+        user = f'{self.username}@' if self.username else ''
+        return f'<soxy.{self.__class__.__name__} {user}{self.address.ip}>'
+
+
+def _parse_destination(
+    value: str,
+) -> Address:
+    """
+    Accepts "ipv4:port" and "[ipv6]:port".
+    """
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        msg = f'invalid destination: {value}'
+        raise ValueError(msg)
+    return Address(ip_address(host.removeprefix('[').removesuffix(']')), int(port))
+
+
+def _parse_flow(
+    line: str,
+) -> Flow:
+    match line.split():
+        case [client, destination, *domain_name] if len(domain_name) <= 1:
+            username, _, client = client.rpartition('@')
+            return Flow(
+                client=ip_address(client),
+                destination=_parse_destination(destination),
+                domain_name=domain_name[0] if domain_name else None,
+                username=username or None,
+            )
+    msg = f'expected "[user@]client destination [domain]": {line}'
+    raise ValueError(msg)
+
+
+def read_flows(
+    path: Path | str,
+) -> list[Flow]:
+    """
+    Read flows, one per line: "[user@]client destination [domain]", e.g.
+    "alice@192.168.1.10 93.184.216.34:443 example.com". Empty lines and "#" comments are skipped.
+    """
+    flows = []
+    with Path(path).open() as fh:
+        for number, line in enumerate(fh, start=1):
+            if not (line := line.partition('#')[0].strip()):
+                continue
+            try:
+                flows.append(_parse_flow(line))
+            except ValueError as exc:
+                msg = f'{path}:{number}: {exc}'
+                raise ValueError(msg) from exc
+    return flows
+
+
+def compile_ruleset(
+    config: Config,
+) -> CompiledRuleset:
+    """
+    Compile the ruleset of the config, measuring the compile time, the Python heap it keeps
+    and the size of the range files it maps, which tracemalloc doesn't see.
+    """
+    started = time.perf_counter()
+    ruleset = config.ruleset
+    seconds = time.perf_counter() - started
+    # tracing slows the compilation down a lot, so the memory is measured on a second one
+    tracemalloc.start()
+    try:
+        traced = config.ruleset
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del traced
+    return CompiledRuleset(ruleset=ruleset, seconds=seconds, memory=memory, mapped=_mapped_size(ruleset))
+
+
+def _mapped_size(
+    ruleset: Ruleset,
+) -> int:
+    range_sets = {
+        id(addresses): addresses
+        for rules in ruleset.rule_hits().values()
+        for rule, _ in rules
+        for addresses in (rule.from_addresses, getattr(rule, 'to_addresses', None))
+        if isinstance(addresses, IPRangeSet)
+    }
+    return sum(range_set.mapped_size for range_set in range_sets.values())
+
+
+def replay(
+    ruleset: Ruleset,
+    flows: typing.Iterable[Flow],
+) -> list[bool]:
+    """
+    Decide flows the way the proxy does: the client has to pass the connecting rules first,
+    then requests for domain names are checked before resolution and, when they pass, with
+    the resolved destination.
+    """
+    decisions = []
+    for flow in flows:
+        client = typing.cast('Connection', _Client(Address(flow.client, 0), flow.username))
+        if not ruleset.should_allow_connecting(client):
+            decisions.append(False)
+            continue
+        if flow.domain_name is not None and not ruleset.should_allow_domain(
+            client,
+            flow.domain_name,
+            flow.destination.port,
+        ):
+            decisions.append(False)
+            continue
+        decisions.append(ruleset.should_allow_proxying(client, flow.destination, flow.domain_name))
+    return decisions
@@ -1,16 +1,25 @@
 import asyncio
+import base64
+import hashlib
+import hmac
 import tomllib
 import typing
 from contextlib import suppress
-from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
-from socket import gethostbyname
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network, ip_address
+from socket import SOCK_STREAM, getaddrinfo
 
+from soxy._dns import DnsResolver
 from soxy._errors import ConfigError
-from soxy._ruleset import ConnectingRule, ProxyingRule, Ruleset
+from soxy._geoip import GeoIPDatabase, GeoIPSet
+from soxy._interpreters import interpreter_pool
+from soxy._ranges import IPRangeSet
+from soxy._resolvers import CachingResolver
+from soxy._ruleset import ConnectingRule, PortSet, ProxyingRule, Ruleset, UserRules
 from soxy._socks import Socks4, Socks5
 from soxy._tcp import TcpTransport
 
 if typing.TYPE_CHECKING:
+    from concurrent.futures import Executor
     from pathlib import Path
 
     from soxy._types import (
@@ -20,11 +29,72 @@ if typing.TYPE_CHECKING:
         Socks5Auther,
         Transport,
     )
+    from soxy._utils import AddressSet
 
 _DEFAULTS_PROXY_SECTION = {
     'protocol': 'socks5',
     'transport': 'tcp',
 }
+_PBKDF2_PREFIX = 'pbkdf2_sha256$'
+
+
+def _check_pbkdf2(
+    encoded: str,
+    password: str,
+) -> bool:
+    """
+    Check a password against "pbkdf2_sha256$<iterations>$<salt>$<base64 digest>".
+    """
+    try:
+        _, iterations, salt, digest = encoded.split('$')
+        expected = base64.b64decode(digest, validate=True)
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+class _Socks4Auther:
+    """
+    Usernames of the [proxy.auth] section. A class rather than a closure, so it can be
+    pickled to the interpreters of an auth executor.
+    """
+
+    def __init__(
+        self,
+        users: dict[str, str],
+    ) -> None:
+        self._users = users
+
+    def __call__(
+        self,
+        username: str,
+    ) -> bool:
+        return username in self._users
+
+
+class _Socks5Auther:
+    """
+    Usernames and passwords of the [proxy.auth] section, picklable like _Socks4Auther.
+    Passwords are plain text or PBKDF2 hashes.
+    """
+
+    def __init__(
+        self,
+        users: dict[str, str],
+    ) -> None:
+        self._users = users
+
+    def __call__(
+        self,
+        username: str,
+        password: str,
+    ) -> bool:
+        if not isinstance(expected := self._users.get(username), str):
+            return False
+        if expected.startswith(_PBKDF2_PREFIX):
+            return _check_pbkdf2(expected, password)
+        return hmac.compare_digest(expected.encode(), password.encode())
 
 
 class Config:
@@ -32,6 +102,7 @@ class Config:
         self,
         data: dict[str, typing.Any],
     ) -> None:
+        self._data = data
         self._proxy_data = data.get('proxy', _DEFAULTS_PROXY_SECTION)
         if not isinstance(self._proxy_data, dict):
             section = 'proxy'
@@ -55,6 +126,15 @@ class Config:
             msg = 'Missing ruleset configuration'
             raise ConfigError(section, msg) from exc
 
+    def with_transport(
+        self,
+        **options: typing.Any,  # noqa: ANN401
+    ) -> typing.Self:
+        """
+        Copy of the configuration with the options of the [transport] section replaced.
+        """
+        return type(self)({**self._data, 'transport': {**self._transport_data, **options}})
+
     @classmethod
     def load(
         cls,
@@ -100,7 +180,7 @@ class Config:
                 raise ConfigError(section, msg)
         try:
             return transport_cls(**self._transport_data)
-        except TypeError as exc:
+        except (TypeError, ValueError) as exc:
             section = 'transport'
             msg = 'Invalid transport configuration'
             raise ConfigError(section, msg) from exc
@@ -108,87 +188,172 @@ class Config:
     def _make_connecting_rules(
         self,
         rules: list[dict[str, typing.Any]],
+        databases: dict[str, GeoIPDatabase],
     ) -> typing.Generator[ConnectingRule]:
         for rule_dict in rules:
-            from_ = None
-            from_str = rule_dict.get('from')
-            if not from_str:
-                continue
-            try:
-                from_ = IPv4Address(from_str)
-            except (ValueError, TypeError):
-                try:
-                    from_ = IPv4Network(from_str)
-                except (ValueError, TypeError):
-                    try:
-                        from_ = IPv6Address(from_str)
-                    except (ValueError, TypeError):
-                        try:
-                            from_ = IPv6Network(from_str)
-                        except (ValueError, TypeError):
-                            continue
-            if not isinstance(
-                from_,
-                IPv4Address | IPv6Address | IPv4Network | IPv6Network,
-            ):
-                continue
-            yield ConnectingRule(
-                from_addresses=from_,
-            )
+            for from_ in self._parse_sources(rule_dict, databases):
+                yield ConnectingRule(
+                    from_addresses=from_,
+                )
 
-    def _make_rules(  # noqa: C901, PLR0912
+    def _make_rules(
         self,
         rules: list[dict[str, typing.Any]],
+        databases: dict[str, GeoIPDatabase],
     ) -> typing.Generator[ProxyingRule]:
         for rule_dict in rules:
-            from_ = None
-            from_str = rule_dict.get('from')
-            if not from_str:
+            if not (sources := self._parse_sources(rule_dict, databases)):
                 continue
+            ports = self._parse_ports(rule_dict.get('ports'))
+            destinations: list[IPv4Address | IPv6Address | IPv4Network | IPv6Network | AddressSet | str] = []
+            if (to_file := rule_dict.get('to_file')) is not None:
+                destinations.append(self._load_ranges(to_file))
+            elif (to_geoip := rule_dict.get('to_geoip')) is not None:
+                destinations.extend(self._parse_geoip(to_geoip, databases))
+            elif (to_ := rule_dict.get('to')) is not None:
+                # a list, e.g. a domain blocklist, makes a rule per entry
+                destinations.extend(
+                    to_parsed
+                    for to_value in (to_ if isinstance(to_, list) else [to_])
+                    if (to_parsed := self._parse_destination(to_value)) is not None
+                )
+            for from_ in sources:
+                for to_parsed in destinations:
+                    yield ProxyingRule(
+                        from_addresses=from_,
+                        to_addresses=to_parsed,
+                        ports=ports,
+                    )
+
+    def _parse_sources(
+        self,
+        rule_dict: dict[str, typing.Any],
+        databases: dict[str, GeoIPDatabase],
+    ) -> list[IPv4Address | IPv6Address | IPv4Network | IPv6Network | AddressSet]:
+        """
+        Sources of a rule given by from, from_file or from_geoip, an empty list skips the rule.
+        """
+        if (from_file := rule_dict.get('from_file')) is not None:
+            return [self._load_ranges(from_file)]
+        if (from_geoip := rule_dict.get('from_geoip')) is not None:
+            return list(self._parse_geoip(from_geoip, databases))
+        from_ = None
+        from_str = rule_dict.get('from')
+        if not from_str:
+            return []
+        try:
+            from_ = IPv4Address(from_str)
+        except (ValueError, TypeError):
             try:
-                from_ = IPv4Address(from_str)
+                from_ = IPv4Network(from_str)
             except (ValueError, TypeError):
                 try:
-                    from_ = IPv4Network(from_str)
+                    from_ = IPv6Address(from_str)
                 except (ValueError, TypeError):
                     try:
-                        from_ = IPv6Address(from_str)
+                        from_ = IPv6Network(from_str)
                     except (ValueError, TypeError):
-                        try:
-                            from_ = IPv6Network(from_str)
-                        except (ValueError, TypeError):
-                            continue
-            if not isinstance(
-                from_,
-                IPv4Address | IPv6Address | IPv4Network | IPv6Network,
-            ):
-                continue
-            to_ = rule_dict.get('to')
-            if to_ is None:
-                continue
-            if isinstance(to_, str):
-                to_parsed = None
-                with suppress(ValueError, TypeError):
-                    to_parsed = IPv4Address(to_)
-                if to_parsed is None:
-                    with suppress(ValueError, TypeError):
-                        to_parsed = IPv4Network(to_)
-                if to_parsed is None:
-                    with suppress(ValueError, TypeError):
-                        to_parsed = IPv6Address(to_)
-                if to_parsed is None:
-                    with suppress(ValueError, TypeError):
-                        to_parsed = IPv6Network(to_)
-                to_ = to_ if to_parsed is None else to_parsed
-            if not isinstance(
-                to_,
-                IPv4Address | IPv6Address | IPv4Network | IPv6Network | str,
-            ):
-                continue
-            yield ProxyingRule(
-                from_addresses=from_,
-                to_addresses=to_,
-            )
+                        return []
+        if not isinstance(
+            from_,
+            IPv4Address | IPv6Address | IPv4Network | IPv6Network,
+        ):
+            return []
+        return [from_]
+
+    def _load_geoip_databases(
+        self,
+    ) -> dict[str, GeoIPDatabase]:
+        """
+        Load the databases of the [ruleset.geoip] section, a name to CSV path table.
+        """
+        databases_data = self._ruleset_data.get('geoip', {})
+        section = 'ruleset'
+        if not isinstance(databases_data, dict):
+            msg = 'Invalid geoip configuration'
+            raise ConfigError(section, msg)
+        databases = {}
+        for name, path in databases_data.items():
+            try:
+                databases[name] = GeoIPDatabase(path)
+            except (OSError, TypeError, ValueError) as exc:
+                msg = f'Invalid geoip database {name}: {exc}'
+                raise ConfigError(section, msg) from exc
+        return databases
+
+    @staticmethod
+    def _parse_geoip(
+        value: typing.Any,  # noqa: ANN401
+        databases: dict[str, GeoIPDatabase],
+    ) -> typing.Generator[GeoIPSet]:
+        """
+        Parse a database name to labels table, e.g. { country = ["CN", "RU"] }, a set per database.
+        """
+        section = 'ruleset'
+        if not isinstance(value, dict):
+            msg = f'Invalid geoip labels {value}'
+            raise ConfigError(section, msg)
+        for name, labels in value.items():
+            if name not in databases:
+                msg = f'Unknown geoip database {name}'
+                raise ConfigError(section, msg)
+            labels_list = labels if isinstance(labels, list) else [labels]
+            if not all(isinstance(label, str | int) and not isinstance(label, bool) for label in labels_list):
+                msg = f'Invalid geoip labels {labels}'
+                raise ConfigError(section, msg)
+            yield GeoIPSet(databases[name], [str(label) for label in labels_list])
+
+    @staticmethod
+    def _parse_ports(
+        ports: typing.Any,  # noqa: ANN401
+    ) -> PortSet | None:
+        """
+        Parse a port, a "first-last" range or a list of them.
+        """
+        if ports is None:
+            return None
+        values = ports if isinstance(ports, list) else [ports]
+        section = 'ruleset'
+        msg = f'Invalid ports {ports}'
+        if not all(isinstance(value, int | str) and not isinstance(value, bool) for value in values):
+            raise ConfigError(section, msg)
+        items: list[int | tuple[int, int]] = []
+        try:
+            for value in values:
+                if isinstance(value, str) and '-' in value:
+                    first, _, last = value.partition('-')
+                    items.append((int(first), int(last)))
+                else:
+                    items.append(int(value))
+            return PortSet(items)
+        except ValueError as exc:
+            raise ConfigError(section, msg) from exc
+
+    @staticmethod
+    def _load_ranges(
+        path: typing.Any,  # noqa: ANN401
+    ) -> IPRangeSet:
+        """
+        Map a list of addresses, networks and ranges, compiled next to it or in the user cache on first use.
+        """
+        try:
+            return IPRangeSet.load(path)
+        except (OSError, TypeError, ValueError) as exc:
+            section = 'ruleset'
+            msg = f'Invalid range file {path}: {exc}'
+            raise ConfigError(section, msg) from exc
+
+    @staticmethod
+    def _parse_destination(
+        to_: typing.Any,  # noqa: ANN401
+    ) -> IPv4Address | IPv6Address | IPv4Network | IPv6Network | str | None:
+        if not isinstance(to_, str):
+            return None
+        for parser in (IPv4Address, IPv4Network, IPv6Address, IPv6Network):
+            with suppress(ValueError, TypeError):
+                return parser(to_)
+        # anything else is a domain pattern
+        return to_
 
     @property
     def ruleset(
@@ -196,34 +361,103 @@ class Config:
     ) -> Ruleset:
         connecting = self._ruleset_data.get('connecting', {})
         proxying = self._ruleset_data.get('proxying', {})
+        decision_cache_size = self._ruleset_data.get('decision_cache_size', 0)
+        if not isinstance(decision_cache_size, int) or decision_cache_size < 0:
+            section = 'ruleset'
+            msg = 'Invalid decision cache size'
+            raise ConfigError(section, msg)
+        databases = self._load_geoip_databases()
         return Ruleset(
             allow_connecting_rules=list(
-                self._make_connecting_rules(connecting.get('allow', [])),
+                self._make_connecting_rules(connecting.get('allow', []), databases),
             ),
             block_connecting_rules=list(
-                self._make_connecting_rules(connecting.get('block', [])),
+                self._make_connecting_rules(connecting.get('block', []), databases),
             ),
             allow_proxying_rules=list(
-                self._make_rules(proxying.get('allow', [])),
+                self._make_rules(proxying.get('allow', []), databases),
             ),
             block_proxying_rules=list(
-                self._make_rules(proxying.get('block', [])),
+                self._make_rules(proxying.get('block', []), databases),
             ),
+            decision_cache_size=decision_cache_size,
+            users=self._make_user_rules(databases),
         )
 
+    def _make_user_rules(
+        self,
+        databases: dict[str, GeoIPDatabase],
+    ) -> dict[str, UserRules]:
+        """
+        Proxying rules of users from the [ruleset.users.<username>] sections.
+        """
+        users_data = self._ruleset_data.get('users', {})
+        if not isinstance(users_data, dict) or not all(isinstance(data, dict) for data in users_data.values()):
+            section = 'ruleset'
+            msg = 'Invalid users configuration'
+            raise ConfigError(section, msg)
+        users = {}
+        for username, user_data in users_data.items():
+            proxying = user_data.get('proxying', {})
+            users[username] = UserRules(
+                allow_proxying_rules=list(self._make_rules(proxying.get('allow', []), databases)),
+                block_proxying_rules=list(self._make_rules(proxying.get('block', []), databases)),
+            )
+        return users
+
     def _create_resolver(
         self,
     ) -> Resolver:
         """
-        Create a resolver function using OS socket.gethostbyname.
-        The blocking call is executed in a thread pool to avoid blocking the event loop.
+        Create the resolver selected by the resolver option of the [proxy] section:
+        "system" (default) uses OS socket.getaddrinfo returning every IPv4 and IPv6 address,
+        the blocking call is executed in a thread pool to avoid blocking the event loop;
+        "dns" queries nameservers directly, configured by the [proxy.dns] section.
         """
+        resolver: Resolver
+        match self._proxy_data.get('resolver', 'system'):
+            case 'system':
 
-        async def resolver(domain_name: str) -> IPv4Address:
-            ip_str = await asyncio.to_thread(gethostbyname, domain_name)
-            return IPv4Address(ip_str)
+                async def resolver(domain_name: str) -> list[IPv4Address | IPv6Address]:
+                    infos = await asyncio.to_thread(getaddrinfo, domain_name, None, type=SOCK_STREAM)
+                    # IPv6 scope ids are dropped, dict keeps the order the system resolver prefers
+                    return list(dict.fromkeys(ip_address(info[4][0].partition('%')[0]) for info in infos))
 
-        return resolver
+            case 'dns':
+                dns_data = self._proxy_data.get('dns', {})
+                try:
+                    resolver = DnsResolver(**dns_data)
+                except (TypeError, ValueError) as exc:
+                    section = 'proxy'
+                    msg = 'Invalid dns resolver configuration'
+                    raise ConfigError(section, msg) from exc
+            case _:
+                section = 'proxy'
+                msg = 'Unsupported resolver'
+                raise ConfigError(section, msg)
+        return self._wrap_resolver_cache(resolver)
+
+    def _wrap_resolver_cache(
+        self,
+        resolver: Resolver,
+    ) -> Resolver:
+        """
+        Put the resolver behind an answer cache configured by the [proxy.resolver_cache] section.
+        The cache is on by default, max_size = 0 turns it off.
+        """
+        cache_data = self._proxy_data.get('resolver_cache', {})
+        if not isinstance(cache_data, dict):
+            section = 'proxy'
+            msg = 'Invalid resolver cache configuration'
+            raise ConfigError(section, msg)
+        if cache_data.get('max_size') == 0:
+            return resolver
+        try:
+            return CachingResolver(resolver, **cache_data)
+        except (TypeError, ValueError) as exc:
+            section = 'proxy'
+            msg = 'Invalid resolver cache configuration'
+            raise ConfigError(section, msg) from exc
 
     def _create_auther(
         self,
@@ -244,22 +478,31 @@ class Config:
 
         # For SOCKS5: username -> password mapping
         if protocol in ('socks5', 'socks5h'):
-
-            def socks5_auther(username: str, password: str) -> bool:
-                return auth_data.get(username) == password
-
-            return socks5_auther
+            return _Socks5Auther(auth_data)
 
         # For SOCKS4: only username check (password not used)
         if protocol in ('socks4', 'socks4a'):
-
-            def socks4_auther(username: str) -> bool:
-                return username in auth_data
-
-            return socks4_auther
+            return _Socks4Auther(auth_data)
 
         return None
 
+    def _create_auth_executor(
+        self,
+    ) -> Executor | None:
+        interpreters = self._proxy_data.get('auth_interpreters')
+        if interpreters is None:
+            return None
+        if not isinstance(interpreters, int) or isinstance(interpreters, bool) or interpreters < 1:
+            section = 'proxy'
+            msg = 'Invalid auth interpreters'
+            raise ConfigError(section, msg)
+        try:
+            return interpreter_pool(interpreters)
+        except RuntimeError as exc:
+            section = 'proxy'
+            msg = f'Invalid auth interpreters: {exc}'
+            raise ConfigError(section, msg) from exc
+
     @property
     def socks(
         self,
@@ -286,4 +529,8 @@ class Config:
             msg = 'Unsupported SOCKS protocol'
             raise ConfigError(section, msg)
 
-        return socks_cls(auther=auther, resolver=resolver)  # type: ignore[return-value]
+        return socks_cls(  # type: ignore[return-value]
+            auther=auther,  # type: ignore[arg-type]
+            resolver=resolver,
+            auth_executor=self._create_auth_executor() if auther else None,
+        )
@@ -0,0 +1,341 @@
+import asyncio
+import enum
+import random
+import struct
+import typing
+from ipaddress import IPv4Address, IPv6Address, ip_address
+from pathlib import Path
+
+from soxy._logger import logger
+from soxy._resolvers import ResolvedAddresses
+
+if typing.TYPE_CHECKING:
+    from soxy._types import IPvAnyAddress
+
+_DNS_PORT = 53
+_HOSTS_PATH = Path('/etc/hosts')
+_RESOLV_CONF_PATH = Path('/etc/resolv.conf')
+_TIMEOUT = 2.0
+_ATTEMPTS = 2
+_HEADER = struct.Struct('!HHHHHH')
+_RECORD = struct.Struct('!HHIH')
+_FLAG_RESPONSE = 0x8000
+_FLAG_TRUNCATED = 0x0200
+_FLAG_RECURSION_DESIRED = 0x0100
+_CLASS_IN = 1
+_POINTER_MASK = 0xC0
+
+
+class DnsRecordType(
+    enum.IntEnum,
+):
+    A = 1
+    AAAA = 28
+
+
+class DnsResponseCode(
+    enum.IntEnum,
+):
+    NOERROR = 0
+    FORMERR = 1
+    SERVFAIL = 2
+    NXDOMAIN = 3
+    NOTIMP = 4
+    REFUSED = 5
+
+
+class _Answer(
+    typing.NamedTuple,
+):
+    rcode: int
+    truncated: bool
+    addresses: list[IPvAnyAddress]
+    ttl: int | None
+
+
+def _build_query(
+    query_id: int,
+    name: str,
+    record_type: DnsRecordType,
+) -> bytes:
+    qname = b''.join(bytes([len(label)]) + label for label in name.encode('idna').split(b'.'))
+    return (
+        _HEADER.pack(query_id, _FLAG_RECURSION_DESIRED, 1, 0, 0, 0)
+        + qname
+        + b'\x00'
+        + struct.pack('!HH', record_type, _CLASS_IN)
+    )
+
+
+def _skip_name(
+    data: bytes,
+    offset: int,
+) -> int:
+    while length := data[offset]:
+        if length & _POINTER_MASK == _POINTER_MASK:
+            # compression pointer ends the name
+            return offset + 2
+        offset += length + 1
+    return offset + 1
+
+
+def _parse_response(
+    data: bytes,
+    query_id: int,
+) -> _Answer:
+    """
+    Take A and AAAA records out of the answer section of a response.
+    Raises ValueError for malformed responses or responses to another query.
+    """
+    try:
+        response_id, flags, questions, answers, _, _ = _HEADER.unpack_from(data)
+        if response_id != query_id or not flags & _FLAG_RESPONSE:
+            msg = 'unexpected dns response'
+            raise ValueError(msg)
+        offset = _HEADER.size
+        for _ in range(questions):
+            offset = _skip_name(data, offset) + 4
+        addresses: list[IPvAnyAddress] = []
+        ttls: list[int] = []
+        for _ in range(answers):
+            offset = _skip_name(data, offset)
+            record_type, record_class, ttl, length = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            (rdata,) = struct.unpack_from(f'{length}s', data, offset)
+            offset += length
+            if record_class != _CLASS_IN:
+                continue
+            if record_type == DnsRecordType.A and length == 4:  # noqa: PLR2004
+                addresses.append(IPv4Address(rdata))
+            elif record_type == DnsRecordType.AAAA and length == 16:  # noqa: PLR2004
+                addresses.append(IPv6Address(rdata))
+            else:
+                continue
+            ttls.append(ttl)
+    except (IndexError, struct.error) as exc:
+        msg = 'malformed dns response'
+        raise ValueError(msg) from exc
+    return _Answer(
+        rcode=flags & 0x000F,
+        truncated=bool(flags & _FLAG_TRUNCATED),
+        addresses=addresses,
+        ttl=min(ttls) if ttls else None,
+    )
+
+
+def _parse_nameserver(
+    value: str,
+) -> tuple[str, int]:
+    """
+    Accepts "host", "host:port", "ipv6" and "[ipv6]:port".
+    """
+    if value.startswith('['):
+        host, _, port = value[1:].partition(']:')
+        return host.rstrip(']'), int(port or _DNS_PORT)
+    if value.count(':') == 1:
+        host, _, port = value.partition(':')
+        return host, int(port)
+    return value, _DNS_PORT
+
+
+def _read_hosts(
+    path: Path = _HOSTS_PATH,
+) -> dict[str, list[IPvAnyAddress]]:
+    hosts: dict[str, list[IPvAnyAddress]] = {}
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return hosts
+    for line in lines:
+        if not (fields := line.partition('#')[0].split()):
+            continue
+        try:
+            address = ip_address(fields[0].partition('%')[0])
+        except ValueError:
+            continue
+        for name in fields[1:]:
+            addresses = hosts.setdefault(name.lower(), [])
+            if address not in addresses:
+                addresses.append(address)
+    return hosts
+
+
+def _read_resolv_conf(
+    path: Path = _RESOLV_CONF_PATH,
+) -> tuple[list[str], dict[str, float]]:
+    """
+    Read nameservers and the timeout/attempts options. Search domains are not supported.
+    """
+    nameservers: list[str] = []
+    options: dict[str, float] = {}
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return nameservers, options
+    for line in lines:
+        match line.partition('#')[0].split():
+            case ['nameserver', address, *_]:
+                nameservers.append(address.partition('%')[0])
+            case ['options', *values]:
+                for value in values:
+                    key, _, number = value.partition(':')
+                    if key in ('timeout', 'attempts') and number.isdigit():
+                        options[key] = int(number)
+    return nameservers, options
+
+
+class _DnsDatagramProtocol(
+    asyncio.DatagramProtocol,
+):
+    def __init__(
+        self,
+        query_id: int,
+        response: asyncio.Future[bytes],
+    ) -> None:
+        self._query_id = query_id
+        self._response = response
+
+    def datagram_received(
+        self,
+        data: bytes,
+        addr: tuple[str | typing.Any, int],  # noqa: ARG002
+    ) -> None:
+        if self._response.done() or data[:2] != self._query_id.to_bytes(2, 'big'):
+            return
+        self._response.set_result(data)
+
+    def error_received(
+        self,
+        exc: Exception,
+    ) -> None:
+        if not self._response.done():
+            self._response.set_exception(exc)
+
+    def connection_lost(
+        self,
+        exc: Exception | None,
+    ) -> None:
+        if not self._response.done():
+            self._response.set_exception(exc or ConnectionError('dns socket closed'))
+
+
+class DnsResolver:
+    """
+    Asyncio DNS stub resolver sending A and AAAA queries to recursive nameservers.
+
+    Names from the hosts file are answered locally. Queries go over UDP and are retried
+    over TCP when the answer is truncated. Every attempt walks the nameservers in order,
+    each with its own timeout. Answers are returned as ResolvedAddresses carrying the
+    smallest record TTL, so CachingResolver keeps them for as long as the zone allows.
+    """
+
+    def __init__(
+        self,
+        nameservers: typing.Sequence[str] | None = None,
+        *,
+        timeout: float | None = None,
+        attempts: int | None = None,
+        hosts_path: Path | str | None = _HOSTS_PATH,
+        resolv_conf_path: Path | str = _RESOLV_CONF_PATH,
+    ) -> None:
+        """
+        :param nameservers: Nameservers as "host" or "host:port", taken from resolv.conf if omitted.
+        :param timeout: Seconds to wait for one nameserver, resolv.conf or 2 seconds if omitted.
+        :param attempts: Rounds over all nameservers, resolv.conf or 2 if omitted.
+        :param hosts_path: Hosts file answered before querying nameservers, None to skip it.
+        """
+        conf_nameservers, options = _read_resolv_conf(Path(resolv_conf_path))
+        self._nameservers = [
+            _parse_nameserver(nameserver) for nameserver in (nameservers or conf_nameservers or ['127.0.0.1'])
+        ]
+        self._timeout = timeout if timeout is not None else options.get('timeout', _TIMEOUT)
+        self._attempts = attempts if attempts is not None else int(options.get('attempts', _ATTEMPTS))
+        if self._timeout <= 0 or self._attempts <= 0:
+            msg = f'invalid dns resolver timeout or attempts: {self._timeout}, {self._attempts}'
+            raise ValueError(msg)
+        self._hosts = _read_hosts(Path(hosts_path)) if hosts_path is not None else {}
+
+    def __repr__(
+        self,
+    ) -> str:
+        nameservers = ', '.join(f'{host}:{port}' for host, port in self._nameservers)
+        return f'<{self.__class__.__name__} {nameservers}>'
+
+    async def __call__(
+        self,
+        name: str,
+    ) -> ResolvedAddresses:
+        name = name.rstrip('.')
+        if addresses := self._hosts.get(name.lower()):
+            return ResolvedAddresses(addresses)
+        answers = await asyncio.gather(
+            self._query(name, DnsRecordType.A),
+            self._query(name, DnsRecordType.AAAA),
+            return_exceptions=True,
+        )
+        addresses = []
+        ttls = []
+        for answer in answers:
+            if isinstance(answer, BaseException):
+                logger.info(f'{self} failed to resolve {name}: {answer!r}')
+                continue
+            addresses.extend(answer.addresses)
+            if answer.ttl is not None:
+                ttls.append(answer.ttl)
+        return ResolvedAddresses(addresses, ttl=min(ttls) if ttls else None)
+
+    async def _query(
+        self,
+        name: str,
+        record_type: DnsRecordType,
+    ) -> _Answer:
+        query_id = random.getrandbits(16)
+        query = _build_query(query_id, name, record_type)
+        error: Exception = TimeoutError()
+        for _ in range(self._attempts):
+            for nameserver in self._nameservers:
+                try:
+                    async with asyncio.timeout(self._timeout):
+                        answer = _parse_response(await self._exchange_udp(nameserver, query_id, query), query_id)
+                        if answer.truncated:
+                            answer = _parse_response(await self._exchange_tcp(nameserver, query), query_id)
+                except (OSError, EOFError, ValueError) as exc:
+                    error = exc
+                    continue
+                if answer.rcode in (DnsResponseCode.NOERROR, DnsResponseCode.NXDOMAIN):
+                    return answer
+                msg = f'{nameserver[0]}:{nameserver[1]} answered with response code {answer.rcode}'
+                error = ValueError(msg)
+        raise error
+
+    @staticmethod
+    async def _exchange_udp(
+        nameserver: tuple[str, int],
+        query_id: int,
+        query: bytes,
+    ) -> bytes:
+        loop = asyncio.get_running_loop()
+        response: asyncio.Future[bytes] = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DnsDatagramProtocol(query_id, response),
+            remote_addr=nameserver,
+        )
+        try:
+            transport.sendto(query)
+            return await response
+        finally:
+            transport.close()
+
+    @staticmethod
+    async def _exchange_tcp(
+        nameserver: tuple[str, int],
+        query: bytes,
+    ) -> bytes:
+        reader, writer = await asyncio.open_connection(*nameserver)
+        try:
+            writer.write(len(query).to_bytes(2, 'big') + query)
+            await writer.drain()
+            length = int.from_bytes(await reader.readexactly(2), 'big')
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
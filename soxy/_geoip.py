@@ -0,0 +1,187 @@
+import bisect
+import csv
+import typing
+from array import array
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+from pathlib import Path
+
+if typing.TYPE_CHECKING:
+    from soxy._types import IPvAnyAddress
+
+
+def _parse_address(
+    value: str,
+) -> IPvAnyAddress:
+    value = value.strip()
+    address = ip_address(int(value)) if value.isdigit() else ip_address(value)
+    # IPv6 databases keep IPv4 space as IPv4-mapped addresses
+    if isinstance(address, IPv6Address) and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+def _parse_row(
+    row: list[str],
+) -> tuple[int, int, int, str]:
+    """
+    Parse "network,label,..." or "first,last,label,..." into (version, first, last, label).
+    """
+    if '/' in row[0]:
+        network = ip_network(row[0].strip(), strict=False)
+        return network.version, int(network.network_address), int(network.broadcast_address), row[1]
+    first, last = _parse_address(row[0]), _parse_address(row[1])
+    if first.version != last.version or int(first) > int(last):
+        msg = f'invalid address range: {row[0]}-{row[1]}'
+        raise ValueError(msg)
+    return first.version, int(first), int(last), row[2]
+
+
+def _flatten(
+    ranges: list[tuple[int, int, int]],
+) -> typing.Iterator[tuple[int, int, int]]:
+    """
+    Split overlapping (first, last, label) ranges into disjoint ones in address order. Where
+    ranges overlap the one starting last wins, which is the most specific of nested ranges.
+    """
+    # (last, label) of the ranges holding the cursor, the innermost one on top
+    active: list[tuple[int, int]] = []
+    cursor = 0
+    # the sentinel past the largest IPv6 address flushes the ranges left at the end
+    for first, last, label in [*sorted(ranges, key=lambda item: (item[0], -item[1])), (2**128, 2**128, -1)]:
+        while active and cursor < first:
+            top_last, top_label = active[-1]
+            if top_last < cursor:
+                active.pop()
+                continue
+            stop = min(top_last, first - 1)
+            yield cursor, stop, top_label
+            cursor = stop + 1
+        cursor = first
+        active.append((last, label))
+
+
+class _Intervals:
+    def __init__(
+        self,
+        typecode: str | None,
+    ) -> None:
+        # IPv6 doesn't fit into array items, its bounds are kept in lists of ints
+        self.firsts: typing.MutableSequence[int] = array(typecode) if typecode else []
+        self.lasts: typing.MutableSequence[int] = array(typecode) if typecode else []
+        self.labels: array[int] = array('I')
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self.firsts)
+
+    def append(
+        self,
+        first: int,
+        last: int,
+        label: int,
+    ) -> None:
+        # adjacent ranges of the same label are merged, databases often split them
+        if self.firsts and self.labels[-1] == label and self.lasts[-1] + 1 == first:
+            self.lasts[-1] = last
+            return
+        self.firsts.append(first)
+        self.lasts.append(last)
+        self.labels.append(label)
+
+    def find(
+        self,
+        value: int,
+    ) -> int | None:
+        position = bisect.bisect_right(self.firsts, value) - 1
+        if position < 0 or value > self.lasts[position]:
+            return None
+        return self.labels[position]
+
+
+class GeoIPDatabase:
+    """
+    Country, ASN or any other label of IP ranges, loaded from a local CSV database.
+
+    Rows are "network,label,..." (e.g. GeoLite2 ASN) or "first,last,label,..." with addresses
+    or integers (e.g. IP2Location, DB-IP, iptoasn), a header row is skipped. Ranges are kept
+    in sorted arrays, so a lookup is one bisection whatever the size of the database. Overlapping
+    ranges are split on loading, addresses of nested ranges get the label of the innermost one.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+    ) -> None:
+        self._path = Path(path)
+        self._labels: list[str] = []
+        label_ids: dict[str, int] = {}
+        rows: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        with self._path.open(newline='') as fh:
+            for number, row in enumerate(csv.reader(fh), start=1):
+                if not row or row[0].startswith('#'):
+                    continue
+                try:
+                    version, first, last, label = _parse_row(row)
+                except (IndexError, ValueError) as exc:
+                    if number == 1:
+                        continue
+                    msg = f'{self._path}:{number}: {exc}'
+                    raise ValueError(msg) from exc
+                label = label.strip().upper()
+                if (label_id := label_ids.get(label)) is None:
+                    label_id = label_ids[label] = len(self._labels)
+                    self._labels.append(label)
+                rows[version].append((first, last, label_id))
+        self._intervals = {4: _Intervals('L'), 6: _Intervals(None)}
+        for version, items in rows.items():
+            for first, last, label_id in _flatten(items):
+                self._intervals[version].append(first, last, label_id)
+
+    def __repr__(
+        self,
+    ) -> str:
+        return f'<{self.__class__.__name__} {self._path} ({len(self)} ranges)>'
+
+    def __len__(
+        self,
+    ) -> int:
+        return sum(len(intervals) for intervals in self._intervals.values())
+
+    def lookup(
+        self,
+        address: IPvAnyAddress,
+    ) -> str | None:
+        """
+        The label of the range holding the address, None if the database has no such range.
+        """
+        label_id = self._intervals[address.version].find(int(address))
+        return self._labels[label_id] if label_id is not None else None
+
+
+class GeoIPSet:
+    """
+    Addresses labelled by the database with one of the labels (compared case-insensitively).
+    Used as addresses of rules, like networks.
+    """
+
+    def __init__(
+        self,
+        database: GeoIPDatabase,
+        labels: typing.Iterable[str],
+    ) -> None:
+        self._database = database
+        self._labels = frozenset(label.upper() for label in labels)
+
+    def __repr__(
+        self,
+    ) -> str:
+        return f'geoip {",".join(sorted(self._labels))}'
+
+    def __contains__(
+        self,
+        address: object,
+    ) -> bool:
+        if not isinstance(address, IPv4Address | IPv6Address):
+            return False
+        return self._database.lookup(address) in self._labels
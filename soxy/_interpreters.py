@@ -0,0 +1,36 @@
+import concurrent.futures
+import threading
+
+# sub-interpreter pools came with Python 3.14 and may be missing from some builds
+_InterpreterPoolExecutor: type[concurrent.futures.Executor] | None = getattr(
+    concurrent.futures,
+    'InterpreterPoolExecutor',
+    None,
+)
+_pools: dict[int, concurrent.futures.Executor] = {}
+_pools_lock = threading.Lock()
+
+
+def interpreter_pool(
+    max_workers: int,
+) -> concurrent.futures.Executor:
+    """
+    Pool of sub-interpreters for CPU-heavy handshake work, e.g. password hashing authers.
+
+    Every interpreter has its own GIL, so the work runs in parallel with the event loop without
+    the cost of a process. Pools are shared per size for the life of the process, so reloads
+    and event loop threads reuse the running interpreters. Functions and their arguments are
+    pickled, they must be defined at module level.
+
+    :param max_workers: Number of interpreters.
+    """
+    if _InterpreterPoolExecutor is None:
+        msg = 'sub-interpreter pools require Python 3.14 or newer'
+        raise RuntimeError(msg)
+    if max_workers < 1:
+        msg = f'invalid number of interpreters: {max_workers}'
+        raise ValueError(msg)
+    with _pools_lock:
+        if (pool := _pools.get(max_workers)) is None:
+            pool = _pools[max_workers] = _InterpreterPoolExecutor(max_workers=max_workers)  # type: ignore[call-arg]
+        return pool
@@ -1,9 +1,11 @@
+import asyncio
 import struct
 import typing
 from abc import ABC, abstractmethod
 from ipaddress import IPV4LENGTH, IPV6LENGTH, AddressValueError, IPv4Address, IPv6Address
 
 from soxy._errors import PackageError
+from soxy._logger import logger
 from soxy._types import (
     Address,
     Connection,
@@ -16,7 +18,7 @@ from soxy._types import (
     Socks5ConnectionReply,
     SocksVersions,
 )
-from soxy._utils import port_from_bytes, port_to_bytes
+from soxy._utils import check_protocol_version, port_from_bytes, port_to_bytes
 
 
 class _BaseRequestPackage(
@@ -52,12 +54,31 @@ class _BaseRequestPackage(
     ) -> bool:
         raise NotImplementedError
 
+    @classmethod
+    @abstractmethod
+    async def _read_message(
+        cls,
+        client: Connection,
+    ) -> bytes:
+        """
+        Read exactly the bytes of one message, anything the client sent after it
+        stays buffered in the connection.
+        """
+        raise NotImplementedError
+
     @classmethod
     async def from_client(
         cls,
         client: Connection,
     ) -> typing.Self:
-        data = await client.read()
+        try:
+            data = await cls._read_message(client)
+        except asyncio.IncompleteReadError as exc:
+            raise PackageError(exc.partial) from exc
+        except asyncio.LimitOverrunError as exc:
+            # the message doesn't fit in the stream limit, its bytes are left unread
+            logger.info(f'{client} sent a {cls.__name__} longer than the stream limit ({exc.consumed} bytes buffered)')
+            raise PackageError(b'') from exc  # noqa: EM101
         return cls(
             client=client,
             data=data,
@@ -103,6 +124,21 @@ class Socks4Request(
             data=data,
         )
 
+    @classmethod
+    async def _read_message(
+        cls,
+        client: Connection,
+    ) -> bytes:
+        data = await client.read_exactly(1)
+        check_protocol_version(data, SocksVersions.SOCKS4)
+        # command, port and address, then null-terminated user id
+        data += await client.read_exactly(7)
+        data += await client.read_until(b'\x00')
+        # SOCKS4a: address 0.0.0.x is followed by a null-terminated domain name
+        if data[4:7] == b'\x00\x00\x00' and data[7] != 0:
+            data += await client.read_until(b'\x00')
+        return data
+
     def _validate(
         self,
     ) -> bool:
@@ -211,7 +247,9 @@ class Socks4Response(
         super().__init__(client)
         self._reply = reply
         self._destination = destination
-        self._data = bytes([0, reply.value]) + port_to_bytes(destination.port) + destination.ip.packed
+        # the reply has room for an IPv4 address only
+        ip = destination.ip if isinstance(destination.ip, IPv4Address) else IPv4Address(0)
+        self._data = bytes([0, reply.value]) + port_to_bytes(destination.port) + ip.packed
 
     @property
     def destination(
@@ -241,6 +279,16 @@ class Socks5GreetingRequest(
             data=data,
         )
 
+    @classmethod
+    async def _read_message(
+        cls,
+        client: Connection,
+    ) -> bytes:
+        data = await client.read_exactly(1)
+        check_protocol_version(data, SocksVersions.SOCKS5)
+        data += await client.read_exactly(1)
+        return data + await client.read_exactly(data[1])
+
     def _validate(
         self,
     ) -> bool:
@@ -330,6 +378,16 @@ class Socks5AuthorizationRequest(
             data=data,
         )
 
+    @classmethod
+    async def _read_message(
+        cls,
+        client: Connection,
+    ) -> bytes:
+        data = await client.read_exactly(2)
+        data += await client.read_exactly(data[1])
+        password_length = await client.read_exactly(1)
+        return data + password_length + await client.read_exactly(password_length[0])
+
     def _validate(
         self,
     ) -> bool:
@@ -411,6 +469,28 @@ class Socks5ConnectionRequest(
             data=data,
         )
 
+    @classmethod
+    async def _read_message(
+        cls,
+        client: Connection,
+    ) -> bytes:
+        data = await client.read_exactly(1)
+        check_protocol_version(data, SocksVersions.SOCKS5)
+        # command, reserved byte and address type
+        data += await client.read_exactly(3)
+        match data[3]:
+            case Socks5AddressType.IPv4:
+                address_length = IPV4LENGTH // 8
+            case Socks5AddressType.IPv6:
+                address_length = IPV6LENGTH // 8
+            case Socks5AddressType.DOMAIN:
+                data += await client.read_exactly(1)
+                address_length = data[4]
+            case _:
+                raise PackageError(data)
+        # address followed by port
+        return data + await client.read_exactly(address_length + 2)
+
     def _validate(
         self,
     ) -> bool:
@@ -4,6 +4,7 @@ import typing
 
 from soxy._config import Config
 from soxy._errors import (
+    ConfigError,
     PackageError,
     ProtocolError,
 )
@@ -25,6 +26,9 @@ class Proxy:
         transport: Transport,
     ) -> None:
         self._protocol = protocol
+        protocol.init(
+            should_allow_domain_cb=self._should_allow_domain_protocol_cb,
+        )
         transport.init(
             on_client_connected_cb=self._on_client_connected_transport_cb,
             start_messaging_cb=self._start_messaging_transport_cb,
@@ -33,6 +37,8 @@ class Proxy:
         logger.info(f'initialized {transport} for {protocol}')
         self._transport = transport
         self._ruleset = ruleset
+        # rulesets of connections in the handshake, a reload doesn't change them
+        self._handshakes: dict[Connection, Ruleset] = {}
 
     async def __aenter__(
         self,
@@ -53,6 +59,18 @@ class Proxy:
             exc_traceback,
         )
 
+    @property
+    def protocol(
+        self,
+    ) -> ProxySocks:
+        return self._protocol
+
+    @property
+    def ruleset(
+        self,
+    ) -> Ruleset:
+        return self._ruleset
+
     @classmethod
     def from_config(
         cls,
@@ -64,38 +82,84 @@ class Proxy:
             ruleset=config.ruleset,
         )
 
+    def reload(
+        self,
+        protocol: ProxySocks,
+        ruleset: Ruleset,
+    ) -> None:
+        """
+        Swap the protocol (with its auther and resolver) and the ruleset for new connections.
+        Running sessions are not interrupted, a connection still in the handshake keeps checking
+        its requests with the ruleset it started with. Range files mapped by the old ruleset are
+        unmapped when the last handshake using it ends and it is garbage collected.
+
+        :param protocol: Protocol of the same class as the current one, replies of handshakes
+            in progress are sent by the new instance.
+        :param ruleset: Ruleset for new connections.
+        """
+        if type(protocol) is not type(self._protocol):
+            section = 'proxy'
+            msg = f'Protocol can not be changed on reload: {self._protocol} -> {protocol}'
+            raise ConfigError(section, msg)
+        protocol.init(
+            should_allow_domain_cb=self._should_allow_domain_protocol_cb,
+        )
+        self._protocol, self._ruleset = protocol, ruleset
+        logger.info(f'{self} reloaded {protocol} and ruleset')
+
     async def _on_client_connected_transport_cb(
         self,
         client: Connection,
-    ) -> Address | None:
+    ) -> list[Address] | None:
         logger.info(f'{client} client connected')
+        # a reload in the middle of the handshake doesn't mix two rulesets
+        protocol, ruleset = self._protocol, self._ruleset
         if (
-            self._ruleset.should_allow_connecting(
+            ruleset.should_allow_connecting(
                 client=client,
             )
             is False
         ):
             return None
+        self._handshakes[client] = ruleset
         try:
-            address, domain_name = await self._protocol(client)
+            addresses, domain_name = await protocol(client)
         except PackageError as exc:
             logger.info(f'{client} package error ({exc.data!r})')
             return None
         except ProtocolError as exc:
             logger.info(f'{client} protocol error ({exc.__class__.__name__})')
             return None
-        if self._ruleset.should_allow_proxying(
-            client=client,
-            destination=address,
-            domain_name=domain_name,
-        ):
-            return address
-        await self._protocol.ruleset_reject(
+        finally:
+            del self._handshakes[client]
+        if allowed := [
+            address
+            for address in addresses
+            if ruleset.should_allow_proxying(
+                client=client,
+                destination=address,
+                domain_name=domain_name,
+            )
+        ]:
+            return allowed
+        await protocol.ruleset_reject(
             client=client,
-            destination=address,
+            destination=addresses[0],
         )
         return None
 
+    def _should_allow_domain_protocol_cb(
+        self,
+        client: Connection,
+        domain_name: str,
+        port: int,
+    ) -> bool:
+        return self._handshakes.get(client, self._ruleset).should_allow_domain(
+            client=client,
+            domain_name=domain_name,
+            port=port,
+        )
+
     async def _start_messaging_transport_cb(
         self,
         client: Connection,
@@ -0,0 +1,213 @@
+import errno
+import hashlib
+import mmap
+import os
+import struct
+import typing
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+from pathlib import Path
+
+if typing.TYPE_CHECKING:
+    from soxy._types import IPvAnyAddress
+
+_MAGIC = b'SOXYRNG1'
+_HEADER = struct.Struct('!8sQQ')
+_WIDTHS = {4: 4, 6: 16}
+_COMPILED_SUFFIX = '.ranges'
+_UNWRITABLE_ERRNOS = (errno.EACCES, errno.EPERM, errno.EROFS)
+
+
+def _parse_range(
+    line: str,
+) -> tuple[int, int, int]:
+    """
+    Parse "address", "network/prefix" or "first-last" into (version, first, last).
+    """
+    if '-' in line:
+        first_str, _, last_str = line.partition('-')
+        first, last = ip_address(first_str.strip()), ip_address(last_str.strip())
+        if first.version != last.version or int(first) > int(last):
+            msg = f'invalid address range: {line}'
+            raise ValueError(msg)
+        return first.version, int(first), int(last)
+    network = ip_network(line, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def _cache_path(
+    source: Path,
+) -> Path:
+    """
+    Compiled file of a list in the user cache, named after its absolute path.
+    """
+    cache_home = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    digest = hashlib.sha256(str(source.resolve()).encode()).hexdigest()[:16]
+    return cache_home / 'soxy' / f'{source.name}.{digest}{_COMPILED_SUFFIX}'
+
+
+def _merge(
+    ranges: list[tuple[int, int]],
+) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+            continue
+        merged.append((first, last))
+    return merged
+
+
+class IPRangeSet:
+    """
+    Sorted, non-overlapping IP ranges in a memory-mapped binary file, queried by binary search.
+
+    The file is compiled once from a text list of addresses, networks and "first-last" ranges
+    and reused while it is newer than the list, so loading millions of entries costs a mmap
+    call and processes running the same config share the pages.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+    ) -> None:
+        self._path = Path(path)
+        with self._path.open('rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count_v4, count_v6 = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self._mmap.close()
+            msg = f'not a compiled range file: {self._path}'
+            raise ValueError(msg)
+        self._sections = {
+            4: (_HEADER.size, count_v4),
+            6: (_HEADER.size + count_v4 * _WIDTHS[4] * 2, count_v6),
+        }
+
+    def __repr__(
+        self,
+    ) -> str:
+        return f'<{self.__class__.__name__} {self._path} ({len(self)} ranges)>'
+
+    def __len__(
+        self,
+    ) -> int:
+        return sum(count for _, count in self._sections.values())
+
+    @property
+    def mapped_size(
+        self,
+    ) -> int:
+        """
+        Bytes of the memory-mapped file, which are not allocated on the Python heap.
+        """
+        return len(self._mmap)
+
+    def __contains__(
+        self,
+        address: object,
+    ) -> bool:
+        if not isinstance(address, IPv4Address | IPv6Address):
+            return False
+        return self._contains(address)
+
+    @classmethod
+    def compile(
+        cls,
+        source: Path | str,
+        target: Path | str,
+    ) -> None:
+        """
+        Compile a text list into the binary format. Empty lines and "#" comments are skipped.
+        """
+        ranges: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+        with Path(source).open() as fh:
+            for number, line in enumerate(fh, start=1):
+                if not (line := line.partition('#')[0].strip()):
+                    continue
+                try:
+                    version, first, last = _parse_range(line)
+                except ValueError as exc:
+                    msg = f'{source}:{number}: {exc}'
+                    raise ValueError(msg) from exc
+                ranges[version].append((first, last))
+        merged = {version: _merge(items) for version, items in ranges.items()}
+        target = Path(target)
+        temporary = target.with_name(f'.{target.name}.{os.getpid()}')
+        with temporary.open('wb') as fh:
+            fh.write(_HEADER.pack(_MAGIC, len(merged[4]), len(merged[6])))
+            for version in (4, 6):
+                width = _WIDTHS[version]
+                fh.writelines(
+                    first.to_bytes(width, 'big') + last.to_bytes(width, 'big') for first, last in merged[version]
+                )
+        # readers never see a partially written file
+        temporary.replace(target)
+
+    @classmethod
+    def load(
+        cls,
+        source: Path | str,
+        compiled: Path | str | None = None,
+    ) -> typing.Self:
+        """
+        Map the compiled form of the list, compiling it first when it is missing or older than the list.
+
+        :param source: Text list of addresses, networks and ranges.
+        :param compiled: Binary file path, the list path with ".ranges" appended by default. When
+            the directory of the list is not writable, e.g. /etc, the file is kept in
+            $XDG_CACHE_HOME/soxy (~/.cache/soxy) instead.
+        """
+        source = Path(source)
+        if compiled is not None:
+            return cls._load(source, Path(compiled))
+        try:
+            return cls._load(source, source.with_name(source.name + _COMPILED_SUFFIX))
+        except OSError as exc:
+            if exc.errno not in _UNWRITABLE_ERRNOS:
+                raise
+        cached = _cache_path(source)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        return cls._load(source, cached)
+
+    @classmethod
+    def _load(
+        cls,
+        source: Path,
+        compiled: Path,
+    ) -> typing.Self:
+        try:
+            is_fresh = compiled.stat().st_mtime >= source.stat().st_mtime
+        except FileNotFoundError:
+            is_fresh = False
+        if not is_fresh:
+            cls.compile(source, compiled)
+        return cls(compiled)
+
+    def close(
+        self,
+    ) -> None:
+        self._mmap.close()
+
+    def _contains(
+        self,
+        address: IPvAnyAddress,
+    ) -> bool:
+        offset, count = self._sections[address.version]
+        width = _WIDTHS[address.version]
+        record = width * 2
+        value = int(address)
+        data = self._mmap
+        # find the last range starting at or before the address
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position = offset + middle * record
+            if int.from_bytes(data[position : position + width], 'big') <= value:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return False
+        position = offset + (low - 1) * record + width
+        return value <= int.from_bytes(data[position : position + width], 'big')
@@ -0,0 +1,403 @@
+import asyncio
+import os
+import types
+import typing
+
+from soxy._logger import logger
+
+if typing.TYPE_CHECKING:
+    from soxy._tcp import TCPConnection
+
+_BUFFER_SIZE = 65536
+
+
+async def _detach_reader(
+    connection: TCPConnection,
+) -> bytes:
+    """
+    Take the bytes the stream reader has buffered so far.
+    The reader is unusable afterwards.
+    """
+    connection.reader.feed_eof()
+    try:
+        return await connection.reader.read()
+    except ConnectionError:
+        return b''
+
+
+class _RelayProtocol(
+    asyncio.BufferedProtocol,
+):
+    """
+    Receives bytes from one transport straight into a preallocated buffer
+    and hands them to the peer transport without any intermediate copies.
+    """
+
+    def __init__(
+        self,
+        origin: asyncio.BaseProtocol,
+        finished: asyncio.Future[None],
+        buffer_size: int,
+    ) -> None:
+        self._origin = origin
+        self._finished = finished
+        self._buffer = memoryview(bytearray(buffer_size))
+        self._target: asyncio.Transport | None = None
+        self._transferred = 0
+
+    @property
+    def transferred(
+        self,
+    ) -> int:
+        return self._transferred
+
+    def link(
+        self,
+        target: asyncio.Transport,
+    ) -> None:
+        self._target = target
+
+    def get_buffer(
+        self,
+        sizehint: int,  # noqa: ARG002
+    ) -> memoryview:
+        return self._buffer
+
+    def buffer_updated(
+        self,
+        nbytes: int,
+    ) -> None:
+        if self._target is None:
+            return
+        # the peer transport may keep a reference to the buffer until it is flushed,
+        # the write buffer limit of zero pauses this side until that happens
+        self._target.write(self._buffer[:nbytes])
+        self._transferred += nbytes
+
+    def eof_received(
+        self,
+    ) -> bool:
+        self._finish()
+        return False
+
+    def pause_writing(
+        self,
+    ) -> None:
+        if self._target is not None:
+            self._target.pause_reading()
+
+    def resume_writing(
+        self,
+    ) -> None:
+        if self._target is not None and not self._target.is_closing():
+            self._target.resume_reading()
+
+    def connection_lost(
+        self,
+        exc: Exception | None,
+    ) -> None:
+        self._finish()
+        # the stream writer waits for its own protocol to see the connection closed
+        self._origin.connection_lost(exc)
+
+    def _finish(
+        self,
+    ) -> None:
+        if not self._finished.done():
+            self._finished.set_result(None)
+
+
+class BufferedSession:
+    """
+    Relay engine built on asyncio.BufferedProtocol.
+
+    After the handshake the stream protocols of both transports are replaced by
+    relay protocols, so payload no longer passes through StreamReader buffers
+    and no coroutine is resumed per chunk.
+    """
+
+    def __init__(
+        self,
+        client: TCPConnection,
+        remote: TCPConnection,
+        buffer_size: int = _BUFFER_SIZE,
+    ) -> None:
+        self._client = client
+        self._remote = remote
+        self._buffer_size = buffer_size
+        self._finished: asyncio.Future[None] | None = None
+        self._client_protocol: _RelayProtocol | None = None
+        self._remote_protocol: _RelayProtocol | None = None
+
+    async def __aenter__(
+        self,
+    ) -> typing.Self:
+        self._finished = asyncio.get_running_loop().create_future()
+        client_transport = self._client.writer.transport
+        remote_transport = self._remote.writer.transport
+        self._client_protocol = self._attach(client_transport, remote_transport)
+        self._remote_protocol = self._attach(remote_transport, client_transport)
+        # stream readers don't receive anything anymore, but still hold bytes read so far
+        client_pending = await _detach_reader(self._client)
+        remote_pending = await _detach_reader(self._remote)
+        for transport in (client_transport, remote_transport):
+            if transport.is_closing():
+                self._finished.set_result(None)
+                break
+            # re-registers the socket even if the stream protocol has already seen EOF on it
+            transport.pause_reading()
+            transport.resume_reading()
+        if client_pending:
+            remote_transport.write(client_pending)
+        if remote_pending:
+            client_transport.write(remote_pending)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: types.TracebackType | None,
+    ) -> None:
+        if self._client_protocol is not None and self._remote_protocol is not None:
+            logger.info(
+                f'{self._client} -> {self._client_protocol.transferred} bytes -> {self._remote}, '
+                f'{self._client} <- {self._remote_protocol.transferred} bytes <- {self._remote}',
+            )
+
+    def _attach(
+        self,
+        source: asyncio.Transport,
+        target: asyncio.Transport,
+    ) -> _RelayProtocol:
+        if self._finished is None:
+            raise RuntimeError
+        protocol = _RelayProtocol(
+            origin=source.get_protocol(),
+            finished=self._finished,
+            buffer_size=self._buffer_size,
+        )
+        protocol.link(target)
+        source.set_protocol(protocol)
+        source.set_write_buffer_limits(high=0)
+        return protocol
+
+    async def start(
+        self,
+    ) -> None:
+        if self._finished is None:
+            msg = f'{self.__class__.__name__} is not entered'
+            raise RuntimeError(msg)
+        await self._finished
+
+
+class _SplicePipe:
+    """
+    Moves bytes from one socket to another through a kernel pipe with splice(2),
+    driven by the event loop reader and writer callbacks.
+
+    On EOF of the source the bytes left in the pipe are written out first, then on_eof is called.
+    """
+
+    def __init__(
+        self,
+        source_fd: int,
+        target_fd: int,
+        finished: asyncio.Future[None],
+        chunk_size: int,
+        on_eof: typing.Callable[[], None],
+    ) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._source_fd = source_fd
+        self._target_fd = target_fd
+        self._finished = finished
+        self._chunk_size = chunk_size
+        self._on_eof = on_eof
+        self._pipe_read_fd, self._pipe_write_fd = os.pipe()
+        os.set_blocking(self._pipe_read_fd, False)
+        os.set_blocking(self._pipe_write_fd, False)
+        self._in_pipe = 0
+        self._transferred = 0
+        self._eof = False
+
+    @property
+    def transferred(
+        self,
+    ) -> int:
+        return self._transferred
+
+    @property
+    def eof(
+        self,
+    ) -> bool:
+        """
+        The source has closed its side and everything it sent is written to the target.
+        """
+        return self._eof and not self._in_pipe
+
+    def start(
+        self,
+    ) -> None:
+        self._loop.add_reader(self._source_fd, self._on_readable)
+
+    def close(
+        self,
+    ) -> None:
+        self._loop.remove_reader(self._source_fd)
+        self._loop.remove_writer(self._target_fd)
+        os.close(self._pipe_read_fd)
+        os.close(self._pipe_write_fd)
+
+    def _on_readable(
+        self,
+    ) -> None:
+        try:
+            spliced = os.splice(
+                self._source_fd,
+                self._pipe_write_fd,
+                self._chunk_size,
+                flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK,
+            )
+        except BlockingIOError:
+            return
+        except OSError:
+            self._finish()
+            return
+        if not spliced:
+            self._eof = True
+            self._loop.remove_reader(self._source_fd)
+        self._in_pipe += spliced
+        self._flush()
+
+    def _on_writable(
+        self,
+    ) -> None:
+        self._flush()
+
+    def _flush(
+        self,
+    ) -> None:
+        while self._in_pipe:
+            try:
+                spliced = os.splice(
+                    self._pipe_read_fd,
+                    self._target_fd,
+                    self._in_pipe,
+                    flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK,
+                )
+            except BlockingIOError:
+                # the peer is not keeping up, stop reading until the pipe is drained
+                self._loop.remove_reader(self._source_fd)
+                self._loop.add_writer(self._target_fd, self._on_writable)
+                return
+            except OSError:
+                self._finish()
+                return
+            self._in_pipe -= spliced
+            self._transferred += spliced
+        if self._eof:
+            self._loop.remove_writer(self._target_fd)
+            self._on_eof()
+        elif self._loop.remove_writer(self._target_fd):
+            self._loop.add_reader(self._source_fd, self._on_readable)
+
+    def _finish(
+        self,
+    ) -> None:
+        self._loop.remove_reader(self._source_fd)
+        self._loop.remove_writer(self._target_fd)
+        if not self._finished.done():
+            self._finished.set_result(None)
+
+
+class SpliceSession:
+    """
+    Relay engine moving payload between the sockets with splice(2),
+    so relayed bytes are never copied into Python objects (Linux only).
+
+    A side closing its half of the connection is passed on to the other side once the
+    bytes it sent are written, the session ends when both directions are closed.
+    """
+
+    def __init__(
+        self,
+        client: TCPConnection,
+        remote: TCPConnection,
+        chunk_size: int = _BUFFER_SIZE,
+    ) -> None:
+        self._client = client
+        self._remote = remote
+        self._chunk_size = chunk_size
+        self._finished: asyncio.Future[None] | None = None
+        self._fds: list[int] = []
+        self._pipes: list[_SplicePipe] = []
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(os, 'splice')
+
+    async def __aenter__(
+        self,
+    ) -> typing.Self:
+        self._finished = asyncio.get_running_loop().create_future()
+        client_pending = await _detach_reader(self._client)
+        remote_pending = await _detach_reader(self._remote)
+        # draining a reader may resume its transport, so reading is paused only afterwards
+        for connection in (self._client, self._remote):
+            connection.writer.transport.pause_reading()
+        if client_pending:
+            await self._remote.write(client_pending)
+        if remote_pending:
+            await self._client.write(remote_pending)
+        # the loop refuses callbacks on descriptors owned by transports, so the sockets are duplicated
+        client_fd, remote_fd = (
+            os.dup(connection.writer.transport.get_extra_info('socket').fileno())
+            for connection in (self._client, self._remote)
+        )
+        self._fds = [client_fd, remote_fd]
+        self._pipes = [
+            _SplicePipe(client_fd, remote_fd, self._finished, self._chunk_size, lambda: self._on_eof(self._remote)),
+            _SplicePipe(remote_fd, client_fd, self._finished, self._chunk_size, lambda: self._on_eof(self._client)),
+        ]
+        for pipe in self._pipes:
+            pipe.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: types.TracebackType | None,
+    ) -> None:
+        for pipe in self._pipes:
+            pipe.close()
+        for fd in self._fds:
+            os.close(fd)
+        if self._pipes:
+            logger.info(
+                f'{self._client} -> {self._pipes[0].transferred} bytes -> {self._remote}, '
+                f'{self._client} <- {self._pipes[1].transferred} bytes <- {self._remote}',
+            )
+
+    def _on_eof(
+        self,
+        target: TCPConnection,
+    ) -> None:
+        if self._finished is None or self._finished.done():
+            return
+        try:
+            # the transport has nothing buffered, so this shuts the socket down for writing right away
+            target.writer.write_eof()
+        except OSError:
+            self._finished.set_result(None)
+            return
+        if all(pipe.eof for pipe in self._pipes):
+            self._finished.set_result(None)
+
+    async def start(
+        self,
+    ) -> None:
+        if self._finished is None:
+            msg = f'{self.__class__.__name__} is not entered'
+            raise RuntimeError(msg)
+        await self._finished
@@ -0,0 +1,142 @@
+import inspect
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from soxy._logger import logger
+from soxy._types import IPvAnyAddress, Resolver, ResolverResult
+from soxy._utils import normalize_domain_name, resolver_result_to_list
+
+_CACHE_SIZE = 1024
+_CACHE_TTL = 60.0
+_CACHE_MIN_TTL = 1.0
+_CACHE_MAX_TTL = 3600.0
+_CACHE_NEGATIVE_TTL = 5.0
+
+
+class ResolvedAddresses(
+    list[IPvAnyAddress],
+):
+    """
+    Resolver result carrying the time to live of the answer in seconds.
+    """
+
+    def __init__(
+        self,
+        addresses: typing.Iterable[IPvAnyAddress],
+        ttl: float | None = None,
+    ) -> None:
+        super().__init__(addresses)
+        self.ttl = ttl
+
+
+class CachingResolver:
+    """
+    Wraps any resolver with an in-process LRU cache of answers.
+
+    Successful answers are kept for their own TTL (when the result is ResolvedAddresses)
+    or the default one, bounded by min_ttl and max_ttl. Failed or empty answers are kept
+    for negative_ttl, so a broken name doesn't hit the upstream resolver on every request.
+
+    The cache can be shared by event loops of several threads.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        resolver: Resolver,
+        *,
+        max_size: int = _CACHE_SIZE,
+        ttl: float = _CACHE_TTL,
+        min_ttl: float = _CACHE_MIN_TTL,
+        max_ttl: float = _CACHE_MAX_TTL,
+        negative_ttl: float = _CACHE_NEGATIVE_TTL,
+    ) -> None:
+        if max_size <= 0:
+            msg = f'invalid resolver cache size: {max_size}'
+            raise ValueError(msg)
+        if not 0 <= min_ttl <= max_ttl or ttl < 0 or negative_ttl < 0:
+            msg = f'invalid resolver cache ttl bounds: {min_ttl}..{max_ttl}'
+            raise ValueError(msg)
+        self._resolver = resolver
+        self._max_size = max_size
+        self._ttl = ttl
+        self._min_ttl = min_ttl
+        self._max_ttl = max_ttl
+        self._negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, list[IPvAnyAddress]]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self._entries)
+
+    @property
+    def hits(
+        self,
+    ) -> int:
+        return self._hits
+
+    @property
+    def misses(
+        self,
+    ) -> int:
+        return self._misses
+
+    def clear(
+        self,
+    ) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    async def __call__(
+        self,
+        name: str,
+    ) -> list[IPvAnyAddress]:
+        key = normalize_domain_name(name)
+        if (addresses := self._get(key)) is not None:
+            return addresses
+        addresses, ttl = await self._resolve(name)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, addresses)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return list(addresses)
+
+    def _get(
+        self,
+        key: str,
+    ) -> list[IPvAnyAddress] | None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                expires_at, addresses = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return list(addresses)
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    async def _resolve(
+        self,
+        name: str,
+    ) -> tuple[list[IPvAnyAddress], float]:
+        try:
+            result: ResolverResult = self._resolver(name)  # type: ignore[assignment]
+            if inspect.isawaitable(result):
+                result = await result
+            addresses = resolver_result_to_list(result)
+        except Exception as exc:  # noqa: BLE001
+            logger.info(f'failed to resolve {name}: {exc!r}')
+            return [], self._negative_ttl
+        if not addresses:
+            return [], self._negative_ttl
+        ttl = getattr(result, 'ttl', None)
+        if ttl is None:
+            ttl = self._ttl
+        return addresses, min(max(ttl, self._min_ttl), self._max_ttl)
@@ -1,7 +1,12 @@
+import bisect
+import threading
+import typing
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 
 from soxy._logger import logger
-from soxy._utils import match_addresses
+from soxy._trie import AddressIndex, DomainIndex
+from soxy._utils import AddressSet, match_addresses, match_domain, normalize_domain_name
 
 if TYPE_CHECKING:
     from soxy._types import (
@@ -11,14 +16,68 @@ if TYPE_CHECKING:
         IPvAnyNetwork,
     )
 
+_MAX_PORT = 65535
+
+
+class PortSet:
+    """
+    Ports and port ranges compiled into sorted, merged intervals, a lookup is one bisection.
+    """
+
+    def __init__(
+        self,
+        ports: typing.Iterable[int | tuple[int, int]],
+    ) -> None:
+        """
+        :param ports: Ports and inclusive (first, last) port ranges.
+        """
+        intervals: list[tuple[int, int]] = []
+        for item in ports:
+            first, last = item if isinstance(item, tuple) else (item, item)
+            if not 1 <= first <= last <= _MAX_PORT:
+                msg = f'invalid port range: {first}-{last}'
+                raise ValueError(msg)
+            intervals.append((first, last))
+        merged: list[tuple[int, int]] = []
+        for first, last in sorted(intervals):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
+                continue
+            merged.append((first, last))
+        self._firsts = [first for first, _ in merged]
+        self._lasts = [last for _, last in merged]
+
+    def __contains__(
+        self,
+        port: object,
+    ) -> bool:
+        if not isinstance(port, int):
+            return False
+        position = bisect.bisect_right(self._firsts, port) - 1
+        return position >= 0 and port <= self._lasts[position]
+
+    def __repr__(
+        self,
+    ) -> str:
+        return ','.join(
+            str(first) if first == last else f'{first}-{last}'
+            for first, last in zip(self._firsts, self._lasts, strict=True)
+        )
+
 
 class ConnectingRule:
     def __init__(
         self,
-        from_addresses: IPvAnyAddress | IPvAnyNetwork,
+        from_addresses: IPvAnyAddress | IPvAnyNetwork | AddressSet,
     ) -> None:
         self._from_addresses = from_addresses
 
+    @property
+    def from_addresses(
+        self,
+    ) -> IPvAnyAddress | IPvAnyNetwork | AddressSet:
+        return self._from_addresses
+
     def __call__(
         self,
         client: Connection,
@@ -37,11 +96,44 @@ class ConnectingRule:
 class ProxyingRule:
     def __init__(
         self,
-        from_addresses: IPvAnyAddress | IPvAnyNetwork,
-        to_addresses: IPvAnyAddress | IPvAnyNetwork | str,
+        from_addresses: IPvAnyAddress | IPvAnyNetwork | AddressSet,
+        to_addresses: IPvAnyAddress | IPvAnyNetwork | AddressSet | str,
+        ports: PortSet | typing.Iterable[int | tuple[int, int]] | None = None,
     ) -> None:
+        """
+        :param ports: Destination ports and inclusive (first, last) port ranges, any port if omitted.
+        """
         self._from_addresses = from_addresses
         self._to_addresses = to_addresses
+        # a compiled set is shared by all rules made from one config entry
+        self._ports = ports if isinstance(ports, PortSet) or ports is None else PortSet(ports)
+
+    @property
+    def from_addresses(
+        self,
+    ) -> IPvAnyAddress | IPvAnyNetwork | AddressSet:
+        return self._from_addresses
+
+    @property
+    def to_addresses(
+        self,
+    ) -> IPvAnyAddress | IPvAnyNetwork | AddressSet | str:
+        return self._to_addresses
+
+    @property
+    def ports(
+        self,
+    ) -> PortSet | None:
+        return self._ports
+
+    def match_port(
+        self,
+        port: int | None,
+    ) -> bool:
+        """
+        Whether the rule applies to the destination port, an unknown port matches only rules for any port.
+        """
+        return self._ports is None or port in self._ports
 
     def __call__(
         self,
@@ -49,8 +141,10 @@ class ProxyingRule:
         destination: Address,
         domain_name: str | None,
     ) -> bool:
+        if not self.match_port(destination.port):
+            return False
         if isinstance(self._to_addresses, str):
-            return not (not isinstance(domain_name, str) or domain_name != self._to_addresses)
+            return isinstance(domain_name, str) and match_domain(domain_name, self._to_addresses)
         return match_addresses(
             address=client.address,
             match_with=self._from_addresses,
@@ -62,45 +156,350 @@ class ProxyingRule:
     def __repr__(
         self,
     ) -> str:
-        return f'<{self.__class__.__name__}: from {self._from_addresses} to {self._to_addresses}>'
+        ports = f' ports {self._ports}' if self._ports is not None else ''
+        return f'<{self.__class__.__name__}: from {self._from_addresses} to {self._to_addresses}{ports}>'
 
 
-class Ruleset:
+class _ConnectingIndex:
+    """
+    Connecting rules compiled into prefix tries of their source networks.
+    """
+
+    def __init__(
+        self,
+        rules: list[ConnectingRule],
+    ) -> None:
+        self._rules = rules
+        self.hits = [0] * len(rules)
+        self._sources: AddressIndex[int] = AddressIndex()
+        self._sets: list[tuple[int, AddressSet]] = []
+        for index, rule in enumerate(rules):
+            if isinstance(rule.from_addresses, AddressSet):
+                self._sets.append((index, rule.from_addresses))
+                continue
+            # the first rule of the list wins for a network listed several times
+            self._sources.setdefault(rule.from_addresses, index)
+
+    def first_match(
+        self,
+        client: Connection,
+    ) -> ConnectingRule | None:
+        """
+        The first rule of the list matching the client.
+        """
+        ip = client.address.ip
+        indexes = list(self._sources.match(ip))
+        indexes.extend(index for index, addresses in self._sets if ip in addresses)
+        if not indexes:
+            return None
+        index = min(indexes)
+        self.hits[index] += 1
+        return self._rules[index]
+
+
+class _ProxyingIndex:
+    """
+    Proxying rules compiled into prefix tries of destination networks, each holding a prefix
+    trie of source networks, a hash index of domain patterns and a list of rules with address
+    sets (range files and geoip labels).
+
+    Index entries list every rule with the same addresses, so rules differing only in ports
+    are all kept and filtered by the destination port.
+    """
+
+    def __init__(
+        self,
+        rules: list[ProxyingRule],
+    ) -> None:
+        self._rules = rules
+        self.hits = [0] * len(rules)
+        self._destinations: AddressIndex[AddressIndex[list[int]]] = AddressIndex()
+        self._sources: AddressIndex[list[int]] = AddressIndex()
+        self._domains: DomainIndex[list[int]] = DomainIndex()
+        # rules with range files or geoip sources or destinations are checked one by one,
+        # there are only a few of them and every set is searched by bisection
+        self._scanned: list[tuple[int, ProxyingRule]] = []
+        self._source_sets: list[tuple[int, AddressSet]] = []
+        for index, rule in enumerate(rules):
+            if isinstance(rule.to_addresses, str):
+                for bucket in self._domains.buckets(rule.to_addresses, list):
+                    bucket.append(index)
+                continue
+            if isinstance(rule.from_addresses, AddressSet) or isinstance(rule.to_addresses, AddressSet):
+                self._scanned.append((index, rule))
+            else:
+                self._destinations.setdefault(rule.to_addresses, AddressIndex()).setdefault(
+                    rule.from_addresses,
+                    [],
+                ).append(index)
+            if isinstance(rule.from_addresses, AddressSet):
+                self._source_sets.append((index, rule.from_addresses))
+            else:
+                self._sources.setdefault(rule.from_addresses, []).append(index)
+
+    def first_match(
+        self,
+        client: Connection,
+        destination: Address,
+        domain_name: str | None,
+    ) -> ProxyingRule | None:
+        """
+        The first rule of the list matching the request.
+        """
+        indexes = [
+            index
+            for sources in self._destinations.match(destination.ip)
+            for matched in sources.match(client.address.ip)
+            for index in matched
+        ]
+        if domain_name is not None:
+            indexes.extend(index for matched in self._domains.match(domain_name) for index in matched)
+        indexes.extend(
+            index
+            for index, rule in self._scanned
+            if match_addresses(destination, rule.to_addresses) and match_addresses(client.address, rule.from_addresses)
+        )
+        return self._count(self._first(indexes, destination.port))
+
+    def match_domain(
+        self,
+        domain_name: str,
+        port: int | None = None,
+    ) -> ProxyingRule | None:
+        return self._count(
+            self._first((index for matched in self._domains.match(domain_name) for index in matched), port),
+        )
+
+    def may_match(
+        self,
+        client: Connection,
+        domain_name: str,
+        port: int | None = None,
+    ) -> bool:
+        """
+        Whether any rule can match a request for the domain before it is resolved.
+        """
+        indexes = [index for matched in self._domains.match(domain_name) for index in matched]
+        indexes.extend(index for matched in self._sources.match(client.address.ip) for index in matched)
+        indexes.extend(index for index, addresses in self._source_sets if client.address.ip in addresses)
+        return self._first(indexes, port, any_port=port is None) is not None
+
+    def _first(
+        self,
+        indexes: typing.Iterable[int],
+        port: int | None,
+        *,
+        any_port: bool = False,
+    ) -> int | None:
+        """
+        The first of the indexes with a rule applying to the port, or to any of the ports with any_port.
+        """
+        for index in sorted(indexes):
+            if any_port or self._rules[index].match_port(port):
+                return index
+        return None
+
+    def _count(
+        self,
+        index: int | None,
+    ) -> ProxyingRule | None:
+        if index is None:
+            return None
+        self.hits[index] += 1
+        return self._rules[index]
+
+
+class _DecisionCache:
+    """
+    Bounded LRU of proxying decisions keyed on the inputs of the evaluation.
+
+    Entries remember the generation they were stored in and bumping the generation makes all
+    of them stale at once, without walking the cache. A lock keeps the LRU order consistent
+    when event loops of several threads share the ruleset.
+    """
+
     def __init__(
+        self,
+        max_size: int,
+    ) -> None:
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple[object, ...], tuple[int, bool]] = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        key: tuple[object, ...],
+    ) -> bool | None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None and entry[0] == self._generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        key: tuple[object, ...],
+        allowed: bool,
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (self._generation, allowed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+    ) -> None:
+        self._generation += 1
+
+
+class UserRules(
+    typing.NamedTuple,
+):
+    """
+    Proxying rules of one user, used instead of the allow proxying rules of the ruleset for
+    clients authenticated with the username. Block rules of the ruleset apply as well.
+    """
+
+    allow_proxying_rules: list[ProxyingRule]
+    block_proxying_rules: list[ProxyingRule] = []  # noqa: RUF012
+
+
+class _UserIndexes(
+    typing.NamedTuple,
+):
+    allow: _ProxyingIndex
+    block: _ProxyingIndex
+
+
+class Ruleset:
+    """
+    Allow and block rules for client connections and proxied requests.
+
+    Rules are compiled into prefix tries on creation, so a check costs a probe per populated
+    prefix length instead of a pass over every rule. A request is allowed when an allow rule
+    matches it and no block rule does.
+
+    Proxying decisions can be kept in a bounded LRU cache, so repeated flows skip evaluation
+    of the rules and allowed ones skip logging too.
+
+    Users can have their own proxying rules, compiled into separate indexes picked by the
+    authenticated username, so a check costs the same however many users there are.
+    """
+
+    def __init__(  # noqa: PLR0913
         self,
         allow_connecting_rules: list[ConnectingRule],
         allow_proxying_rules: list[ProxyingRule],
         block_connecting_rules: list[ConnectingRule] | None = None,
         block_proxying_rules: list[ProxyingRule] | None = None,
+        *,
+        decision_cache_size: int = 0,
+        users: dict[str, UserRules] | None = None,
     ) -> None:
+        """
+        :param decision_cache_size: Number of proxying decisions to cache, 0 disables the cache.
+        :param users: Proxying rules of users by username.
+        """
+        if decision_cache_size < 0:
+            msg = f'invalid decision cache size: {decision_cache_size}'
+            raise ValueError(msg)
+        self._decisions = _DecisionCache(decision_cache_size) if decision_cache_size else None
         self._allow_connecting_rules = allow_connecting_rules or []
         self._block_connecting_rules: list[ConnectingRule] = block_connecting_rules or []
         self._allow_proxying_rules = allow_proxying_rules or []
         self._block_proxying_rules: list[ProxyingRule] = block_proxying_rules or []
+        self._allow_connecting = _ConnectingIndex(self._allow_connecting_rules)
+        self._block_connecting = _ConnectingIndex(self._block_connecting_rules)
+        self._allow_proxying = _ProxyingIndex(self._allow_proxying_rules)
+        self._block_proxying = _ProxyingIndex(self._block_proxying_rules)
+        self._user_rules = users or {}
+        self._users = {
+            username: _UserIndexes(
+                allow=_ProxyingIndex(rules.allow_proxying_rules),
+                block=_ProxyingIndex(rules.block_proxying_rules),
+            )
+            for username, rules in self._user_rules.items()
+        }
 
     def should_allow_connecting(
         self,
         client: Connection,
     ) -> bool:
-        result: bool | None = None
-        for rule in self._allow_connecting_rules:
-            if result := rule(
-                client=client,
-            ):
-                logger.info(f'{client} connecting ALLOWED: {rule}')
-                break
-        for rule in self._block_connecting_rules:
-            if result := rule(
-                client=client,
-            ):
-                logger.info(f'{client} connecting BLOCKED: {rule}')
-                return False
-        if result is None:
-            result = False
+        if (rule := self._allow_connecting.first_match(client)) is not None:
+            logger.info(f'{client} connecting ALLOWED: {rule}')
+        if (blocking_rule := self._block_connecting.first_match(client)) is not None:
+            logger.info(f'{client} connecting BLOCKED: {blocking_rule}')
+            return False
+        if rule is None:
             logger.info(
                 f'{client} not found allow-connecting-rule',
             )
-        return result
+            return False
+        return True
+
+    def rule_hits(
+        self,
+    ) -> dict[str, list[tuple[ConnectingRule | ProxyingRule, int]]]:
+        """
+        Rules of every list with the number of checks they decided, in the order of the lists.
+        Checks answered by the decision cache are not counted, counts of a ruleset shared by
+        several threads may miss some simultaneous checks.
+        """
+        hits: dict[str, list[tuple[ConnectingRule | ProxyingRule, int]]] = {
+            'allow_connecting': list(zip(self._allow_connecting_rules, self._allow_connecting.hits, strict=True)),
+            'block_connecting': list(zip(self._block_connecting_rules, self._block_connecting.hits, strict=True)),
+            'allow_proxying': list(zip(self._allow_proxying_rules, self._allow_proxying.hits, strict=True)),
+            'block_proxying': list(zip(self._block_proxying_rules, self._block_proxying.hits, strict=True)),
+        }
+        for username, rules in self._user_rules.items():
+            indexes = self._users[username]
+            hits[f'users.{username}.allow_proxying'] = list(
+                zip(rules.allow_proxying_rules, indexes.allow.hits, strict=True),
+            )
+            hits[f'users.{username}.block_proxying'] = list(
+                zip(rules.block_proxying_rules, indexes.block.hits, strict=True),
+            )
+        return hits
+
+    def reset_rule_hits(
+        self,
+    ) -> None:
+        indexes = [self._allow_connecting, self._block_connecting, self._allow_proxying, self._block_proxying]
+        indexes.extend(index for user in self._users.values() for index in user)
+        for index in indexes:
+            index.hits = [0] * len(index.hits)
+
+    @property
+    def cache_hits(
+        self,
+    ) -> int:
+        return self._decisions.hits if self._decisions is not None else 0
+
+    @property
+    def cache_misses(
+        self,
+    ) -> int:
+        return self._decisions.misses if self._decisions is not None else 0
+
+    def invalidate(
+        self,
+    ) -> None:
+        """
+        Drop cached decisions, e.g. after the lists behind range file rules were changed.
+        """
+        if self._decisions is not None:
+            self._decisions.invalidate()
 
     def should_allow_proxying(
         self,
@@ -108,26 +507,78 @@ class Ruleset:
         destination: Address,
         domain_name: str | None,
     ) -> bool:
-        result: bool | None = None
-        for rule in self._allow_proxying_rules:
-            if result := rule(
-                client=client,
-                destination=destination,
-                domain_name=domain_name,
-            ):
-                logger.info(f'{client} request ALLOWED by {rule}')
-                break
-        for rule in self._block_proxying_rules:
-            if result := rule(
-                client=client,
-                destination=destination,
-                domain_name=domain_name,
-            ):
-                logger.info(f'{client} request BLOCKED by {rule}')
+        if self._decisions is None:
+            return self._evaluate_proxying(client, destination, domain_name)
+        client_ip, destination_ip = client.address.ip, destination.ip
+        # plain integers hash much faster than ipaddress objects
+        key = (
+            client_ip.version,
+            int(client_ip),
+            destination_ip.version,
+            int(destination_ip),
+            destination.port,
+            normalize_domain_name(domain_name) if domain_name is not None else None,
+            client.username if self._users else None,
+        )
+        if (allowed := self._decisions.get(key)) is not None:
+            # only blocked requests are worth a log record on every repetition
+            if not allowed:
+                logger.info(f'{client} request BLOCKED by cached decision')
+            return allowed
+        allowed = self._evaluate_proxying(client, destination, domain_name)
+        self._decisions.set(key, allowed)
+        return allowed
+
+    def _evaluate_proxying(
+        self,
+        client: Connection,
+        destination: Address,
+        domain_name: str | None,
+    ) -> bool:
+        allow, blocks = self._proxying_indexes(client)
+        if (rule := allow.first_match(client, destination, domain_name)) is not None:
+            logger.info(f'{client} request ALLOWED by {rule}')
+        for block in blocks:
+            if (blocking_rule := block.first_match(client, destination, domain_name)) is not None:
+                logger.info(f'{client} request BLOCKED by {blocking_rule}')
                 return False
-        if result is None:
-            result = False
+        if rule is None:
             logger.info(
                 f'{client} not found allow-rule for {destination.ip}:{destination.port}',
             )
-        return result
+            return False
+        return True
+
+    def should_allow_domain(
+        self,
+        client: Connection,
+        domain_name: str,
+        port: int | None = None,
+    ) -> bool:
+        """
+        Check a request for a domain name before it is resolved. False means the request is
+        blocked whatever the domain resolves to, True means should_allow_proxying decides
+        once the addresses are known.
+
+        :param port: Requested port, rules limited to some ports are skipped if omitted.
+        """
+        allow, blocks = self._proxying_indexes(client)
+        for block in blocks:
+            if (rule := block.match_domain(domain_name, port)) is not None:
+                logger.info(f'{client} request for {domain_name} BLOCKED by {rule}')
+                return False
+        if allow.may_match(client, domain_name, port):
+            return True
+        logger.info(f'{client} not found allow-rule for {domain_name}')
+        return False
+
+    def _proxying_indexes(
+        self,
+        client: Connection,
+    ) -> tuple[_ProxyingIndex, tuple[_ProxyingIndex, ...]]:
+        """
+        Allow index and block indexes applying to the client, its user's ones when it has them.
+        """
+        if self._users and (username := client.username) and (user := self._users.get(username)) is not None:
+            return user.allow, (self._block_proxying, user.block)
+        return self._allow_proxying, (self._block_proxying,)
@@ -92,3 +92,68 @@ class Session:
         except Exception as exc:  # noqa: BLE001
             logger.exception(f'Session error: {exc}')
             self._finished = True
+
+
+class PumpSession:
+    """
+    Relays bytes with two long-lived pump coroutines, one per direction.
+
+    The pumps share a single cancellation scope: as soon as one direction is
+    finished the other one is cancelled.
+    """
+
+    def __init__(
+        self,
+        client: Connection,
+        remote: Connection,
+    ) -> None:
+        self._client = client
+        self._remote = remote
+        self._pumps: list[asyncio.Task[None]] = []
+
+    async def __aenter__(
+        self,
+    ) -> typing.Self:
+        self._pumps = [
+            asyncio.create_task(self._pump(self._client, self._remote)),
+            asyncio.create_task(self._pump(self._remote, self._client)),
+        ]
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: types.TracebackType | None,
+    ) -> None:
+        for pump in self._pumps:
+            pump.cancel()
+        for pump in self._pumps:
+            with suppress(asyncio.CancelledError):
+                await pump
+
+    async def _pump(
+        self,
+        source: Connection,
+        target: Connection,
+    ) -> None:
+        transferred = 0
+        try:
+            while data := await source.read():
+                await target.write(data)
+                transferred += len(data)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f'{source} -> {target} relay error: {exc}')
+        finally:
+            logger.info(f'{source} -> {transferred} bytes -> {target}')
+
+    async def start(
+        self,
+    ) -> None:
+        if not self._pumps:
+            msg = f'{self.__class__.__name__} is not entered'
+            raise RuntimeError(msg)
+        await asyncio.wait(
+            self._pumps,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
@@ -1,5 +1,6 @@
 import typing
 from abc import ABC, abstractmethod
+from ipaddress import IPv4Address
 
 from soxy._errors import (
     AuthorizationError,
@@ -32,7 +33,9 @@ from soxy._types import (
 from soxy._wrappers import auther_wrapper, resolver_wrapper
 
 if typing.TYPE_CHECKING:
-    from ipaddress import IPv4Address
+    from concurrent.futures import Executor
+
+    from soxy._types import IPvAnyAddress
 
 
 class _BaseSocks(
@@ -51,9 +54,39 @@ class _BaseSocks(
 
         :param resolver: Optional resolver for domain name resolution.
         """
-        self._resolver: typing.Callable[[str], typing.Awaitable[IPv4Address | None]] | None = (
+        self._resolver: typing.Callable[[str], typing.Awaitable[list[IPvAnyAddress] | None]] | None = (
             (resolver_wrapper(resolver)) if resolver else None
         )
+        self._should_allow_domain_cb: typing.Callable[[Connection, str, int], bool] | None = None
+
+    def init(
+        self,
+        should_allow_domain_cb: typing.Callable[[Connection, str, int], bool],
+    ) -> None:
+        """
+        Set the check applied to requested domain names before they are resolved.
+
+        :param should_allow_domain_cb: Returns False when the request is blocked whatever the domain resolves to.
+        """
+        self._should_allow_domain_cb = should_allow_domain_cb
+
+    def _should_resolve(
+        self,
+        client: Connection,
+        domain_name: str,
+        port: int,
+    ) -> bool:
+        """
+        Check the domain name before spending a lookup on it.
+
+        :param client: Client connection.
+        :param domain_name: Requested domain name.
+        :param port: Requested port.
+        :return: False if the request is blocked by the ruleset.
+        """
+        if self._should_allow_domain_cb is None:
+            return True
+        return self._should_allow_domain_cb(client, domain_name, port)
 
     @abstractmethod
     async def success(
@@ -85,12 +118,12 @@ class _BaseSocks(
     async def __call__(
         self,
         client: Connection,
-    ) -> tuple[Address, str | None]:
+    ) -> tuple[list[Address], str | None]:
         """
         Handle SOCKS request.
 
         :param client: Client connection.
-        :return: Tuple of destination address and optional domain name.
+        :return: Tuple of destination address candidates and optional domain name.
         """
 
 
@@ -105,15 +138,17 @@ class Socks4(
         self,
         auther: Socks4Auther | Socks4AsyncAuther | None = None,
         resolver: Resolver | None = None,
+        auth_executor: Executor | None = None,
     ) -> None:
         """
         Initialize the SOCKS4 class.
 
         :param auther: Optional authorizer for SOCKS4.
         :param resolver: Optional resolver for domain name resolution.
+        :param auth_executor: Executor running a synchronous auther off the event loop, e.g. interpreter_pool().
         """
         self._auther: Socks4AsyncAuther | None = (
-            auther_wrapper(auther) if auther else None  # type: ignore[assignment]
+            auther_wrapper(auther, auth_executor) if auther else None  # type: ignore[assignment]
         )
         super().__init__(
             resolver=resolver,
@@ -173,12 +208,12 @@ class Socks4(
     async def __call__(
         self,
         client: Connection,
-    ) -> tuple[Address, str | None]:
+    ) -> tuple[list[Address], str | None]:
         """
         Handle SOCKS4 request.
 
         :param client: Client connection.
-        :return: Tuple of destination address and optional domain name.
+        :return: Tuple of destination address candidates and optional domain name.
         """
         request = await Socks4Request.from_client(client)
         if request.command is Socks4Command.BIND:
@@ -202,7 +237,7 @@ class Socks4(
                     username=request.username,
                     destination=request.destination,
                 )
-            return request.destination, None
+            return [request.destination], None
         if not (self._resolver and request.domain_name):
             await Socks4Response(
                 client=client,
@@ -210,27 +245,38 @@ class Socks4(
                 destination=request.destination,
             ).to_client()
             raise RejectError(address=request.destination)
-        if (
-            resolved := await self._resolver(
-                request.domain_name,
+        # the username picks the rules the domain name is checked with
+        await self._authorization(
+            client=client,
+            username=request.username,
+            destination=request.destination,
+        )
+        if not self._should_resolve(client, request.domain_name, request.destination.port):
+            await self.ruleset_reject(
+                client=client,
+                destination=request.destination,
             )
-        ) is None:
+            raise RejectError(address=request.destination)
+        resolved = await self._resolver(
+            request.domain_name,
+        )
+        # SOCKS4 replies carry IPv4 addresses only
+        destinations = [
+            Address(
+                ip=ip,
+                port=request.destination.port,
+            )
+            for ip in resolved or ()
+            if isinstance(ip, IPv4Address)
+        ]
+        if not destinations:
             await Socks4Response(
                 client=client,
                 reply=Socks4Reply.REJECTED,
                 destination=request.destination,
             ).to_client()
             raise RejectError(address=request.destination)
-        destination = Address(
-            ip=resolved,
-            port=request.destination.port,
-        )
-        await self._authorization(
-            client=client,
-            username=request.username,
-            destination=destination,
-        )
-        return destination, request.domain_name
+        return destinations, request.domain_name
 
     async def _authorization(
         self,
@@ -273,6 +319,7 @@ class Socks4(
             raise AuthorizationError(
                 username=username,
             )
+        client.username = username
         logger.info(f'{self} {username} authorized')
 
 
@@ -287,30 +334,32 @@ class Socks5(
         self,
         auther: Socks5Auther | Socks5AsyncAuther | None = None,
         resolver: Resolver | None = None,
+        auth_executor: Executor | None = None,
     ) -> None:
         """
         Initialize the SOCKS5 class.
 
         :param auther: Optional authorizer for SOCKS5.
         :param resolver: Optional resolver for domain name resolution.
+        :param auth_executor: Executor running a synchronous auther off the event loop, e.g. interpreter_pool().
         """
         super().__init__(
             resolver=resolver,
         )
         self._auther: Socks5AsyncAuther | None = (
-            auther_wrapper(auther) if auther else None  # type: ignore[assignment]
+            auther_wrapper(auther, auth_executor) if auther else None  # type: ignore[assignment]
         )
         self._allowed_auth_method = Socks5AuthMethod.USERNAME if auther else Socks5AuthMethod.NO_AUTHENTICATION
 
     async def __call__(
         self,
         client: Connection,
-    ) -> tuple[Address, str | None]:
+    ) -> tuple[list[Address], str | None]:
         """
         Handle SOCKS5 request.
 
         :param client: Client connection.
-        :return: Tuple of destination address and optional domain name.
+        :return: Tuple of destination address candidates and optional domain name.
         """
         greetings_request = await Socks5GreetingRequest.from_client(client)
         greetings_response = self._greetings(
@@ -331,10 +380,20 @@ class Socks5(
                 raise AuthorizationError(
                     username=authorization_request.username,
                 )
-        try:
-            data = await self._connect(
-                await Socks5ConnectionRequest.from_client(client),
+            client.username = authorization_request.username
+        request = await Socks5ConnectionRequest.from_client(client)
+        if request.domain_name is not None and not self._should_resolve(client, request.domain_name, request.port):
+            destination = Address(
+                ip=IPv4Address(0),
+                port=request.port,
+            )
+            await self.ruleset_reject(
+                client=client,
+                destination=destination,
             )
+            raise RejectError(address=destination)
+        try:
+            data = await self._connect(request)
         except RejectError as exc:
             await Socks5ConnectionResponse(
                 client=client,
@@ -345,6 +404,24 @@ class Socks5(
             raise
         return data
 
+    async def ruleset_reject(
+        self,
+        client: Connection,
+        destination: Address,
+    ) -> None:
+        """
+        Handle ruleset rejection.
+
+        :param client: Client connection.
+        :param destination: Destination address.
+        """
+        await Socks5ConnectionResponse(
+            client=client,
+            reply=Socks5ConnectionReply.CONNECTION_NOT_ALLOWED_BY_RULESET,
+            destination=destination.ip,
+            port=destination.port,
+        ).to_client()
+
     async def success(
         self,
         client: Connection,
@@ -430,17 +507,17 @@ class Socks5(
     async def _connect(
         self,
         request: Socks5ConnectionRequest,
-    ) -> tuple[Address, str | None]:
+    ) -> tuple[list[Address], str | None]:
         """
         Handle SOCKS5 connection request.
 
         :param request: SOCKS5 connection request.
-        :return: Tuple of destination address and optional domain name.
+        :return: Tuple of destination address candidates and optional domain name.
         """
         if request.domain_name is None:
             if request.destination is None:
                 raise RejectError
-            return request.destination, None
+            return [request.destination], None
         if self._resolver is None:
             raise RejectError
         if (
@@ -450,9 +527,12 @@ class Socks5(
         ) is None:
             raise RejectError
         return (
-            Address(
-                ip=resolved,
-                port=request.port,
-            ),
+            [
+                Address(
+                    ip=ip,
+                    port=request.port,
+                )
+                for ip in resolved
+            ],
             request.domain_name,
         )
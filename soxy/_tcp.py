@@ -1,11 +1,28 @@
 import asyncio
 import types
 import typing
+from collections import Counter
+from contextlib import suppress
 from ipaddress import IPv4Address, IPv6Address
 
 from soxy._logger import logger
-from soxy._session import Session
+from soxy._relay import BufferedSession, SpliceSession
+from soxy._session import PumpSession, Session
 from soxy._types import Address, Connection, Transport
+from soxy._utils import interleave_address_families
+
+_SESSIONS: dict[str, type[Session] | type[PumpSession] | type[BufferedSession] | type[SpliceSession]] = {
+    'stream': Session,
+    'pump': PumpSession,
+    'protocol': BufferedSession,
+    'splice': SpliceSession,
+}
+_CHUNK_SIZE_MIN = 1024
+_CHUNK_SIZE_MAX = 262144
+# default limit of asyncio streams, raised to the read chunk size ceiling
+_STREAM_LIMIT = 65536
+_IDLE_INTERVAL = 1.0
+_HAPPY_EYEBALLS_DELAY = 0.25
 
 
 class TCPConnection(
@@ -15,9 +32,15 @@ class TCPConnection(
         self,
         reader: asyncio.StreamReader,
         writer: asyncio.StreamWriter,
+        chunk_size_min: int = _CHUNK_SIZE_MIN,
+        chunk_size_max: int = _CHUNK_SIZE_MAX,
     ) -> None:
         self._reader = reader
         self._writer = writer
+        self._chunk_size_min = chunk_size_min
+        self._chunk_size_max = chunk_size_max
+        self._chunk_size = chunk_size_min
+        self._chunk_sizes: Counter[int] = Counter()
         peername = self._writer.get_extra_info('peername')
         if peername is None:
             msg = 'peername is not available'
@@ -49,19 +72,136 @@ class TCPConnection(
         except ConnectionError:
             return
 
+    @property
+    def reader(
+        self,
+    ) -> asyncio.StreamReader:
+        return self._reader
+
+    @property
+    def writer(
+        self,
+    ) -> asyncio.StreamWriter:
+        return self._writer
+
+    @property
+    def chunk_sizes(
+        self,
+    ) -> Counter[int]:
+        """
+        Number of reads made with every chunk size.
+        """
+        return self._chunk_sizes
+
     @classmethod
     async def open(
         cls,
         host: str,
         port: int,
+        chunk_size_min: int = _CHUNK_SIZE_MIN,
+        chunk_size_max: int = _CHUNK_SIZE_MAX,
     ) -> typing.Self:
-        reader, writer = await asyncio.open_connection(host, port)
-        return cls(reader, writer)
+        # a stream reader buffers about its limit before pausing the socket, so reads can't grow past it
+        reader, writer = await asyncio.open_connection(host, port, limit=max(chunk_size_max, _STREAM_LIMIT))
+        return cls(
+            reader,
+            writer,
+            chunk_size_min=chunk_size_min,
+            chunk_size_max=chunk_size_max,
+        )
+
+    @classmethod
+    async def open_any(
+        cls,
+        addresses: list[Address],
+        delay: float = _HAPPY_EYEBALLS_DELAY,
+        chunk_size_min: int = _CHUNK_SIZE_MIN,
+        chunk_size_max: int = _CHUNK_SIZE_MAX,
+    ) -> TCPConnection:
+        """
+        Connect to the first reachable address (Happy Eyeballs, RFC 8305).
+
+        Attempts start one after another with the given delay, alternating address
+        families, and the next attempt starts early when the previous one fails.
+        The first established connection wins, the rest are cancelled.
+        """
+        candidates = iter(interleave_address_families(addresses))
+        pending: set[asyncio.Task[TCPConnection]] = set()
+        errors: list[OSError] = []
+        winner: TCPConnection | None = None
+        try:
+            while winner is None:
+                if (address := next(candidates, None)) is not None:
+                    pending.add(
+                        asyncio.create_task(
+                            cls.open(
+                                host=str(address.ip),
+                                port=address.port,
+                                chunk_size_min=chunk_size_min,
+                                chunk_size_max=chunk_size_max,
+                            ),
+                        ),
+                    )
+                elif not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=delay if address is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                winner = _pick_connection(await asyncio.gather(*done, return_exceptions=True), errors)
+        finally:
+            for task in pending:
+                task.cancel()
+            # attempts that managed to connect while being cancelled are closed as well
+            if late := _pick_connection(await asyncio.gather(*pending, return_exceptions=True), errors):
+                late.writer.close()
+        if winner is None:
+            msg = f'all connection attempts failed: {", ".join(str(error) for error in errors)}'
+            raise OSError(msg)
+        return winner
 
     async def read(
         self,
     ) -> bytes:
-        return await self._reader.read(n=1024)
+        """
+        Read up to the current chunk size. The chunk size doubles while reads fill it
+        up to the ceiling and drops back to the floor after the connection was idle.
+        """
+        chunk_size = self._chunk_size
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        data = await self._reader.read(n=chunk_size)
+        self._chunk_sizes[chunk_size] += 1
+        if loop.time() - started_at >= _IDLE_INTERVAL:
+            self._chunk_size = self._chunk_size_min
+        elif len(data) == chunk_size:
+            self._chunk_size = min(chunk_size * 2, self._chunk_size_max)
+        return data
+
+    async def read_buffered(
+        self,
+    ) -> bytes:
+        """
+        Take bytes that are already received but not consumed yet without waiting for more.
+        """
+        try:
+            async with asyncio.timeout(0):
+                return await self._reader.read(n=self._chunk_size_max)
+        except TimeoutError:
+            return b''
+
+    async def read_exactly(
+        self,
+        n: int,
+    ) -> bytes:
+        return await self._reader.readexactly(n)
+
+    async def read_until(
+        self,
+        separator: bytes,
+    ) -> bytes:
+        return await self._reader.readuntil(separator)
 
     async def write(
         self,
@@ -71,17 +211,88 @@ class TCPConnection(
         await self._writer.drain()
 
 
+def _pick_connection(
+    results: typing.Iterable[TCPConnection | BaseException],
+    errors: list[OSError],
+) -> TCPConnection | None:
+    """
+    Take the first established connection out of finished attempts, close the others
+    and collect connect errors.
+    """
+    winner: TCPConnection | None = None
+    for connection in results:
+        if isinstance(connection, OSError):
+            errors.append(connection)
+        elif isinstance(connection, BaseException):
+            continue
+        elif winner is None:
+            winner = connection
+        else:
+            connection.writer.close()
+    return winner
+
+
+class _PendingConnection(
+    Connection,
+):
+    """
+    Stands for the remote connection while an optimistic connect is in flight.
+    """
+
+    def __init__(
+        self,
+        address: Address,
+    ) -> None:
+        self._address = address
+
+
 class TcpTransport(
     Transport,
 ):
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         host: str = '127.0.0.1',
         port: int = 1080,
+        *,
+        relay: str = 'stream',
+        chunk_size_min: int = _CHUNK_SIZE_MIN,
+        chunk_size_max: int = _CHUNK_SIZE_MAX,
+        optimistic_reply: bool = False,
+        happy_eyeballs_delay: float = _HAPPY_EYEBALLS_DELAY,
+        reuse_port: bool = False,
     ) -> None:
+        """
+        :param chunk_size_max: Ceiling of the read chunk size, also the limit of the stream readers,
+            which buffer up to twice the limit before they stop reading from the socket.
+        :param optimistic_reply: Send the success reply before the remote connection is established.
+            Client data is held in the connection buffer, which stops reading from the socket once
+            it exceeds the stream limit, until the remote is connected. If the connect fails
+            the client connection is closed.
+        :param happy_eyeballs_delay: Delay between connection attempts when a destination
+            resolves to several addresses.
+        :param reuse_port: Bind with SO_REUSEPORT, so several processes can listen on the address
+            and the kernel spreads incoming connections between them.
+        """
+        if not 0 < chunk_size_min <= chunk_size_max:
+            msg = f'invalid read chunk size bounds: {chunk_size_min}..{chunk_size_max}'
+            raise ValueError(msg)
+        if relay not in _SESSIONS:
+            msg = f'unsupported relay mode: {relay}'
+            raise ValueError(msg)
+        if relay == 'splice' and not SpliceSession.is_supported():
+            logger.warning('splice relay is not available on this platform, falling back to stream relay')
+            relay = 'stream'
         self._address = (host, port)
+        self._session_cls = _SESSIONS[relay]
+        self._chunk_size_min = chunk_size_min
+        self._chunk_size_max = chunk_size_max
+        self._optimistic_reply = optimistic_reply
+        self._happy_eyeballs_delay = happy_eyeballs_delay
+        self._reuse_port = reuse_port
         self._server: asyncio.Server | None = None
-        self._on_client_connected_cb: typing.Callable[[Connection], typing.Awaitable[Address | None]] | None = None
+        self._on_client_connected_cb: typing.Callable[[Connection], typing.Awaitable[list[Address] | None]] | None = (
+            None
+        )
         self._start_messaging_cb: typing.Callable[[Connection, Connection], typing.Awaitable[None]] | None = None
         self._on_remote_unreachable_cb: typing.Callable[[Connection, Address], typing.Awaitable[None]] | None = None
 
@@ -89,7 +300,7 @@ class TcpTransport(
         self,
         on_client_connected_cb: typing.Callable[
             [Connection],
-            typing.Awaitable[Address | None],
+            typing.Awaitable[list[Address] | None],
         ],
         start_messaging_cb: typing.Callable[
             [Connection, Connection],
@@ -111,6 +322,8 @@ class TcpTransport(
             client_connected_cb=self._client_cb,
             host=self._address[0],
             port=self._address[1],
+            limit=max(self._chunk_size_max, _STREAM_LIMIT),
+            reuse_port=self._reuse_port,
         )
         return self._server
 
@@ -139,37 +352,82 @@ class TcpTransport(
         async with TCPConnection(
             reader=reader,
             writer=writer,
+            chunk_size_min=self._chunk_size_min,
+            chunk_size_max=self._chunk_size_max,
         ) as client:
             try:
-                if not (destination := await self._on_client_connected_cb(client)):
+                if not (destinations := await self._on_client_connected_cb(client)):
                     return
             except Exception:  # noqa: BLE001
                 logger.exception('Error in on_client_connected_cb')
                 return
+            destination = destinations[0]
+            connecting = asyncio.create_task(
+                TCPConnection.open_any(
+                    addresses=destinations,
+                    delay=self._happy_eyeballs_delay,
+                    chunk_size_min=self._chunk_size_min,
+                    chunk_size_max=self._chunk_size_max,
+                ),
+            )
+            if self._optimistic_reply and not await self._start_messaging(client, _PendingConnection(destination)):
+                connecting.cancel()
+                with suppress(asyncio.CancelledError, OSError):
+                    async with await connecting:
+                        pass
+                return
             try:
-                async with await TCPConnection.open(
-                    host=str(destination.ip),
-                    port=destination.port,
-                ) as remote:
-                    try:
-                        await self._start_messaging_cb(client, remote)
-                    except Exception:  # noqa: BLE001
-                        logger.exception('Error in start_messaging_cb')
-                        return
-                    try:
-                        async with Session(
-                            client=client,
-                            remote=remote,
-                        ) as session:
-                            await session.start()
-                    except Exception:  # noqa: BLE001
-                        logger.exception('Session error')
+                async with await connecting as remote:
+                    await self._relay(client, remote)
             except OSError:
+                if self._optimistic_reply:
+                    logger.info(
+                        f'{client} remote {destination.ip}:{destination.port} unreachable after optimistic reply',
+                    )
+                    return
                 try:
                     await self._on_remote_unreachable_cb(client, destination)
                 except Exception:  # noqa: BLE001
                     logger.exception('Error in on_remote_unreachable_cb')
-                return
             except Exception:  # noqa: BLE001
                 logger.exception('Connection error')
-                return
+
+    async def _relay(
+        self,
+        client: TCPConnection,
+        remote: TCPConnection,
+    ) -> None:
+        # data sent by the client right after its request goes out without waiting for the reply
+        if early_data := await client.read_buffered():
+            await remote.write(early_data)
+        if not self._optimistic_reply and not await self._start_messaging(client, remote):
+            return
+        try:
+            async with self._session_cls(
+                client=client,
+                remote=remote,
+            ) as session:
+                await session.start()
+        except Exception:  # noqa: BLE001
+            logger.exception('Session error')
+        # protocol and splice relays don't read through the stream readers
+        if client.chunk_sizes or remote.chunk_sizes:
+            logger.info(
+                f'{client} read chunk sizes: {dict(client.chunk_sizes)}, '
+                f'{remote} read chunk sizes: {dict(remote.chunk_sizes)}',
+            )
+
+    async def _start_messaging(
+        self,
+        client: Connection,
+        remote: Connection,
+    ) -> bool:
+        if self._start_messaging_cb is None:
+            msg = f'please initialize {self.__class__.__name__}'
+            raise RuntimeError(msg)
+        try:
+            await self._start_messaging_cb(client, remote)
+        except Exception:  # noqa: BLE001
+            logger.exception('Error in start_messaging_cb')
+            return False
+        return True
@@ -0,0 +1,162 @@
+import typing
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network, ip_network
+
+from soxy._utils import normalize_domain_name
+
+if typing.TYPE_CHECKING:
+    from soxy._types import IPvAnyAddress, IPvAnyNetwork
+
+_T = typing.TypeVar('_T')
+_IPV4_BITS = 32
+_IPV6_BITS = 128
+
+
+class PrefixTrie(
+    typing.Generic[_T],  # noqa: UP046
+):
+    """
+    Maps networks of one address family to values, keyed by integer network prefixes.
+
+    Only populated prefix lengths are kept as levels of the trie, each one a dict from the
+    masked integer address to the value, so a lookup costs one probe per populated prefix
+    length (at most 33 for IPv4 and 129 for IPv6) whatever the number of networks.
+    """
+
+    def __init__(
+        self,
+        max_prefixlen: int,
+    ) -> None:
+        self._max_prefixlen = max_prefixlen
+        self._levels: dict[int, dict[int, _T]] = {}
+        # (shift, level) pairs from the shortest prefix to the longest one
+        self._probes: list[tuple[int, dict[int, _T]]] = []
+
+    def __len__(
+        self,
+    ) -> int:
+        return sum(len(level) for level in self._levels.values())
+
+    def setdefault(
+        self,
+        network: IPv4Network | IPv6Network,
+        default: _T,
+    ) -> _T:
+        if (level := self._levels.get(network.prefixlen)) is None:
+            level = self._levels[network.prefixlen] = {}
+            self._probes = [
+                (self._max_prefixlen - prefixlen, self._levels[prefixlen]) for prefixlen in sorted(self._levels)
+            ]
+        shift = self._max_prefixlen - network.prefixlen
+        return level.setdefault(int(network.network_address) >> shift, default)
+
+    def match(
+        self,
+        address: IPv4Address | IPv6Address,
+    ) -> typing.Iterator[_T]:
+        """
+        Values of all networks containing the address, from the shortest prefix to the longest one.
+        """
+        value = int(address)
+        for shift, level in self._probes:
+            if (found := level.get(value >> shift)) is not None:
+                yield found
+
+
+class AddressIndex(
+    typing.Generic[_T],  # noqa: UP046
+):
+    """
+    Prefix tries for both address families. Addresses are stored as host networks.
+    """
+
+    def __init__(
+        self,
+    ) -> None:
+        self._tries: dict[int, PrefixTrie[_T]] = {
+            4: PrefixTrie(_IPV4_BITS),
+            6: PrefixTrie(_IPV6_BITS),
+        }
+
+    def __len__(
+        self,
+    ) -> int:
+        return sum(len(trie) for trie in self._tries.values())
+
+    def setdefault(
+        self,
+        addresses: IPvAnyAddress | IPvAnyNetwork,
+        default: _T,
+    ) -> _T:
+        network = ip_network(addresses)
+        return self._tries[network.version].setdefault(network, default)
+
+    def match(
+        self,
+        address: IPvAnyAddress,
+    ) -> typing.Iterator[_T]:
+        return self._tries[address.version].match(address)
+
+
+class DomainIndex(
+    typing.Generic[_T],  # noqa: UP046
+):
+    """
+    Maps domain patterns to values: "example.com" for the name itself, "*.example.com" for
+    its subdomains and ".example.com" for both.
+
+    Patterns are kept in two dicts keyed by the domain, so a lookup hashes the name and each
+    of its parent domains once, however many patterns are stored.
+    """
+
+    def __init__(
+        self,
+    ) -> None:
+        self._names: dict[str, _T] = {}
+        self._subdomains: dict[str, _T] = {}
+
+    def __len__(
+        self,
+    ) -> int:
+        return len(self._names) + len(self._subdomains)
+
+    def buckets(
+        self,
+        pattern: str,
+        factory: typing.Callable[[], _T],
+    ) -> list[_T]:
+        """
+        Values stored for the pattern, created by the factory when missing. A ".example.com"
+        pattern has separate values for the name and for its subdomains, so a pattern for only
+        one of them added to the same domain doesn't leak into the other.
+        """
+        pattern = normalize_domain_name(pattern)
+        if pattern.startswith('*.'):
+            targets = [(self._subdomains, pattern[2:])]
+        elif pattern.startswith('.'):
+            targets = [(self._names, pattern[1:]), (self._subdomains, pattern[1:])]
+        else:
+            targets = [(self._names, pattern)]
+        buckets = []
+        for values, key in targets:
+            if (bucket := values.get(key)) is None:
+                bucket = values[key] = factory()
+            buckets.append(bucket)
+        return buckets
+
+    def match(
+        self,
+        domain_name: str,
+    ) -> typing.Iterator[_T]:
+        """
+        Values of all patterns matching the domain name, the exact name first.
+        """
+        domain_name = normalize_domain_name(domain_name)
+        if (found := self._names.get(domain_name)) is not None:
+            yield found
+        if not self._subdomains:
+            return
+        parent = domain_name
+        while (dot := parent.find('.')) != -1:
+            parent = parent[dot + 1 :]
+            if (found := self._subdomains.get(parent)) is not None:
+                yield found
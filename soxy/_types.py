@@ -4,8 +4,6 @@ import types
 import typing
 from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
 
-Resolver: typing.TypeAlias = typing.Callable[[str], IPv4Address | typing.Awaitable[IPv4Address]]
-
 Socks4Auther: typing.TypeAlias = typing.Callable[[str], bool]
 Socks4AsyncAuther: typing.TypeAlias = typing.Callable[[str], typing.Awaitable[bool]]
 
@@ -15,6 +13,9 @@ Socks5AsyncAuther: typing.TypeAlias = typing.Callable[[str, str], typing.Awaitab
 IPvAnyAddress: typing.TypeAlias = IPv4Address | IPv6Address
 IPvAnyNetwork: typing.TypeAlias = IPv4Network | IPv6Network
 
+ResolverResult: typing.TypeAlias = IPvAnyAddress | typing.Sequence[IPvAnyAddress]
+Resolver: typing.TypeAlias = typing.Callable[[str], ResolverResult | typing.Awaitable[ResolverResult]]
+
 
 class SocksVersions(
     enum.IntEnum,
@@ -96,6 +97,7 @@ class Connection(
     typing.Protocol,
 ):
     _address: Address
+    _username: str | None = None
 
     def __repr__(
         self,
@@ -108,6 +110,22 @@ class Connection(
     ) -> Address:
         return self._address
 
+    @property
+    def username(
+        self,
+    ) -> str | None:
+        """
+        Username the client authorized with, None until it is authorized or without authorization.
+        """
+        return self._username
+
+    @username.setter
+    def username(
+        self,
+        value: str | None,
+    ) -> None:
+        self._username = value
+
     @classmethod
     async def open(
         cls,
@@ -117,6 +135,14 @@ class Connection(
     async def read(
         self,
     ) -> bytes: ...
+    async def read_exactly(
+        self,
+        n: int,
+    ) -> bytes: ...
+    async def read_until(
+        self,
+        separator: bytes,
+    ) -> bytes: ...
     async def write(
         self,
         data: bytes,
@@ -130,7 +156,7 @@ class Transport(
         self,
         on_client_connected_cb: typing.Callable[
             [Connection],
-            typing.Awaitable[Address | None],
+            typing.Awaitable[list[Address] | None],
         ],
         start_messaging_cb: typing.Callable[
             [Connection, Connection],
@@ -165,10 +191,15 @@ class ProxySocks(
     ) -> str:
         return f'<soxy.{self.__class__.__name__}>'
 
+    def init(
+        self,
+        should_allow_domain_cb: typing.Callable[[Connection, str, int], bool],
+    ) -> None: ...
+
     async def __call__(
         self,
         client: Connection,
-    ) -> tuple[Address, str | None]: ...
+    ) -> tuple[list[Address], str | None]: ...
 
     async def ruleset_reject(
         self,
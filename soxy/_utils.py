@@ -1,23 +1,80 @@
 from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
-from typing import TYPE_CHECKING
+from itertools import chain, zip_longest
+from typing import TYPE_CHECKING, TypeAlias
 
 from soxy._errors import PackageError
+from soxy._geoip import GeoIPSet
+from soxy._ranges import IPRangeSet
 
 if TYPE_CHECKING:
-    from soxy._types import Address, IPvAnyAddress, IPvAnyNetwork, SocksVersions
+    from soxy._types import Address, IPvAnyAddress, IPvAnyNetwork, ResolverResult, SocksVersions
+
+# addresses of a rule looked up by the set itself instead of prefix tries
+AddressSet: TypeAlias = IPRangeSet | GeoIPSet
 
 
 def match_addresses(
     address: Address,
-    match_with: IPvAnyAddress | IPvAnyNetwork,
+    match_with: IPvAnyAddress | IPvAnyNetwork | AddressSet,
 ) -> bool:
     if isinstance(match_with, IPv4Address | IPv6Address):
         return address.ip == match_with
-    if isinstance(match_with, IPv4Network | IPv6Network):
+    if isinstance(match_with, IPv4Network | IPv6Network | AddressSet):
         return address.ip in match_with
     return False
 
 
+def normalize_domain_name(
+    domain_name: str,
+) -> str:
+    return domain_name.lower().rstrip('.')
+
+
+def match_domain(
+    domain_name: str,
+    pattern: str,
+) -> bool:
+    """
+    Match a domain name against a rule pattern: "example.com" matches the name itself,
+    "*.example.com" any of its subdomains and ".example.com" the name and its subdomains.
+    """
+    domain_name = normalize_domain_name(domain_name)
+    pattern = normalize_domain_name(pattern)
+    if pattern.startswith('*.'):
+        return domain_name.endswith(pattern[1:])
+    if pattern.startswith('.'):
+        return domain_name == pattern[1:] or domain_name.endswith(pattern)
+    return domain_name == pattern
+
+
+def interleave_address_families(
+    addresses: list[Address],
+) -> list[Address]:
+    """
+    Order addresses alternating IPv6 and IPv4 (RFC 8305, section 4),
+    starting with the family of the first address.
+    """
+    if not addresses:
+        return []
+    first_version = addresses[0].ip.version
+    first = [address for address in addresses if address.ip.version == first_version]
+    second = [address for address in addresses if address.ip.version != first_version]
+    return [address for address in chain.from_iterable(zip_longest(first, second)) if address is not None]
+
+
+def resolver_result_to_list(
+    result: ResolverResult,
+) -> list[IPvAnyAddress]:
+    """
+    Normalise a resolver result, which is either an address or a sequence of addresses, to a list.
+    """
+    addresses = [result] if isinstance(result, IPv4Address | IPv6Address) else list(result)
+    if not all(isinstance(address, IPv4Address | IPv6Address) for address in addresses):
+        msg = f'unexpected resolver result: {result!r}'
+        raise TypeError(msg)
+    return addresses
+
+
 def port_from_bytes(
     data: bytes,
 ) -> int:
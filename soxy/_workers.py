@@ -0,0 +1,225 @@
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+import types
+import typing
+from contextlib import suppress
+
+from soxy._logger import logger
+
+if typing.TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+    from soxy._proxy import Proxy
+
+_MIN_UPTIME = 5.0
+_RESTART_DELAY = 1.0
+_STOP_TIMEOUT = 10.0
+_STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+# platforms without these signals (Windows) have no SO_REUSEPORT and never run workers
+_FORWARDED_SIGNALS = tuple(getattr(signal, name) for name in ('SIGHUP', 'SIGUSR1') if hasattr(signal, name))
+
+
+class Supervisor:
+    """
+    Runs worker processes and restarts the ones that exit, until SIGTERM or SIGINT stops it.
+
+    SIGHUP and SIGUSR1 are forwarded to every worker, stop signals are passed on as SIGTERM.
+    Workers still running stop_timeout seconds later are killed. Workers exiting right after
+    they were started are restarted with a delay, so a broken configuration doesn't turn into
+    a fork loop.
+    """
+
+    def __init__(
+        self,
+        target: typing.Callable[..., object],
+        args: tuple[typing.Any, ...] = (),
+        workers: int = 1,
+        stop_timeout: float = _STOP_TIMEOUT,
+    ) -> None:
+        """
+        :param target: Module level function run by every worker, it must be picklable.
+        :param workers: Number of worker processes.
+        :param stop_timeout: Seconds workers have to exit after a stop signal before they get SIGKILL.
+        """
+        if workers < 1:
+            msg = f'invalid number of workers: {workers}'
+            raise ValueError(msg)
+        self._target = target
+        self._args = args
+        self._workers = workers
+        self._stop_timeout = stop_timeout
+        self._processes: dict[BaseProcess, float] = {}
+        self._stopping = False
+        self._kill_at: float | None = None
+        # signal handlers write here to wake the supervisor up, waits are restarted after signals
+        self._wakeup: tuple[int, int] | None = None
+        self.restarts = 0
+
+    def run(
+        self,
+    ) -> None:
+        self._wakeup = os.pipe()
+        os.set_blocking(self._wakeup[1], False)
+        handlers = {signum: signal.signal(signum, self._on_signal) for signum in _STOP_SIGNALS + _FORWARDED_SIGNALS}
+        try:
+            for _ in range(self._workers):
+                self._start()
+            while self._processes:
+                self._wait()
+                for process in [process for process in self._processes if not process.is_alive()]:
+                    started_at = self._processes.pop(process)
+                    process.join()
+                    if self._stopping:
+                        continue
+                    logger.error(f'🥹: worker {process.pid} exited with code {process.exitcode}, restarting')
+                    if time.monotonic() - started_at < _MIN_UPTIME:
+                        time.sleep(_RESTART_DELAY)
+                    if not self._stopping:
+                        self.restarts += 1
+                        self._start()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
+
+    def _wait(
+        self,
+    ) -> None:
+        """
+        Wait until a worker exits or a signal arrives, kill the workers when the stop timeout runs out.
+        """
+        if self._wakeup is None:
+            raise RuntimeError
+        timeout = None if self._kill_at is None else max(self._kill_at - time.monotonic(), 0)
+        ready = multiprocessing.connection.wait(
+            [self._wakeup[0], *(process.sentinel for process in self._processes)],
+            timeout=timeout,
+        )
+        if self._wakeup[0] in ready:
+            os.read(self._wakeup[0], 512)
+        if self._kill_at is not None and time.monotonic() >= self._kill_at:
+            self._kill()
+
+    def _start(
+        self,
+    ) -> None:
+        process = multiprocessing.Process(target=_run_worker, args=(self._target, self._args))
+        process.start()
+        self._processes[process] = time.monotonic()
+        logger.info(f'worker {process.pid} started')
+
+    def _on_signal(
+        self,
+        signum: int,
+        frame: types.FrameType | None,  # noqa: ARG002
+    ) -> None:
+        if signum in _STOP_SIGNALS:
+            self._stopping = True
+            if self._kill_at is None:
+                self._kill_at = time.monotonic() + self._stop_timeout
+            signum = signal.SIGTERM
+        for process in self._processes:
+            if process.pid is not None:
+                os.kill(process.pid, signum)
+        if self._wakeup is not None:
+            with suppress(BlockingIOError):
+                os.write(self._wakeup[1], b'\0')
+
+    def _kill(
+        self,
+    ) -> None:
+        self._kill_at = None
+        for process in self._processes:
+            if process.is_alive():
+                logger.error(f'🥹: worker {process.pid} did not stop in {self._stop_timeout}s, killing it')
+                process.kill()
+
+
+def _run_worker(
+    target: typing.Callable[..., object],
+    args: tuple[typing.Any, ...],
+) -> None:
+    # the supervisor decides when workers stop, and forwarded signals must not kill
+    # a worker before it installs its own handlers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for signum in _FORWARDED_SIGNALS:
+        signal.signal(signum, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(*args)
+
+
+class LoopThread:
+    """
+    Serves a proxy on an event loop running in a thread of its own.
+
+    Loops of a process accept connections from their own SO_REUSEPORT sockets and share the
+    ruleset, authers and resolver caches. On free-threaded Python builds they run on several
+    cores in parallel, without a copy of the ruleset in every process.
+    """
+
+    def __init__(
+        self,
+        proxy: Proxy,
+    ) -> None:
+        self.proxy = proxy
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping: asyncio.Event | None = None
+        self._started = threading.Event()
+        self._error: OSError | None = None
+        self._thread = threading.Thread(target=self._run, name=f'soxy-loop-{id(self)}', daemon=True)
+
+    def start(
+        self,
+    ) -> None:
+        """
+        Start the thread and wait until the proxy listens, errors of binding the address are raised here.
+        """
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+    def stop(
+        self,
+    ) -> None:
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+
+    def call_soon(
+        self,
+        callback: typing.Callable[..., object],
+        *args: typing.Any,  # noqa: ANN401
+    ) -> None:
+        """
+        Run the callback in the loop of the thread, e.g. to reload the proxy between its callbacks.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _run(
+        self,
+    ) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(
+        self,
+    ) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            async with self.proxy:
+                self._started.set()
+                await self._stopping.wait()
+        except OSError as exc:
+            self._error = exc
+        finally:
+            self._started.set()
@@ -1,30 +1,43 @@
+import asyncio
+import functools
 import inspect
 import typing
-from ipaddress import IPv4Address
 
 from soxy._logger import logger
 from soxy._types import (
+    IPvAnyAddress,
     Resolver,
+    ResolverResult,
     Socks4AsyncAuther,
     Socks4Auther,
     Socks5AsyncAuther,
     Socks5Auther,
 )
+from soxy._utils import normalize_domain_name, resolver_result_to_list
+
+if typing.TYPE_CHECKING:
+    from concurrent.futures import Executor
 
 
 def auther_wrapper(
     _func: Socks4Auther | Socks5Auther | Socks4AsyncAuther | Socks5AsyncAuther,
+    executor: Executor | None = None,
 ) -> Socks4AsyncAuther | Socks5AsyncAuther:
     async def _inner(
         *args: str,
         **kwargs: str,
     ) -> bool:
         try:
-            result: bool = (
-                await _func(*args, **kwargs)  # type: ignore[assignment]
-                if inspect.iscoroutinefunction(_func)
-                else _func(*args, **kwargs)
-            )
+            if inspect.iscoroutinefunction(_func):
+                result: bool = await _func(*args, **kwargs)  # type: ignore[assignment]
+            elif executor is not None:
+                # slow synchronous checks don't hold up other connections of the event loop
+                result = await asyncio.get_running_loop().run_in_executor(
+                    executor,
+                    functools.partial(_func, *args, **kwargs),  # type: ignore[arg-type]
+                )
+            else:
+                result = _func(*args, **kwargs)  # type: ignore[assignment]
         except Exception as exc:  # noqa: BLE001
             logger.exception('Error in auther_wrapper', exc_info=exc)
             result = False
@@ -35,17 +48,36 @@ def auther_wrapper(
 
 def resolver_wrapper(
     _func: Resolver,
-) -> typing.Callable[[str], typing.Awaitable[IPv4Address | None]]:
-    async def _inner(
+) -> typing.Callable[[str], typing.Awaitable[list[IPvAnyAddress] | None]]:
+    # concurrent lookups of the same name share a single call of the resolver, per event loop
+    # as tasks can't be awaited from loops of other threads
+    pending: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Task[list[IPvAnyAddress] | None]] = {}
+
+    async def _resolve(
         name: str,
-    ) -> IPv4Address | None:
+    ) -> list[IPvAnyAddress] | None:
         try:
-            result: IPv4Address | None = (
-                await _func(name) if inspect.iscoroutinefunction(_func) else _func(name)  # type: ignore[assignment]
-            )
+            result: ResolverResult = _func(name)  # type: ignore[assignment]
+            # callable objects such as CachingResolver are not coroutine functions themselves
+            if inspect.isawaitable(result):
+                result = await result
+            addresses = resolver_result_to_list(result)
         except Exception as exc:  # noqa: BLE001
             logger.exception('Error in resolver_wrapper', exc_info=exc)
             return None
-        return result
+        return addresses or None
+
+    async def _inner(
+        name: str,
+    ) -> list[IPvAnyAddress] | None:
+        # the same normalisation as CachingResolver, so spellings of one name share the lookup
+        key = (asyncio.get_running_loop(), normalize_domain_name(name))
+        if (task := pending.get(key)) is None:
+            task = asyncio.create_task(_resolve(name))
+            pending[key] = task
+            task.add_done_callback(lambda _: pending.pop(key, None))
+        # a cancelled waiter must not cancel the lookup the others are waiting for
+        addresses = await asyncio.shield(task)
+        return list(addresses) if addresses is not None else None
 
     return _inner
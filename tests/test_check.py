@@ -0,0 +1,85 @@
+import io
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+
+import pytest
+
+from soxy import Address, Config
+from soxy._check import Flow, compile_ruleset, read_flows, replay
+
+CONFIG = b"""
+[transport]
+port = 1080
+[[ruleset.connecting.allow]]
+from = "0.0.0.0/0"
+[[ruleset.proxying.allow]]
+from = "192.168.0.0/16"
+to = "0.0.0.0/0"
+[[ruleset.proxying.block]]
+from = "0.0.0.0/0"
+to = "*.blocked.com"
+[[ruleset.users.alice.proxying.allow]]
+from = "0.0.0.0/0"
+to = "10.0.0.0/8"
+"""
+
+
+def test_read_flows(tmp_path: Path) -> None:
+    path = tmp_path / 'flows.txt'
+    path.write_text(
+        '# client destination domain\n192.168.1.1 1.1.1.1:443 one.one.one.one\n\nalice@10.0.0.1 [2001:db8::1]:80\n',
+    )
+    flows = read_flows(path)
+    assert flows == [
+        Flow(IPv4Address('192.168.1.1'), Address(IPv4Address('1.1.1.1'), 443), 'one.one.one.one'),
+        Flow(IPv4Address('10.0.0.1'), Address(IPv6Address('2001:db8::1'), 80), username='alice'),
+    ]
+    assert [str(flow) for flow in flows] == [
+        '192.168.1.1 1.1.1.1:443 one.one.one.one',
+        'alice@10.0.0.1 [2001:db8::1]:80',
+    ]
+
+    path.write_text('192.168.1.1 1.1.1.1:443\n192.168.1.1 1.1.1.1\n')
+    with pytest.raises(ValueError, match=r'flows\.txt:2: invalid destination'):
+        read_flows(path)
+
+
+def test_replay() -> None:
+    compiled = compile_ruleset(Config.load(io.BytesIO(CONFIG)))
+    assert compiled.seconds > 0
+    assert compiled.memory > 0
+    assert compiled.mapped == 0
+    destination = Address(IPv4Address('10.1.1.1'), 443)
+    flows = [
+        Flow(IPv4Address('192.168.1.1'), destination),
+        Flow(IPv4Address('172.16.1.1'), destination),
+        Flow(IPv4Address('192.168.1.1'), destination, 'www.blocked.com'),
+        Flow(IPv4Address('172.16.1.1'), destination, username='alice'),
+        Flow(IPv4Address('172.16.1.1'), Address(IPv4Address('1.1.1.1'), 443), username='alice'),
+    ]
+    assert replay(compiled.ruleset, flows) == [True, False, False, True, False]
+    # blocked domains are decided before resolution, like the proxy does
+    assert compiled.ruleset.rule_hits()['block_proxying'][0][1] == 1
+
+
+def test_replay_connecting_blocked() -> None:
+    config = CONFIG + b'[[ruleset.connecting.block]]\nfrom = "192.168.2.0/24"\n'
+    compiled = compile_ruleset(Config.load(io.BytesIO(config)))
+    destination = Address(IPv4Address('10.1.1.1'), 443)
+    flows = [
+        Flow(IPv4Address('192.168.1.1'), destination),
+        Flow(IPv4Address('192.168.2.1'), destination),
+        Flow(IPv4Address('192.168.2.1'), destination, 'example.com'),
+    ]
+    assert replay(compiled.ruleset, flows) == [True, False, False]
+    assert compiled.ruleset.rule_hits()['block_connecting'][0][1] == 2
+    assert compiled.ruleset.rule_hits()['allow_proxying'][0][1] == 1
+
+
+def test_compile_ruleset_range_files(tmp_path: Path) -> None:
+    blocklist = tmp_path / 'blocklist.txt'
+    blocklist.write_text('\n'.join(f'10.{index // 256}.{index % 256}.0/24' for index in range(0, 2048, 2)))
+    config = CONFIG + f'[[ruleset.proxying.block]]\nfrom = "0.0.0.0/0"\nto_file = "{blocklist}"\n'.encode()
+    compiled = compile_ruleset(Config.load(io.BytesIO(config)))
+    assert compiled.mapped == (tmp_path / 'blocklist.txt.ranges').stat().st_size
+    assert compiled.mapped > 1024 * 8
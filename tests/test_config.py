@@ -1,9 +1,17 @@
+import base64
+import concurrent.futures
+import hashlib
 import io
+import pickle
+from ipaddress import IPv4Network
 from pathlib import Path
 
 import pytest
 
 from soxy._config import Config, ConfigError
+from soxy._dns import DnsResolver
+from soxy._ranges import IPRangeSet
+from soxy._resolvers import CachingResolver
 from soxy._socks import Socks4, Socks5
 from soxy._tcp import TcpTransport
 
@@ -106,3 +114,280 @@ def test_invalid_proxy_section() -> None:
     """
     with pytest.raises(ConfigError, match='Invalid proxy configuration'):
         Config.load(io.BytesIO(config_data.encode()))
+
+
+def test_invalid_transport_chunk_sizes() -> None:
+    config_data = """
+    [transport]
+    port = 1080
+    chunk_size_min = 65536
+    chunk_size_max = 1024
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    proxying = { allow = [], block = [] }
+    """
+    config = Config.load(io.BytesIO(config_data.encode()))
+    with pytest.raises(ConfigError, match='Invalid transport configuration'):
+        _ = config.transport
+
+
+def test_resolver_cache_config() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5h"
+    resolver_cache = { max_size = 16, ttl = 30 }
+    [transport]
+    port = 1080
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    proxying = { allow = [], block = [] }
+    """
+    config = Config.load(io.BytesIO(config_data.encode()))
+    assert isinstance(config._create_resolver(), CachingResolver)  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace('max_size = 16', 'max_size = 0').encode()))
+    assert not isinstance(config._create_resolver(), CachingResolver)  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace('ttl = 30', 'ttl = "long"').encode()))
+    with pytest.raises(ConfigError, match='Invalid resolver cache configuration'):
+        config.socks  # noqa: B018
+
+
+def test_dns_resolver_config() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5h"
+    resolver = "dns"
+    resolver_cache = { max_size = 0 }
+    dns = { nameservers = ["127.0.0.1:5353"], timeout = 1 }
+    [transport]
+    port = 1080
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    proxying = { allow = [], block = [] }
+    """
+    config = Config.load(io.BytesIO(config_data.encode()))
+    assert isinstance(config._create_resolver(), DnsResolver)  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace('timeout = 1', 'retries = 1').encode()))
+    with pytest.raises(ConfigError, match='Invalid dns resolver configuration'):
+        config.socks  # noqa: B018
+
+    config = Config.load(io.BytesIO(config_data.replace('resolver = "dns"', 'resolver = "doh"').encode()))
+    with pytest.raises(ConfigError, match='Unsupported resolver'):
+        config.socks  # noqa: B018
+
+
+def test_proxying_rule_destination_list() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    [[ruleset.proxying.block]]
+    from = "0.0.0.0/0"
+    to = ["*.ads.com", "tracker.net", "10.0.0.0/8"]
+    """
+    config = Config.load(io.BytesIO(config_data.encode()))
+    rules = config.ruleset._block_proxying_rules  # noqa: SLF001
+    assert [rule.to_addresses for rule in rules] == ['*.ads.com', 'tracker.net', IPv4Network('10.0.0.0/8')]
+
+
+def test_range_file_rules(tmp_path: Path) -> None:
+    blocklist = tmp_path / 'blocklist.txt'
+    blocklist.write_text('10.0.0.0/8\n')
+    config_data = f"""
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [[ruleset.connecting.block]]
+    from_file = "{blocklist}"
+    [[ruleset.proxying.block]]
+    from = "0.0.0.0/0"
+    to_file = "{blocklist}"
+    """
+    ruleset = Config.load(io.BytesIO(config_data.encode())).ruleset
+    assert isinstance(ruleset._block_connecting_rules[0].from_addresses, IPRangeSet)  # noqa: SLF001
+    assert isinstance(ruleset._block_proxying_rules[0].to_addresses, IPRangeSet)  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace(str(blocklist), str(tmp_path / 'missing.txt')).encode()))
+    with pytest.raises(ConfigError, match='Invalid range file'):
+        config.ruleset  # noqa: B018
+
+
+def test_decision_cache_config() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [ruleset]
+    decision_cache_size = 128
+    connecting = { allow = [], block = [] }
+    proxying = { allow = [], block = [] }
+    """
+    ruleset = Config.load(io.BytesIO(config_data.encode())).ruleset
+    assert ruleset._decisions is not None  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace('128', '-1').encode()))
+    with pytest.raises(ConfigError, match='Invalid decision cache size'):
+        config.ruleset  # noqa: B018
+
+
+def test_proxying_rule_ports() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    [[ruleset.proxying.allow]]
+    from = "0.0.0.0/0"
+    to = ["0.0.0.0/0", "example.com"]
+    ports = [80, 443, "8000-8100"]
+    """
+    rules = Config.load(io.BytesIO(config_data.encode())).ruleset._allow_proxying_rules  # noqa: SLF001
+    assert [repr(rule.ports) for rule in rules] == ['80,443,8000-8100'] * 2
+
+    for ports in ('[0]', '["80-"]', '[true]', '[80.5]'):
+        config = Config.load(io.BytesIO(config_data.replace('[80, 443, "8000-8100"]', ports).encode()))
+        with pytest.raises(ConfigError, match='Invalid ports'):
+            config.ruleset  # noqa: B018
+
+
+def test_geoip_rules(tmp_path: Path) -> None:
+    countries = tmp_path / 'country.csv'
+    countries.write_text('10.0.0.0,10.0.0.255,NL\n')
+    asns = tmp_path / 'asn.csv'
+    asns.write_text('8.8.8.0/24,15169,GOOGLE\n')
+    config_data = f"""
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [ruleset.geoip]
+    country = "{countries}"
+    asn = "{asns}"
+    [[ruleset.connecting.allow]]
+    from_geoip = {{ country = ["NL", "BE"] }}
+    [[ruleset.proxying.block]]
+    from = "0.0.0.0/0"
+    to_geoip = {{ country = "NL", asn = [15169] }}
+    """
+    ruleset = Config.load(io.BytesIO(config_data.encode())).ruleset
+    assert [repr(rule.from_addresses) for rule in ruleset._allow_connecting_rules] == ['geoip BE,NL']  # noqa: SLF001
+    assert [repr(rule.to_addresses) for rule in ruleset._block_proxying_rules] == ['geoip NL', 'geoip 15169']  # noqa: SLF001
+
+    config = Config.load(io.BytesIO(config_data.replace('asn = [', 'city = [').encode()))
+    with pytest.raises(ConfigError, match='Unknown geoip database city'):
+        config.ruleset  # noqa: B018
+    config = Config.load(io.BytesIO(config_data.replace(str(asns), str(tmp_path / 'missing.csv')).encode()))
+    with pytest.raises(ConfigError, match='Invalid geoip database asn'):
+        config.ruleset  # noqa: B018
+
+
+def test_user_rules() -> None:
+    config_data = """
+    [proxy]
+    protocol = "socks5"
+    [transport]
+    port = 1080
+    [ruleset]
+    connecting = { allow = [], block = [] }
+    proxying = { allow = [], block = [] }
+    [[ruleset.users.alice.proxying.allow]]
+    from = "0.0.0.0/0"
+    to = "10.0.0.0/8"
+    [[ruleset.users.bob.proxying.block]]
+    from = "0.0.0.0/0"
+    to = "*.ads.com"
+    """
+    users = Config.load(io.BytesIO(config_data.encode())).ruleset._user_rules  # noqa: SLF001
+    assert [rule.to_addresses for rule in users['alice'].allow_proxying_rules] == [IPv4Network('10.0.0.0/8')]
+    assert users['alice'].block_proxying_rules == []
+    assert [rule.to_addresses for rule in users['bob'].block_proxying_rules] == ['*.ads.com']
+
+    config = Config.load(io.BytesIO(b'[transport]\nport = 1080\n[ruleset]\nusers = { alice = 1 }\n'))
+    with pytest.raises(ConfigError, match='Invalid users configuration'):
+        config.ruleset  # noqa: B018
+
+
+def test_with_transport() -> None:
+    config = Config.load(io.BytesIO(b'[transport]\nport = 1080\n[ruleset]\n'))
+    transport = config.with_transport(reuse_port=True).transport
+    assert isinstance(transport, TcpTransport)
+    assert transport._reuse_port is True  # noqa: SLF001
+    assert config.transport._reuse_port is False  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_auth() -> None:
+    digest = base64.b64encode(hashlib.pbkdf2_hmac('sha256', b'secret', b'salt', 1000)).decode()
+    config_data = f"""
+    [proxy]
+    protocol = "socks5"
+    [proxy.auth]
+    alice = "password"
+    bob = "pbkdf2_sha256$1000$salt${digest}"
+    [transport]
+    port = 1080
+    [ruleset]
+    """
+    socks = Config.load(io.BytesIO(config_data.encode())).socks
+    auther = socks._auther  # noqa: SLF001
+    assert auther is not None
+    assert await auther('alice', 'password') is True
+    assert await auther('alice', 'secret') is False
+    assert await auther('bob', 'secret') is True
+    assert await auther('bob', 'password') is False
+    assert await auther('carol', 'password') is False
+    # config authers are picklable, so they can run in sub-interpreters
+    copied = pickle.loads(pickle.dumps(Config.load(io.BytesIO(config_data.encode()))._create_auther('socks5')))  # noqa: S301, SLF001
+    assert copied('bob', 'secret') is True
+
+
+@pytest.mark.skipif(
+    hasattr(concurrent.futures, 'InterpreterPoolExecutor'),
+    reason='sub-interpreters are available',
+)
+def test_auth_interpreters_unavailable() -> None:
+    config_data = b"""
+    [proxy]
+    protocol = "socks5"
+    auth_interpreters = 2
+    [proxy.auth]
+    alice = "password"
+    [transport]
+    port = 1080
+    [ruleset]
+    """
+    with pytest.raises(ConfigError, match=r'require Python 3\.14'):
+        Config.load(io.BytesIO(config_data)).socks  # noqa: B018
+    with pytest.raises(ConfigError, match='Invalid auth interpreters'):
+        Config.load(io.BytesIO(config_data.replace(b'= 2', b'= 0'))).socks  # noqa: B018
+
+
+@pytest.mark.skipif(
+    not hasattr(concurrent.futures, 'InterpreterPoolExecutor'),
+    reason='sub-interpreters are not available',
+)
+@pytest.mark.asyncio
+async def test_auth_interpreters() -> None:
+    config_data = b"""
+    [proxy]
+    protocol = "socks5"
+    auth_interpreters = 1
+    [proxy.auth]
+    alice = "password"
+    [transport]
+    port = 1080
+    [ruleset]
+    """
+    auther = Config.load(io.BytesIO(config_data)).socks._auther  # noqa: SLF001
+    assert auther is not None
+    assert await auther('alice', 'password') is True
+    assert await auther('alice', 'secret') is False
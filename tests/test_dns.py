@@ -0,0 +1,155 @@
+import asyncio
+import struct
+import typing
+from contextlib import asynccontextmanager
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+
+import pytest
+
+from soxy._dns import DnsRecordType, DnsResolver, _build_query, _parse_response
+from soxy._resolvers import ResolvedAddresses
+
+_RECORDS: dict[tuple[str, int], list[tuple[bytes, int]]] = {
+    ('example.com', DnsRecordType.A): [(IPv4Address('192.0.2.1').packed, 300), (IPv4Address('192.0.2.2').packed, 60)],
+    ('example.com', DnsRecordType.AAAA): [(IPv6Address('2001:db8::1').packed, 120)],
+}
+
+
+def _answer(query: bytes, *, truncate: bool = False) -> bytes:
+    query_id, _, _, _, _, _ = struct.unpack_from('!HHHHHH', query)
+    offset = 12
+    labels = []
+    while length := query[offset]:
+        labels.append(query[offset + 1 : offset + 1 + length].decode())
+        offset += length + 1
+    record_type = struct.unpack_from('!H', query, offset + 1)[0]
+    question = query[12 : offset + 5]
+    records = _RECORDS.get(('.'.join(labels), record_type))
+    rcode = 0 if records is not None else 3
+    records = [] if truncate else records or []
+    flags = 0x8180 | rcode | (0x0200 if truncate else 0)
+    answers = b''.join(
+        b'\xc0\x0c' + struct.pack('!HHIH', record_type, 1, ttl, len(rdata)) + rdata for rdata, ttl in records
+    )
+    return struct.pack('!HHHHHH', query_id, flags, 1, len(records), 0, 0) + question + answers
+
+
+class _FakeDnsProtocol(
+    asyncio.DatagramProtocol,
+):
+    def __init__(self, *, truncate: bool) -> None:
+        self._truncate = truncate
+        self.queries = 0
+        self._transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = typing.cast('asyncio.DatagramTransport', transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.queries += 1
+        if self._transport is not None:
+            self._transport.sendto(_answer(data, truncate=self._truncate), addr)
+
+
+async def _tcp_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    length = int.from_bytes(await reader.readexactly(2), 'big')
+    response = _answer(await reader.readexactly(length))
+    writer.write(len(response).to_bytes(2, 'big') + response)
+    await writer.drain()
+    writer.close()
+
+
+@asynccontextmanager
+async def _fake_dns(*, truncate: bool = False) -> typing.AsyncIterator[tuple[str, _FakeDnsProtocol]]:
+    server = await asyncio.start_server(_tcp_handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    transport, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _FakeDnsProtocol(truncate=truncate),
+        local_addr=('127.0.0.1', port),
+    )
+    try:
+        yield f'127.0.0.1:{port}', protocol
+    finally:
+        transport.close()
+        server.close()
+        await server.wait_closed()
+
+
+@asynccontextmanager
+async def _silent_nameserver() -> typing.AsyncIterator[str]:
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        asyncio.DatagramProtocol,
+        local_addr=('127.0.0.1', 0),
+    )
+    try:
+        yield f'127.0.0.1:{transport.get_extra_info("sockname")[1]}'
+    finally:
+        transport.close()
+
+
+def test_parse_response() -> None:
+    query = _build_query(0x1234, 'example.com', DnsRecordType.A)
+    answer = _parse_response(_answer(query), 0x1234)
+    assert answer.addresses == [IPv4Address('192.0.2.1'), IPv4Address('192.0.2.2')]
+    assert answer.ttl == 60  # noqa: PLR2004
+    with pytest.raises(ValueError, match='unexpected dns response'):
+        _parse_response(_answer(query), 0x4321)
+    with pytest.raises(ValueError, match='malformed dns response'):
+        _parse_response(_answer(query)[:-3], 0x1234)
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver() -> None:
+    async with _fake_dns() as (nameserver, _):
+        resolver = DnsResolver([nameserver], hosts_path=None)
+        result = await resolver('example.com.')
+    assert isinstance(result, ResolvedAddresses)
+    assert result == [IPv4Address('192.0.2.1'), IPv4Address('192.0.2.2'), IPv6Address('2001:db8::1')]
+    assert result.ttl == 60  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver_nxdomain() -> None:
+    async with _fake_dns() as (nameserver, protocol):
+        resolver = DnsResolver([nameserver], hosts_path=None)
+        assert await resolver('missing.example.com') == []
+    assert protocol.queries == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver_truncated() -> None:
+    async with _fake_dns(truncate=True) as (nameserver, _):
+        resolver = DnsResolver([nameserver], hosts_path=None)
+        assert await resolver('example.com') == [
+            IPv4Address('192.0.2.1'),
+            IPv4Address('192.0.2.2'),
+            IPv6Address('2001:db8::1'),
+        ]
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver_falls_back_to_next_nameserver() -> None:
+    async with _fake_dns() as (nameserver, _), _silent_nameserver() as silent:
+        resolver = DnsResolver([silent, nameserver], timeout=0.1, attempts=1, hosts_path=None)
+        assert IPv6Address('2001:db8::1') in await resolver('example.com')
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver_timeout() -> None:
+    async with _silent_nameserver() as silent:
+        resolver = DnsResolver([silent], timeout=0.05, attempts=2, hosts_path=None)
+        assert await resolver('example.com') == []
+
+
+@pytest.mark.asyncio
+async def test_dns_resolver_hosts_and_resolv_conf(tmp_path: Path) -> None:
+    hosts = tmp_path / 'hosts'
+    hosts.write_text('127.0.0.1 localhost Local.Test # comment\n::1 localhost\nbroken line\n')
+    resolv_conf = tmp_path / 'resolv.conf'
+    resolv_conf.write_text('nameserver 192.0.2.53\nnameserver [2001:db8::53]:5353\noptions timeout:3 attempts:4\n')
+    resolver = DnsResolver(hosts_path=hosts, resolv_conf_path=resolv_conf)
+    assert resolver._nameservers == [('192.0.2.53', 53), ('2001:db8::53', 5353)]  # noqa: SLF001
+    assert (resolver._timeout, resolver._attempts) == (3, 4)  # noqa: SLF001
+    assert await resolver('localhost') == [IPv4Address('127.0.0.1'), IPv6Address('::1')]
+    assert await resolver('local.test') == [IPv4Address('127.0.0.1')]
@@ -0,0 +1,80 @@
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+
+import pytest
+
+from soxy._geoip import GeoIPDatabase, GeoIPSet
+
+
+def test_ranges_database(tmp_path: Path) -> None:
+    path = tmp_path / 'country.csv'
+    path.write_text(
+        'ip_from,ip_to,country_code,country_name\n'
+        '16777216,16777471,AU,Australia\n'
+        '16777472,16778239,CN,China\n'
+        '16778240,16779263,au,Australia\n'
+        '"2001:db8::","2001:db8:ffff:ffff:ffff:ffff:ffff:ffff","de","Germany"\n'
+        '281470765629440,281470765629695,JP,Japan\n',
+    )
+    database = GeoIPDatabase(path)
+    assert database.lookup(IPv4Address('1.0.0.1')) == 'AU'
+    assert database.lookup(IPv4Address('1.0.1.1')) == 'CN'
+    assert database.lookup(IPv4Address('1.0.4.255')) == 'AU'
+    assert database.lookup(IPv4Address('1.0.8.0')) is None
+    assert database.lookup(IPv6Address('2001:db8::1')) == 'DE'
+    # IPv4-mapped ranges of IPv6 databases are IPv4 ranges
+    assert database.lookup(IPv4Address('5.0.0.1')) == 'JP'
+    assert len(database) == 5  # noqa: PLR2004
+
+    countries = GeoIPSet(database, ['au', 'DE'])
+    assert IPv4Address('1.0.0.1') in countries
+    assert IPv6Address('2001:db8::1') in countries
+    assert IPv4Address('1.0.1.1') not in countries
+    assert '1.0.0.1' not in countries
+
+
+def test_networks_database(tmp_path: Path) -> None:
+    path = tmp_path / 'asn.csv'
+    path.write_text(
+        'network,autonomous_system_number,autonomous_system_organization\n'
+        '1.1.1.0/24,13335,CLOUDFLARENET\n'
+        '1.1.2.0/24,13335,CLOUDFLARENET\n'
+        '8.8.8.0/24,15169,GOOGLE\n',
+    )
+    database = GeoIPDatabase(path)
+    # adjacent networks of the same label are merged
+    assert len(database) == 2  # noqa: PLR2004
+    assert database.lookup(IPv4Address('1.1.2.2')) == '13335'
+    assert IPv4Address('8.8.8.8') in GeoIPSet(database, ['15169'])
+
+
+def test_invalid_database(tmp_path: Path) -> None:
+    path = tmp_path / 'asn.csv'
+    path.write_text('1.1.1.0/24,13335\n8.8.8.8,8.8.4.4,15169\n')
+    with pytest.raises(ValueError, match=r'asn.csv:2: invalid address range'):
+        GeoIPDatabase(path)
+
+
+def test_overlapping_ranges(tmp_path: Path) -> None:
+    path = tmp_path / 'country.csv'
+    path.write_text(
+        '1.0.0.0/8,AU\n'
+        '1.2.3.0/24,NZ\n'
+        '1.2.3.128/25,NZ\n'
+        '2.0.0.0,2.0.0.255,CN\n'
+        '2.0.0.128,2.0.1.255,JP\n'
+        '2.0.1.0,2.0.1.15,JP\n',
+    )
+    database = GeoIPDatabase(path)
+    assert database.lookup(IPv4Address('1.0.0.1')) == 'AU'
+    assert database.lookup(IPv4Address('1.2.3.4')) == 'NZ'
+    assert database.lookup(IPv4Address('1.2.3.200')) == 'NZ'
+    # the range around a nested one goes on after it
+    assert database.lookup(IPv4Address('1.2.4.0')) == 'AU'
+    assert database.lookup(IPv4Address('1.255.255.255')) == 'AU'
+    assert database.lookup(IPv4Address('2.0.0.1')) == 'CN'
+    assert database.lookup(IPv4Address('2.0.0.200')) == 'JP'
+    assert database.lookup(IPv4Address('2.0.1.200')) == 'JP'
+    assert database.lookup(IPv4Address('2.0.2.0')) is None
+    # AU, NZ, AU, CN, JP
+    assert len(database) == 5  # noqa: PLR2004
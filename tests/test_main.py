@@ -1,17 +1,23 @@
 import asyncio
 import contextlib
+import gc
 import sys
+import weakref
 from pathlib import Path
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
-from soxy import Config
+from soxy import Config, Proxy
+from soxy._ranges import IPRangeSet
 from soxy.__main__ import (
     _run_proxy,
     async_main,
+    check_config,
     load_config,
+    log_rule_hits,
     main,
+    reload_config,
     validate_config_path,
 )
 
@@ -191,3 +197,75 @@ def test_main_help(capsys: pytest.CaptureFixture[str]) -> None:
         captured = capsys.readouterr()
         assert 'Start soxyproxy server' in captured.out
         assert '--logfile' in captured.out
+
+
+def test_log_rule_hits(temp_config_file: Path, caplog: pytest.LogCaptureFixture) -> None:
+    config = Config.from_path(temp_config_file)
+    proxy = Mock()
+    proxy.ruleset = config.ruleset
+    with caplog.at_level('INFO', logger='soxyproxy'):
+        log_rule_hits(proxy)
+    assert 'allow_connecting <ConnectingRule: 127.0.0.1>: 0 hits' in caplog.text
+
+
+def _replace_in_file(path: Path, old: str, new: str) -> None:
+    path.write_text(path.read_text().replace(old, new))
+
+
+@pytest.mark.asyncio
+async def test_reload_config(temp_config_file: Path) -> None:
+    proxy = Proxy.from_config(Config.from_path(temp_config_file))
+    ruleset = proxy.ruleset
+    _replace_in_file(temp_config_file, 'to = "0.0.0.0/0"', 'to = "10.0.0.0/8"')
+    await reload_config(proxy, temp_config_file)
+    assert proxy.ruleset is not ruleset
+    assert [str(rule.to_addresses) for rule, _ in proxy.ruleset.rule_hits()['allow_proxying']] == ['10.0.0.0/8']
+
+    # invalid configurations keep the current one
+    ruleset = proxy.ruleset
+    _replace_in_file(temp_config_file, 'socks5', 'socks4')
+    await reload_config(proxy, temp_config_file)
+    _replace_in_file(temp_config_file, '[proxy]', '[proxy')
+    await reload_config(proxy, temp_config_file)
+    assert proxy.ruleset is ruleset
+
+
+@pytest.mark.asyncio
+async def test_reload_config_releases_range_files(temp_config_file: Path, tmp_path: Path) -> None:
+    blocklist = tmp_path / 'blocklist.txt'
+    blocklist.write_text('10.0.0.0/8\n')
+    with temp_config_file.open('a') as fh:
+        fh.write(f'\n[[ruleset.proxying.block]]\nfrom = "0.0.0.0/0"\nto_file = "{blocklist}"\n')
+    proxy = Proxy.from_config(Config.from_path(temp_config_file))
+    ranges = weakref.ref(proxy.ruleset.rule_hits()['block_proxying'][0][0].to_addresses)
+    assert isinstance(ranges(), IPRangeSet)
+    await reload_config(proxy, temp_config_file)
+    gc.collect()
+    assert ranges() is None
+
+
+def test_check_config(temp_config_file: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    flows_file = tmp_path / 'flows.txt'
+    flows_file.write_text('127.0.0.1 1.1.1.1:443\n127.0.0.2 1.1.1.1:443 one.one.one.one\n')
+    with patch.object(sys, 'argv', ['soxy', 'check', str(temp_config_file), '--flows', str(flows_file)]):
+        main()
+    assert capsys.readouterr().out == ('ALLOWED 127.0.0.1 1.1.1.1:443\nBLOCKED 127.0.0.2 1.1.1.1:443 one.one.one.one\n')
+
+    check_config(temp_config_file, flows_file, quiet=True)
+    assert capsys.readouterr().out == ''
+
+    flows_file.write_text('127.0.0.1\n')
+    with pytest.raises(SystemExit):
+        check_config(temp_config_file, flows_file)
+
+
+def test_main_with_workers(temp_config_file: Path) -> None:
+    with (
+        patch('soxy.__main__._run_workers') as mock_run_workers,
+        patch.object(sys, 'argv', ['soxy', str(temp_config_file), '--workers', '4']),
+    ):
+        main()
+        mock_run_workers.assert_called_once_with(temp_config_file, None, 4, threads=1)
+
+    with patch.object(sys, 'argv', ['soxy', str(temp_config_file), '-w', '0']), pytest.raises(SystemExit):
+        main()
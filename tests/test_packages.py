@@ -1,5 +1,6 @@
+import asyncio
 import typing
-from ipaddress import IPv4Address
+from ipaddress import IPv4Address, IPv6Address
 
 import pytest
 
@@ -15,6 +16,7 @@ from soxy._packages import (
     Socks5GreetingResponse,
 )
 from soxy._types import (
+    Address,
     Socks4Command,
     Socks4Reply,
     Socks5AddressType,
@@ -75,6 +77,12 @@ def test_socks4_response(mock_connection: typing.Any) -> None:
     assert response.data == b'\x00\x5a\x00\x00\x00\x00\x00\x01'
 
 
+def test_socks4_response_ipv6_destination(mock_connection: typing.Any) -> None:
+    destination = Address(ip=IPv6Address('::1'), port=443)
+    response = Socks4Response(client=mock_connection, reply=Socks4Reply.GRANTED, destination=destination)
+    assert response.data == b'\x00\x5a\x01\xbb\x00\x00\x00\x00'
+
+
 def test_socks5_greeting_request(mock_connection: typing.Any) -> None:
     data = b'\x05\x01\x00'
     request = Socks5GreetingRequest(client=mock_connection, data=data)
@@ -164,3 +172,89 @@ def test_socks5_connection_response(mock_connection: typing.Any) -> None:
         port=80,
     )
     assert response.data == b'\x05\x00\x00\x01\x7f\x00\x00\x01\x00\x50'
+
+
+class StreamConnection:
+    def __init__(self, reader: asyncio.StreamReader) -> None:
+        self._reader = reader
+
+    async def read(self) -> bytes:
+        return await self._reader.read(1024)
+
+    async def read_exactly(self, n: int) -> bytes:
+        return await self._reader.readexactly(n)
+
+    async def read_until(self, separator: bytes) -> bytes:
+        return await self._reader.readuntil(separator)
+
+
+async def _feed_fragments(reader: asyncio.StreamReader, fragments: list[bytes]) -> None:
+    for fragment in fragments:
+        await asyncio.sleep(0)
+        reader.feed_data(fragment)
+
+
+@pytest.mark.asyncio
+async def test_socks5_greeting_request_fragmented() -> None:
+    reader = asyncio.StreamReader()
+    feeder = asyncio.create_task(_feed_fragments(reader, [b'\x05', b'\x02\x00', b'\x02']))
+    request = await Socks5GreetingRequest.from_client(StreamConnection(reader))
+    await feeder
+    assert request.methods == [Socks5AuthMethod.NO_AUTHENTICATION, Socks5AuthMethod.USERNAME]
+
+
+@pytest.mark.asyncio
+async def test_socks5_pipelined_handshake() -> None:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'\x05\x01\x02\x01\x04user\x06passwd\x05\x01\x00\x03\x0bexample.com\x01\xbbearly data')
+    client = StreamConnection(reader)
+    greeting = await Socks5GreetingRequest.from_client(client)
+    authorization = await Socks5AuthorizationRequest.from_client(client)
+    connection = await Socks5ConnectionRequest.from_client(client)
+    assert greeting.methods == [Socks5AuthMethod.USERNAME]
+    assert (authorization.username, authorization.password) == ('user', 'passwd')
+    assert connection.domain_name == 'example.com'
+    assert connection.port == 443
+    assert await client.read() == b'early data'
+
+
+@pytest.mark.asyncio
+async def test_socks4a_request_fragmented() -> None:
+    reader = asyncio.StreamReader()
+    feeder = asyncio.create_task(
+        _feed_fragments(reader, [b'\x04\x01\x00\x50\x00\x00', b'\x00\x01user', b'\x00example', b'.com\x00tail'])
+    )
+    client = StreamConnection(reader)
+    request = await Socks4Request.from_client(client)
+    await feeder
+    assert request.username == 'user'
+    assert request.domain_name == 'example.com'
+    assert request.destination.port == 80
+    assert await client.read() == b'tail'
+
+
+@pytest.mark.asyncio
+async def test_socks5_connection_request_truncated() -> None:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'\x05\x01\x00\x01\x7f\x00')
+    reader.feed_eof()
+    with pytest.raises(PackageError):
+        await Socks5ConnectionRequest.from_client(StreamConnection(reader))
+
+
+@pytest.mark.asyncio
+async def test_socks5_greeting_request_wrong_version() -> None:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'\x04\x01\x00')
+    with pytest.raises(PackageError):
+        await Socks5GreetingRequest.from_client(StreamConnection(reader))
+
+
+@pytest.mark.asyncio
+async def test_socks4_request_oversized(caplog: pytest.LogCaptureFixture) -> None:
+    reader = asyncio.StreamReader(limit=16)
+    reader.feed_data(b'\x04\x01\x00\x50\x7f\x00\x00\x01' + b'u' * 32 + b'\x00')
+    with caplog.at_level('INFO', logger='soxyproxy'), pytest.raises(PackageError) as exc_info:
+        await Socks4Request.from_client(StreamConnection(reader))
+    assert exc_info.value.data == b''
+    assert 'Socks4Request longer than the stream limit' in caplog.text
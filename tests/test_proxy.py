@@ -1,11 +1,14 @@
+import asyncio
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
-from soxy import PackageError, ProtocolError
+from soxy import ConfigError, PackageError, ProtocolError
 from soxy._proxy import Proxy
-from soxy._ruleset import Ruleset
-from soxy._types import Address, Connection, ProxySocks, Transport
+from soxy._ruleset import ConnectingRule, ProxyingRule, Ruleset, UserRules
+from soxy._socks import Socks4, Socks5
+from soxy._types import Address, Connection, ProxySocks, Socks5ConnectionReply, Transport
 
 
 @pytest.fixture
@@ -35,12 +38,22 @@ async def test_proxy_aexit(proxy: Proxy) -> None:
 async def test_on_client_connected_transport_cb(proxy: Proxy) -> None:
     client = MagicMock(spec=Connection)
     proxy._ruleset.should_allow_connecting = MagicMock(return_value=True)
-    proxy._protocol = AsyncMock(return_value=(Address('127.0.0.1', 8080), 'example.com'))
+    proxy._protocol = AsyncMock(return_value=([Address('127.0.0.1', 8080)], 'example.com'))
     proxy._ruleset.should_allow_proxying = MagicMock(return_value=True)
     address = await proxy._on_client_connected_transport_cb(client)
     assert address is not None
 
 
+@pytest.mark.asyncio
+async def test_on_client_connected_transport_cb_filters_addresses(proxy: Proxy) -> None:
+    client = MagicMock(spec=Connection)
+    allowed = Address('127.0.0.2', 8080)
+    proxy._ruleset.should_allow_connecting = MagicMock(return_value=True)
+    proxy._protocol = AsyncMock(return_value=([Address('127.0.0.1', 8080), allowed], 'example.com'))
+    proxy._ruleset.should_allow_proxying = MagicMock(side_effect=lambda destination, **_: destination == allowed)
+    assert await proxy._on_client_connected_transport_cb(client) == [allowed]
+
+
 @pytest.mark.asyncio
 async def test_on_client_connected_transport_cb_reject(proxy: Proxy) -> None:
     client = MagicMock(spec=Connection)
@@ -83,3 +96,170 @@ async def test_on_remote_connection_unreachable_cb(proxy: Proxy) -> None:
     proxy._protocol.target_unreachable = AsyncMock()
     await proxy._on_remote_connection_unreachable_cb(client, destination)
     proxy._protocol.target_unreachable.assert_called_once_with(client=client, destination=destination)
+
+
+class _StreamConnection:
+    def __init__(self, data: bytes) -> None:
+        self._reader = asyncio.StreamReader()
+        self._reader.feed_data(data)
+        self._address = Address(IPv4Address('127.0.0.1'), 12345)
+        self.username: str | None = None
+        self.written: list[bytes] = []
+
+    @property
+    def address(self) -> Address:
+        return self._address
+
+    async def read_exactly(self, n: int) -> bytes:
+        return await self._reader.readexactly(n)
+
+    async def read_until(self, separator: bytes) -> bytes:
+        return await self._reader.readuntil(separator)
+
+    async def write(self, data: bytes) -> None:
+        self.written.append(data)
+
+
+@pytest.mark.asyncio
+async def test_blocked_domain_is_not_resolved() -> None:
+    resolver = MagicMock(return_value=IPv4Address('127.0.0.1'))
+    proxy = Proxy(
+        protocol=Socks5(resolver=resolver),
+        transport=MagicMock(spec=Transport),
+        ruleset=Ruleset(
+            allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('0.0.0.0/0'))],
+            allow_proxying_rules=[
+                ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0')),
+            ],
+            block_proxying_rules=[
+                ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='blocked.com'),
+            ],
+        ),
+    )
+    client = _StreamConnection(b'\x05\x01\x00\x05\x01\x00\x03\x0bblocked.com\x01\xbb')
+    assert await proxy._on_client_connected_transport_cb(client) is None
+    resolver.assert_not_called()
+    assert client.written[-1][1] == Socks5ConnectionReply.CONNECTION_NOT_ALLOWED_BY_RULESET
+
+
+@pytest.mark.asyncio
+async def test_socks4a_keeps_ipv4_destinations() -> None:
+    resolver = MagicMock(return_value=[IPv6Address('::1'), IPv4Address('127.0.0.1')])
+    proxy = Proxy(
+        protocol=Socks4(resolver=resolver),
+        transport=MagicMock(spec=Transport),
+        ruleset=Ruleset(
+            allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('0.0.0.0/0'))],
+            allow_proxying_rules=[
+                ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0')),
+                ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv6Network('::/0')),
+            ],
+        ),
+    )
+    request = b'\x04\x01\x01\xbb\x00\x00\x00\x01\x00example.com\x00'
+    client = _StreamConnection(request)
+    assert await proxy._on_client_connected_transport_cb(client) == [Address(IPv4Address('127.0.0.1'), 443)]
+
+    resolver.return_value = [IPv6Address('::1')]
+    client = _StreamConnection(request)
+    assert await proxy._on_client_connected_transport_cb(client) is None
+    assert client.written == [b'\x00\x5b\x01\xbb\x00\x00\x00\x01']
+
+
+def test_reload() -> None:
+    proxy = Proxy(
+        protocol=Socks5(),
+        transport=MagicMock(spec=Transport),
+        ruleset=Ruleset(allow_connecting_rules=[], allow_proxying_rules=[]),
+    )
+    protocol = Socks5()
+    ruleset = Ruleset(allow_connecting_rules=[], allow_proxying_rules=[])
+    proxy.reload(protocol=protocol, ruleset=ruleset)
+    assert proxy._protocol is protocol
+    assert proxy.ruleset is ruleset
+    assert protocol._should_allow_domain_cb is not None
+
+    with pytest.raises(ConfigError, match='Protocol can not be changed'):
+        proxy.reload(protocol=Socks4(), ruleset=Ruleset(allow_connecting_rules=[], allow_proxying_rules=[]))
+    assert proxy._protocol is protocol
+    assert proxy.ruleset is ruleset
+
+
+@pytest.mark.asyncio
+async def test_reload_during_handshake(proxy: Proxy) -> None:
+    client = MagicMock(spec=Connection)
+    destination = Address('127.0.0.1', 8080)
+    old_ruleset = proxy._ruleset
+    old_ruleset.should_allow_connecting = MagicMock(return_value=True)
+    old_ruleset.should_allow_proxying = MagicMock(return_value=True)
+    new_ruleset = MagicMock(spec=Ruleset)
+
+    async def handshake(_: Connection) -> tuple[list[Address], None]:
+        proxy._ruleset = new_ruleset
+        return [destination], None
+
+    proxy._protocol = AsyncMock(side_effect=handshake)
+    assert await proxy._on_client_connected_transport_cb(client) == [destination]
+    old_ruleset.should_allow_proxying.assert_called_once()
+    new_ruleset.should_allow_proxying.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reload_during_handshake_checks_domain_with_old_ruleset() -> None:
+    def ruleset(blocked: str) -> Ruleset:
+        return Ruleset(
+            allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('0.0.0.0/0'))],
+            allow_proxying_rules=[
+                ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0')),
+            ],
+            block_proxying_rules=[ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=blocked)],
+        )
+
+    def auther(username: str, password: str) -> bool:  # noqa: ARG001
+        # SIGHUP arrives after the client started the handshake with the old ruleset
+        proxy.reload(protocol=Socks5(resolver=resolver, auther=auther), ruleset=ruleset('example.com'))
+        return True
+
+    resolver = MagicMock(return_value=IPv4Address('127.0.0.1'))
+    proxy = Proxy(
+        protocol=Socks5(resolver=resolver, auther=auther),
+        transport=MagicMock(spec=Transport),
+        ruleset=ruleset('other.com'),
+    )
+    request = b'\x05\x01\x00\x03\x0bexample.com\x01\xbb'
+    client = _StreamConnection(b'\x05\x01\x02\x01\x05alice\x06secret' + request)
+    assert await proxy._on_client_connected_transport_cb(client) == [Address(IPv4Address('127.0.0.1'), 443)]
+    resolver.assert_called_once()
+    assert proxy._handshakes == {}
+
+    client = _StreamConnection(b'\x05\x01\x02\x01\x05alice\x06secret' + request)
+    assert await proxy._on_client_connected_transport_cb(client) is None
+    assert client.written[-1][1] == Socks5ConnectionReply.CONNECTION_NOT_ALLOWED_BY_RULESET
+    resolver.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_user_rules() -> None:
+    proxy = Proxy(
+        protocol=Socks5(auther=lambda username, password: password == 'secret'),  # noqa: ARG005, S105
+        transport=MagicMock(spec=Transport),
+        ruleset=Ruleset(
+            allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('0.0.0.0/0'))],
+            allow_proxying_rules=[],
+            users={
+                'alice': UserRules(
+                    allow_proxying_rules=[
+                        ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('10.0.0.0/8')),
+                    ],
+                ),
+            },
+        ),
+    )
+    greeting = b'\x05\x01\x02'
+    request = b'\x05\x01\x00\x01\x0a\x00\x00\x01\x01\xbb'
+    client = _StreamConnection(greeting + b'\x01\x05alice\x06secret' + request)
+    assert await proxy._on_client_connected_transport_cb(client) == [Address(IPv4Address('10.0.0.1'), 443)]
+    assert client.username == 'alice'
+    client = _StreamConnection(greeting + b'\x01\x03bob\x06secret' + request)
+    assert await proxy._on_client_connected_transport_cb(client) is None
+    assert client.written[-1][1] == Socks5ConnectionReply.CONNECTION_NOT_ALLOWED_BY_RULESET
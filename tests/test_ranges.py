@@ -0,0 +1,100 @@
+import errno
+import os
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+
+import pytest
+
+from soxy._ranges import IPRangeSet
+
+
+def _write_list(path: Path) -> None:
+    path.write_text(
+        '# blocklist\n'
+        '10.0.0.0/8\n'
+        '10.1.0.0/16  # inside the network above\n'
+        '\n'
+        '192.168.1.10-192.168.1.20\n'
+        '192.168.1.21\n'
+        '2001:db8::/32\n',
+    )
+
+
+def test_compile_and_lookup(tmp_path: Path) -> None:
+    source = tmp_path / 'blocklist.txt'
+    _write_list(source)
+    ranges = IPRangeSet.load(source)
+    assert (tmp_path / 'blocklist.txt.ranges').exists()
+    # overlapping and adjacent entries are merged
+    assert len(ranges) == 3  # noqa: PLR2004
+    assert IPv4Address('10.255.255.255') in ranges
+    assert IPv4Address('11.0.0.0') not in ranges
+    assert IPv4Address('192.168.1.9') not in ranges
+    assert IPv4Address('192.168.1.10') in ranges
+    assert IPv4Address('192.168.1.21') in ranges
+    assert IPv4Address('192.168.1.22') not in ranges
+    assert IPv4Address('9.255.255.255') not in ranges
+    assert IPv6Address('2001:db8::1') in ranges
+    assert IPv6Address('::1') not in ranges
+    assert '10.0.0.1' not in ranges
+    ranges.close()
+
+
+def test_load_recompiles_stale_file(tmp_path: Path) -> None:
+    source = tmp_path / 'blocklist.txt'
+    source.write_text('10.0.0.1\n')
+    IPRangeSet.load(source).close()
+    source.write_text('10.0.0.2\n')
+    compiled = tmp_path / 'blocklist.txt.ranges'
+    os.utime(compiled, (0, 0))
+    ranges = IPRangeSet.load(source)
+    assert IPv4Address('10.0.0.1') not in ranges
+    assert IPv4Address('10.0.0.2') in ranges
+
+
+def test_empty_list(tmp_path: Path) -> None:
+    source = tmp_path / 'empty.txt'
+    source.write_text('# nothing\n')
+    ranges = IPRangeSet.load(source)
+    assert len(ranges) == 0
+    assert IPv4Address('10.0.0.1') not in ranges
+
+
+def test_invalid_list(tmp_path: Path) -> None:
+    source = tmp_path / 'blocklist.txt'
+    source.write_text('10.0.0.1\n10.0.0.9-10.0.0.1\n')
+    with pytest.raises(ValueError, match=r'blocklist.txt:2: invalid address range'):
+        IPRangeSet.load(source)
+
+
+def test_not_compiled_file(tmp_path: Path) -> None:
+    path = tmp_path / 'blocklist.ranges'
+    path.write_bytes(b'\x00' * 32)
+    with pytest.raises(ValueError, match='not a compiled range file'):
+        IPRangeSet(path)
+
+
+def test_load_from_read_only_directory(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    lists = tmp_path / 'etc'
+    lists.mkdir()
+    source = lists / 'blocklist.txt'
+    _write_list(source)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    compile_ = IPRangeSet.compile
+
+    def compile_outside_lists(source: Path, target: Path) -> None:
+        # tests may run as root, who can write anywhere
+        if target.parent == lists:
+            raise PermissionError(errno.EACCES, 'Permission denied', str(target))
+        compile_(source, target)
+
+    monkeypatch.setattr(IPRangeSet, 'compile', staticmethod(compile_outside_lists))
+    ranges = IPRangeSet.load(source)
+    assert IPv4Address('10.0.0.1') in ranges
+    assert list(lists.iterdir()) == [source]
+    assert [path.suffix for path in (tmp_path / 'cache' / 'soxy').iterdir()] == ['.ranges']
+    ranges.close()
+
+    source.unlink()
+    with pytest.raises(FileNotFoundError):
+        IPRangeSet.load(source)
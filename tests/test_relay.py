@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from ipaddress import IPv4Address
+
+import pytest
+
+from soxy._relay import SpliceSession
+from soxy._session import Session
+from soxy._tcp import TcpTransport
+from soxy._types import Address, Connection
+
+
+async def _echo_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while data := await reader.read(65536):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def _run_relay(relay: str, payload: bytes) -> bytes:
+    echo_server = await asyncio.start_server(_echo_handler, '127.0.0.1', 0)
+    echo_port = echo_server.sockets[0].getsockname()[1]
+
+    async def on_client_connected(conn: Connection) -> list[Address]:
+        return [Address(ip=IPv4Address('127.0.0.1'), port=echo_port)]
+
+    async def start_messaging(client: Connection, remote: Connection) -> None:
+        pass
+
+    async def on_remote_unreachable(client: Connection, addr: Address) -> None:
+        pass
+
+    transport = TcpTransport(port=0, relay=relay)
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    try:
+        async with transport as server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(payload)
+            drain = asyncio.create_task(writer.drain())
+            received = await asyncio.wait_for(reader.readexactly(len(payload)), timeout=5.0)
+            await drain
+            writer.close()
+            await writer.wait_closed()
+    finally:
+        echo_server.close()
+        await echo_server.wait_closed()
+    return received
+
+
+@pytest.mark.parametrize('relay', ['stream', 'pump', 'protocol', 'splice'])
+@pytest.mark.asyncio
+async def test_relay_echo(relay: str) -> None:
+    assert await _run_relay(relay, b'Hello, World!') == b'Hello, World!'
+
+
+@pytest.mark.parametrize('relay', ['stream', 'pump', 'protocol', 'splice'])
+@pytest.mark.asyncio
+async def test_relay_bulk(relay: str) -> None:
+    payload = bytes(range(256)) * 8192
+    assert await _run_relay(relay, payload) == payload
+
+
+@pytest.mark.parametrize(('relay', 'reads_chunks'), [('stream', True), ('pump', True), ('protocol', False)])
+@pytest.mark.asyncio
+async def test_relay_chunk_sizes_log(relay: str, reads_chunks: bool, caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO, logger='soxyproxy')
+    await _run_relay(relay, b'Hello, World!')
+    # the proxy side of the session ends a little after the client is gone
+    for _ in range(50):
+        if 'read chunk sizes' in caplog.text:
+            break
+        await asyncio.sleep(0.01)
+    assert ('read chunk sizes' in caplog.text) is reads_chunks
+
+
+@pytest.mark.asyncio
+async def test_splice_relay_half_close() -> None:
+    # the client stops sending while the echo is still on its way back
+    payload = bytes(range(256)) * 8192
+    echo_server = await asyncio.start_server(_echo_handler, '127.0.0.1', 0)
+    echo_port = echo_server.sockets[0].getsockname()[1]
+
+    async def on_client_connected(conn: Connection) -> list[Address]:
+        return [Address(ip=IPv4Address('127.0.0.1'), port=echo_port)]
+
+    async def start_messaging(client: Connection, remote: Connection) -> None:
+        pass
+
+    async def on_remote_unreachable(client: Connection, addr: Address) -> None:
+        pass
+
+    transport = TcpTransport(port=0, relay='splice')
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    try:
+        async with transport as server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(payload)
+            writer.write_eof()
+            received = await asyncio.wait_for(reader.read(), timeout=5.0)
+            writer.close()
+            await writer.wait_closed()
+    finally:
+        echo_server.close()
+        await echo_server.wait_closed()
+    assert received == payload
+
+
+def test_unsupported_relay() -> None:
+    with pytest.raises(ValueError, match='unsupported relay mode'):
+        TcpTransport(relay='unknown')
+
+
+def test_splice_relay_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(SpliceSession, 'is_supported', staticmethod(lambda: False))
+    transport = TcpTransport(relay='splice')
+    assert transport._session_cls is Session  # noqa: SLF001
@@ -0,0 +1,80 @@
+from ipaddress import IPv4Address, IPv6Address
+
+import pytest
+
+from soxy._resolvers import CachingResolver, ResolvedAddresses
+
+
+class _CountingResolver:
+    def __init__(self, result: object) -> None:
+        self.calls = 0
+        self._result = result
+
+    def __call__(self, name: str) -> object:
+        self.calls += 1
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+
+@pytest.mark.asyncio
+async def test_caching_resolver_hit() -> None:
+    upstream = _CountingResolver([IPv6Address('::1'), IPv4Address('127.0.0.1')])
+    resolver = CachingResolver(upstream)
+    assert await resolver('Example.com') == [IPv6Address('::1'), IPv4Address('127.0.0.1')]
+    assert await resolver('example.com.') == [IPv6Address('::1'), IPv4Address('127.0.0.1')]
+    assert upstream.calls == 1
+    assert (resolver.hits, resolver.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_caching_resolver_async_upstream() -> None:
+    async def upstream(name: str) -> IPv4Address:
+        return IPv4Address('127.0.0.1')
+
+    resolver = CachingResolver(upstream)
+    assert await resolver('example.com') == [IPv4Address('127.0.0.1')]
+
+
+@pytest.mark.asyncio
+async def test_caching_resolver_negative() -> None:
+    upstream = _CountingResolver(OSError('no such host'))
+    resolver = CachingResolver(upstream)
+    assert await resolver('example.com') == []
+    assert await resolver('example.com') == []
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_caching_resolver_expiry(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr('soxy._resolvers.time.monotonic', lambda: now)
+    upstream = _CountingResolver(ResolvedAddresses([IPv4Address('127.0.0.1')], ttl=30))
+    resolver = CachingResolver(upstream, min_ttl=10, max_ttl=20)
+    await resolver('example.com')
+    now += 19
+    await resolver('example.com')
+    assert upstream.calls == 1
+    now += 2
+    await resolver('example.com')
+    assert upstream.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_caching_resolver_lru_eviction() -> None:
+    upstream = _CountingResolver(IPv4Address('127.0.0.1'))
+    resolver = CachingResolver(upstream, max_size=2)
+    await resolver('a.com')
+    await resolver('b.com')
+    await resolver('a.com')
+    await resolver('c.com')
+    assert len(resolver) == 2  # noqa: PLR2004
+    await resolver('a.com')
+    assert upstream.calls == 3  # noqa: PLR2004
+    await resolver('b.com')
+    assert upstream.calls == 4  # noqa: PLR2004
+
+
+def test_caching_resolver_invalid_bounds() -> None:
+    with pytest.raises(ValueError, match='invalid resolver cache'):
+        CachingResolver(IPv4Address, min_ttl=10, max_ttl=1)
@@ -1,7 +1,13 @@
+import random
 from ipaddress import IPv4Address, IPv4Network
+from pathlib import Path
 from unittest.mock import Mock
 
-from soxy._ruleset import ConnectingRule, ProxyingRule, Ruleset
+import pytest
+
+from soxy._geoip import GeoIPDatabase, GeoIPSet
+from soxy._ranges import IPRangeSet
+from soxy._ruleset import ConnectingRule, PortSet, ProxyingRule, Ruleset, UserRules
 from soxy._types import Address, Connection
 
 
@@ -94,3 +100,339 @@ def test_ruleset_empty() -> None:
 
     assert ruleset.should_allow_connecting(connection) is False
     assert ruleset.should_allow_proxying(connection, target_address, None) is False
+
+
+def test_ruleset_non_matching_block_rules() -> None:
+    # a block rule that doesn't match must not turn an allowed request into a blocked one
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('10.0.0.1'), 12345)
+    target_address = Address(IPv4Address('192.168.1.2'), 1234)
+
+    ruleset = Ruleset(
+        allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('10.0.0.0/8'))],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('10.0.0.0/8'), to_addresses=IPv4Network('192.168.1.0/24')),
+        ],
+        block_connecting_rules=[
+            ConnectingRule(from_addresses=IPv4Network('10.0.0.1/32')),
+            ConnectingRule(from_addresses=IPv4Network('172.16.0.0/12')),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('10.0.0.0/8'), to_addresses=IPv4Network('192.168.1.2/32')),
+            ProxyingRule(from_addresses=IPv4Network('10.0.0.0/8'), to_addresses=IPv4Network('172.16.0.0/12')),
+        ],
+    )
+    assert ruleset.should_allow_connecting(connection) is False
+    assert ruleset.should_allow_proxying(connection, target_address, None) is False
+
+    ruleset = Ruleset(
+        allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('10.0.0.0/8'))],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('10.0.0.0/8'), to_addresses=IPv4Network('192.168.1.0/24')),
+        ],
+        block_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('172.16.0.0/12'))],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('10.0.0.0/8'), to_addresses=IPv4Network('172.16.0.0/12')),
+        ],
+    )
+    assert ruleset.should_allow_connecting(connection) is True
+    assert ruleset.should_allow_proxying(connection, target_address, None) is True
+
+
+def test_ruleset_should_allow_domain() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='example.com'),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='blocked.com'),
+        ],
+    )
+    assert ruleset.should_allow_domain(connection, 'example.com') is True
+    assert ruleset.should_allow_domain(connection, 'blocked.com') is False
+    assert ruleset.should_allow_domain(connection, 'other.com') is False
+
+
+def test_ruleset_should_allow_domain_address_rules() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('192.168.1.0/24'), to_addresses=IPv4Network('0.0.0.0/0')),
+        ],
+    )
+    assert ruleset.should_allow_domain(connection, 'other.com') is True
+    connection.address = Address(IPv4Address('10.0.0.1'), 12345)
+    assert ruleset.should_allow_domain(connection, 'other.com') is False
+
+
+def test_ruleset_matches_linear_evaluation() -> None:
+    rng = random.Random(13)  # noqa: S311
+
+    def address() -> IPv4Address:
+        return IPv4Address(f'10.0.{rng.randrange(4)}.{rng.randrange(8)}')
+
+    def network(prefixlens: list[int]) -> IPv4Network:
+        return IPv4Network(f'{address()}/{rng.choice(prefixlens)}', strict=False)
+
+    def ports() -> list[int | tuple[int, int]] | None:
+        return rng.choice([None, None, [80], [443, (8000, 8001)]])
+
+    allow = [
+        ProxyingRule(from_addresses=network([8, 24, 30, 32]), to_addresses=network([0, 24, 30, 32]), ports=ports())
+        for _ in range(40)
+    ]
+    block = [
+        ProxyingRule(from_addresses=network([30, 32]), to_addresses=network([24, 30, 32]), ports=ports())
+        for _ in range(10)
+    ]
+    ruleset = Ruleset(allow_connecting_rules=[], allow_proxying_rules=allow, block_proxying_rules=block)
+    connection = Mock(spec=Connection)
+    decisions = set()
+    for _ in range(1000):
+        connection.address = Address(address(), 12345)
+        destination = Address(address(), rng.choice([22, 80, 443, 8001]))
+        expected = any(rule(connection, destination, None) for rule in allow) and not any(
+            rule(connection, destination, None) for rule in block
+        )
+        assert ruleset.should_allow_proxying(connection, destination, None) is expected
+        decisions.add(expected)
+    assert decisions == {True, False}
+
+
+def test_ruleset_domain_patterns() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    target_address = Address(IPv4Address('192.168.1.2'), 443)
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0')),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='*.ads.com'),
+        ],
+    )
+    assert ruleset.should_allow_proxying(connection, target_address, 'ads.com') is True
+    assert ruleset.should_allow_proxying(connection, target_address, 'banner.ads.com') is False
+    assert ruleset.should_allow_domain(connection, 'banner.ads.com') is False
+
+
+def test_ruleset_mixed_domain_patterns() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    destination = IPv4Address('192.168.1.2')
+    anywhere = IPv4Network('0.0.0.0/0')
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=anywhere, to_addresses='*.example.com'),
+            ProxyingRule(from_addresses=anywhere, to_addresses='.example.com'),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=anywhere, to_addresses='*.ads.com'),
+            ProxyingRule(from_addresses=anywhere, to_addresses='.ads.com'),
+        ],
+    )
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'example.com') is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'www.example.com') is True
+    assert ruleset.should_allow_domain(connection, 'example.com') is True
+    assert ruleset.should_allow_domain(connection, 'ads.com') is False
+    assert ruleset.should_allow_domain(connection, 'banner.ads.com') is False
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=anywhere, to_addresses='.example.com', ports=[443]),
+            ProxyingRule(from_addresses=anywhere, to_addresses='example.com'),
+            ProxyingRule(from_addresses=anywhere, to_addresses='example.net', ports=[80]),
+            ProxyingRule(from_addresses=anywhere, to_addresses='.example.net'),
+        ],
+    )
+    assert ruleset.should_allow_proxying(connection, Address(destination, 80), 'example.com') is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'sub.example.com') is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 80), 'sub.example.com') is False
+    assert ruleset.should_allow_domain(connection, 'sub.example.com', 80) is False
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'example.net') is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'sub.example.net') is True
+    assert ruleset.should_allow_domain(connection, 'example.net', 443) is True
+
+
+def test_ruleset_range_files(tmp_path: Path) -> None:
+    clients = tmp_path / 'clients.txt'
+    clients.write_text('192.168.1.100-192.168.1.200\n')
+    destinations = tmp_path / 'destinations.txt'
+    destinations.write_text('8.8.8.0/24\n')
+    ruleset = Ruleset(
+        allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('192.168.1.0/24'))],
+        block_connecting_rules=[ConnectingRule(from_addresses=IPRangeSet.load(clients))],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0')),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('192.168.1.0/28'), to_addresses=IPRangeSet.load(destinations)),
+        ],
+    )
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    assert ruleset.should_allow_connecting(connection) is True
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('8.8.8.8'), 53), None) is False
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('8.8.4.4'), 53), None) is True
+    connection.address = Address(IPv4Address('192.168.1.150'), 12345)
+    assert ruleset.should_allow_connecting(connection) is False
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('8.8.8.8'), 53), None) is True
+
+
+def test_ruleset_decision_cache() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('10.0.0.0/8')),
+        ],
+        decision_cache_size=2,
+    )
+    allowed = Address(IPv4Address('10.0.0.1'), 443)
+    blocked = Address(IPv4Address('192.168.1.2'), 443)
+    assert ruleset.should_allow_proxying(connection, allowed, None) is True
+    assert ruleset.should_allow_proxying(connection, allowed, None) is True
+    assert ruleset.should_allow_proxying(connection, blocked, None) is False
+    assert ruleset.should_allow_proxying(connection, blocked, None) is False
+    assert (ruleset.cache_hits, ruleset.cache_misses) == (2, 2)
+
+    # the least recently used decision is evicted
+    assert ruleset.should_allow_proxying(connection, allowed, 'Example.com.') is True
+    assert ruleset.should_allow_proxying(connection, allowed, 'example.com') is True
+    assert ruleset.should_allow_proxying(connection, allowed, None) is True
+    assert (ruleset.cache_hits, ruleset.cache_misses) == (3, 4)
+    assert len(ruleset._decisions) == 2  # noqa: SLF001, PLR2004
+
+    ruleset.invalidate()
+    assert ruleset.should_allow_proxying(connection, allowed, None) is True
+    assert (ruleset.cache_hits, ruleset.cache_misses) == (3, 5)
+
+
+def test_port_set() -> None:
+    ports = PortSet([443, (8000, 8100), 80, (8050, 8200), 8201])
+    assert repr(ports) == '80,443,8000-8201'
+    assert [port in ports for port in (1, 80, 81, 443, 8150, 8202)] == [False, True, False, True, True, False]
+    assert '80' not in ports
+    with pytest.raises(ValueError, match='invalid port range'):
+        PortSet([(100, 90)])
+    with pytest.raises(ValueError, match='invalid port range'):
+        PortSet([70000])
+
+
+def test_ruleset_ports() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0'), ports=[443]),
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0'), ports=[80]),
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='example.com', ports=[(8000, 8100)]),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='*.ads.com', ports=[80]),
+        ],
+    )
+    destination = IPv4Address('192.168.1.2')
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), None) is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 80), None) is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 22), None) is False
+    assert ruleset.should_allow_proxying(connection, Address(destination, 8080), 'example.com') is True
+    assert ruleset.should_allow_proxying(connection, Address(destination, 80), 'banner.ads.com') is False
+    assert ruleset.should_allow_proxying(connection, Address(destination, 443), 'banner.ads.com') is True
+    assert ruleset.should_allow_domain(connection, 'banner.ads.com', 80) is False
+    assert ruleset.should_allow_domain(connection, 'banner.ads.com', 443) is True
+    assert ruleset.should_allow_domain(connection, 'other.com', 22) is False
+    assert ruleset.should_allow_domain(connection, 'other.com') is True
+
+
+def test_ruleset_rule_hits() -> None:
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    connecting = ConnectingRule(from_addresses=IPv4Network('192.168.1.0/24'))
+    rare = ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('10.0.0.0/8'))
+    busy = ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=IPv4Network('0.0.0.0/0'))
+    ads = ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses='*.ads.com')
+    ruleset = Ruleset(
+        allow_connecting_rules=[connecting],
+        allow_proxying_rules=[rare, busy],
+        block_proxying_rules=[ads],
+    )
+    ruleset.should_allow_connecting(connection)
+    for _ in range(3):
+        ruleset.should_allow_proxying(connection, Address(IPv4Address('8.8.8.8'), 443), None)
+    ruleset.should_allow_proxying(connection, Address(IPv4Address('10.0.0.1'), 443), None)
+    ruleset.should_allow_domain(connection, 'banner.ads.com')
+    assert ruleset.rule_hits() == {
+        'allow_connecting': [(connecting, 1)],
+        'block_connecting': [],
+        'allow_proxying': [(rare, 1), (busy, 3)],
+        'block_proxying': [(ads, 1)],
+    }
+    ruleset.reset_rule_hits()
+    assert ruleset.rule_hits()['allow_proxying'] == [(rare, 0), (busy, 0)]
+
+
+def test_ruleset_geoip(tmp_path: Path) -> None:
+    path = tmp_path / 'country.csv'
+    path.write_text('10.0.0.0,10.0.0.255,NL\n10.0.1.0,10.0.1.255,US\n192.168.1.0,192.168.1.255,US\n')
+    database = GeoIPDatabase(path)
+    ruleset = Ruleset(
+        allow_connecting_rules=[ConnectingRule(from_addresses=GeoIPSet(database, ['US']))],
+        allow_proxying_rules=[
+            ProxyingRule(from_addresses=GeoIPSet(database, ['US']), to_addresses=IPv4Network('0.0.0.0/0')),
+        ],
+        block_proxying_rules=[
+            ProxyingRule(from_addresses=IPv4Network('0.0.0.0/0'), to_addresses=GeoIPSet(database, ['NL'])),
+        ],
+    )
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    assert ruleset.should_allow_connecting(connection) is True
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('10.0.1.1'), 443), None) is True
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('10.0.0.1'), 443), None) is False
+    assert ruleset.should_allow_domain(connection, 'example.com') is True
+    connection.address = Address(IPv4Address('10.0.0.1'), 12345)
+    assert ruleset.should_allow_connecting(connection) is False
+    assert ruleset.should_allow_proxying(connection, Address(IPv4Address('10.0.1.1'), 443), None) is False
+    assert ruleset.should_allow_domain(connection, 'example.com') is False
+
+
+def test_ruleset_users() -> None:
+    everything = IPv4Network('0.0.0.0/0')
+    ruleset = Ruleset(
+        allow_connecting_rules=[],
+        allow_proxying_rules=[ProxyingRule(from_addresses=everything, to_addresses=IPv4Network('8.8.8.0/24'))],
+        block_proxying_rules=[ProxyingRule(from_addresses=everything, to_addresses='blocked.com')],
+        users={
+            'alice': UserRules(
+                allow_proxying_rules=[ProxyingRule(from_addresses=everything, to_addresses=everything)],
+                block_proxying_rules=[ProxyingRule(from_addresses=everything, to_addresses=IPv4Network('10.0.0.0/8'))],
+            ),
+        },
+        decision_cache_size=16,
+    )
+    connection = Mock(spec=Connection)
+    connection.address = Address(IPv4Address('192.168.1.1'), 12345)
+    public = Address(IPv4Address('1.1.1.1'), 443)
+    private = Address(IPv4Address('10.0.0.1'), 443)
+    for username in (None, 'bob'):
+        connection.username = username
+        assert ruleset.should_allow_proxying(connection, public, None) is False
+        assert ruleset.should_allow_proxying(connection, Address(IPv4Address('8.8.8.8'), 53), None) is True
+        assert ruleset.should_allow_domain(connection, 'example.com') is True
+    connection.username = 'alice'
+    assert ruleset.should_allow_proxying(connection, public, None) is True
+    assert ruleset.should_allow_proxying(connection, private, None) is False
+    # block rules of the ruleset apply to users too
+    assert ruleset.should_allow_proxying(connection, public, 'blocked.com') is False
+    assert ruleset.should_allow_domain(connection, 'blocked.com') is False
+    assert [hits for _, hits in ruleset.rule_hits()['users.alice.allow_proxying']] == [3]
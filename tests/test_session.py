@@ -4,7 +4,7 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
-from soxy._session import Session
+from soxy._session import PumpSession, Session
 from soxy._types import Connection
 
 
@@ -164,3 +164,37 @@ async def test_session_timeout_error_handling(mock_client: Connection, mock_remo
         task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
             await asyncio.wait_for(task, timeout=5.0)
+
+
+@pytest.mark.asyncio
+async def test_pump_session_forwarding(mock_client: Connection, mock_remote: Connection) -> None:
+    mock_client.read = AsyncMock(side_effect=[b'request', b''])
+    mock_remote.read = AsyncMock(side_effect=asyncio.Event().wait)
+    mock_client.write = AsyncMock()
+    mock_remote.write = AsyncMock()
+
+    async with PumpSession(client=mock_client, remote=mock_remote) as session:
+        await asyncio.wait_for(session.start(), timeout=5.0)
+        pumps = list(session._pumps)  # noqa: SLF001
+
+    mock_remote.write.assert_called_once_with(b'request')
+    mock_client.write.assert_not_called()
+    assert all(pump.done() for pump in pumps)
+
+
+@pytest.mark.asyncio
+async def test_pump_session_write_error(mock_client: Connection, mock_remote: Connection) -> None:
+    mock_client.read = AsyncMock(side_effect=asyncio.Event().wait)
+    mock_remote.read = AsyncMock(return_value=b'response')
+    mock_client.write = AsyncMock(side_effect=ConnectionResetError)
+
+    async with PumpSession(client=mock_client, remote=mock_remote) as session:
+        await asyncio.wait_for(session.start(), timeout=5.0)
+
+    mock_client.write.assert_called_once_with(b'response')
+
+
+@pytest.mark.asyncio
+async def test_pump_session_not_entered(mock_client: Connection, mock_remote: Connection) -> None:
+    with pytest.raises(RuntimeError):
+        await PumpSession(client=mock_client, remote=mock_remote).start()
@@ -55,9 +55,9 @@ async def test_tcp_connection_context_manager() -> None:
 async def test_tcp_transport_flow() -> None:
     connected_clients: list[Connection] = []
 
-    async def on_client_connected(conn: Connection) -> Address:
+    async def on_client_connected(conn: Connection) -> list[Address]:
         connected_clients.append(conn)
-        return Address(ip=IPv4Address('127.0.0.1'), port=12345)
+        return [Address(ip=IPv4Address('127.0.0.1'), port=12345)]
 
     async def start_messaging(client: Connection, remote: Connection) -> None:
         pass
@@ -83,3 +83,196 @@ async def test_tcp_connection_error() -> None:
                 await TCPConnection.open('127.0.0.1', 65535)
     except TimeoutError:
         pytest.fail('Connection attempt timed out')
+
+
+class _PeerWriter:
+    def get_extra_info(self, *args: str) -> tuple[str, int]:
+        return '127.0.0.1', 12345
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_chunk_size_grows() -> None:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'x' * 4096)
+    conn = TCPConnection(reader, _PeerWriter(), chunk_size_min=1024, chunk_size_max=2048)
+    assert len(await conn.read()) == 1024
+    assert len(await conn.read()) == 2048
+    assert len(await conn.read()) == 1024
+    assert conn.chunk_sizes == {1024: 1, 2048: 2}
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_chunk_size_shrinks_when_idle(monkeypatch: pytest.MonkeyPatch) -> None:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b'x' * 4096)
+    conn = TCPConnection(reader, _PeerWriter(), chunk_size_min=1024, chunk_size_max=4096)
+    assert len(await conn.read()) == 1024
+    monkeypatch.setattr('soxy._tcp._IDLE_INTERVAL', 0)
+    assert len(await conn.read()) == 2048
+    assert len(await conn.read()) == 1024
+    assert conn.chunk_sizes == {1024: 2, 2048: 1}
+
+
+def test_tcp_transport_invalid_chunk_sizes() -> None:
+    with pytest.raises(ValueError, match='invalid read chunk size bounds'):
+        TcpTransport(chunk_size_min=4096, chunk_size_max=1024)
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_read_buffered() -> None:
+    reader = asyncio.StreamReader()
+    conn = TCPConnection(reader, _PeerWriter())
+    assert await conn.read_buffered() == b''
+    reader.feed_data(b'early data')
+    assert await conn.read_buffered() == b'early data'
+    assert await conn.read_buffered() == b''
+
+
+@pytest.mark.asyncio
+async def test_tcp_transport_forwards_early_data() -> None:
+    received = asyncio.Event()
+
+    async def remote_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if await reader.read(1024) == b'early data':
+            received.set()
+        writer.close()
+
+    remote_server = await asyncio.start_server(remote_handler, '127.0.0.1', 0)
+    remote_port = remote_server.sockets[0].getsockname()[1]
+    early_data_forwarded: list[bool] = []
+
+    async def on_client_connected(conn: Connection) -> list[Address]:
+        await conn.read_exactly(len(b'request'))
+        return [Address(ip=IPv4Address('127.0.0.1'), port=remote_port)]
+
+    async def start_messaging(client: Connection, remote: Connection) -> None:
+        await asyncio.wait_for(received.wait(), timeout=1.0)
+        early_data_forwarded.append(received.is_set())
+
+    async def on_remote_unreachable(client: Connection, addr: Address) -> None:
+        pass
+
+    transport = TcpTransport(port=0)
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    try:
+        async with transport as server:
+            port = server.sockets[0].getsockname()[1]
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'requestearly data')
+            await writer.drain()
+            await asyncio.sleep(0.1)
+            writer.close()
+            await writer.wait_closed()
+    finally:
+        remote_server.close()
+        await remote_server.wait_closed()
+    assert early_data_forwarded == [True]
+
+
+@pytest.mark.asyncio
+async def test_tcp_transport_optimistic_reply() -> None:
+    async def echo_handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(await reader.read(1024))
+        await writer.drain()
+        writer.close()
+
+    echo_server = await asyncio.start_server(echo_handler, '127.0.0.1', 0)
+    destination = Address(ip=IPv4Address('127.0.0.1'), port=echo_server.sockets[0].getsockname()[1])
+    replied_to: list[Address] = []
+
+    async def on_client_connected(conn: Connection) -> list[Address]:
+        return [destination]
+
+    async def start_messaging(client: Connection, remote: Connection) -> None:
+        replied_to.append(remote.address)
+        await client.write(b'ok')
+
+    async def on_remote_unreachable(client: Connection, addr: Address) -> None:
+        pass
+
+    transport = TcpTransport(port=0, optimistic_reply=True)
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    try:
+        async with transport as server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            assert await asyncio.wait_for(reader.readexactly(2), timeout=1.0) == b'ok'
+            writer.write(b'payload')
+            assert await asyncio.wait_for(reader.readexactly(7), timeout=1.0) == b'payload'
+            writer.close()
+            await writer.wait_closed()
+    finally:
+        echo_server.close()
+        await echo_server.wait_closed()
+    assert replied_to == [destination]
+
+
+@pytest.mark.asyncio
+async def test_tcp_transport_optimistic_reply_unreachable() -> None:
+    unreachable: list[Address] = []
+
+    async def on_client_connected(conn: Connection) -> list[Address]:
+        return [Address(ip=IPv4Address('127.0.0.1'), port=65535)]
+
+    async def start_messaging(client: Connection, remote: Connection) -> None:
+        await client.write(b'ok')
+
+    async def on_remote_unreachable(client: Connection, addr: Address) -> None:
+        unreachable.append(addr)
+
+    transport = TcpTransport(port=0, optimistic_reply=True)
+    transport.init(on_client_connected, start_messaging, on_remote_unreachable)
+    async with transport as server:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        assert await asyncio.wait_for(reader.read(), timeout=1.0) == b'ok'
+        writer.close()
+        await writer.wait_closed()
+    assert unreachable == []
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_open_any_falls_back() -> None:
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.close()
+
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    addresses = [
+        Address(ip=IPv4Address('127.0.0.1'), port=65535),
+        Address(ip=IPv4Address('127.0.0.1'), port=port),
+    ]
+    try:
+        async with await TCPConnection.open_any(addresses, delay=5.0) as connection:
+            assert connection.address == addresses[1]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_open_any_unreachable() -> None:
+    addresses = [
+        Address(ip=IPv4Address('127.0.0.1'), port=65535),
+        Address(ip=IPv4Address('127.0.0.1'), port=65534),
+    ]
+    with pytest.raises(OSError, match='all connection attempts failed'):
+        await TCPConnection.open_any(addresses)
+
+
+@pytest.mark.asyncio
+async def test_tcp_connection_stream_limit() -> None:
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.close()
+
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        # the reader must be able to hold a whole chunk of the largest size
+        async with await TCPConnection.open('127.0.0.1', port, chunk_size_max=262144) as conn:
+            assert conn.reader._limit == 262144  # noqa: SLF001
+        async with await TCPConnection.open('127.0.0.1', port, chunk_size_max=4096) as conn:
+            assert conn.reader._limit == 65536  # noqa: SLF001
+    finally:
+        server.close()
+        await server.wait_closed()
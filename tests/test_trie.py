@@ -0,0 +1,54 @@
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+
+from soxy._trie import AddressIndex, DomainIndex, PrefixTrie
+
+
+def test_prefix_trie_match() -> None:
+    trie: PrefixTrie[str] = PrefixTrie(32)
+    trie.setdefault(IPv4Network('10.0.0.0/8'), 'wide')
+    trie.setdefault(IPv4Network('10.1.0.0/16'), 'narrow')
+    trie.setdefault(IPv4Network('10.1.2.3/32'), 'host')
+    assert trie.setdefault(IPv4Network('10.0.0.0/8'), 'again') == 'wide'
+    assert list(trie.match(IPv4Address('10.1.2.3'))) == ['wide', 'narrow', 'host']
+    assert list(trie.match(IPv4Address('10.2.0.1'))) == ['wide']
+    assert list(trie.match(IPv4Address('192.168.0.1'))) == []
+    assert len(trie) == 3  # noqa: PLR2004
+
+
+def test_prefix_trie_default_route() -> None:
+    trie: PrefixTrie[int] = PrefixTrie(128)
+    trie.setdefault(IPv6Network('::/0'), 0)
+    assert list(trie.match(IPv6Address('2001:db8::1'))) == [0]
+
+
+def test_address_index_families() -> None:
+    index: AddressIndex[int] = AddressIndex()
+    index.setdefault(IPv4Address('127.0.0.1'), 1)
+    index.setdefault(IPv6Network('2001:db8::/32'), 2)
+    assert list(index.match(IPv4Address('127.0.0.1'))) == [1]
+    assert list(index.match(IPv6Address('2001:db8::1'))) == [2]
+    assert list(index.match(IPv6Address('::1'))) == []
+
+
+def test_domain_index_patterns() -> None:
+    index: DomainIndex[list[str]] = DomainIndex()
+    for pattern in ('example.com', '*.ads.com', '.tracker.net'):
+        for bucket in index.buckets(pattern, list):
+            bucket.append(pattern)
+    assert list(index.match('Example.COM.')) == [['example.com']]
+    assert list(index.match('www.example.com')) == []
+    assert list(index.match('ads.com')) == []
+    assert list(index.match('a.b.ads.com')) == [['*.ads.com']]
+    assert list(index.match('tracker.net')) == [['.tracker.net']]
+    assert list(index.match('cdn.tracker.net')) == [['.tracker.net']]
+    assert list(index.match('nottracker.net')) == []
+
+
+def test_domain_index_mixed_patterns() -> None:
+    index: DomainIndex[list[str]] = DomainIndex()
+    for pattern in ('*.example.com', '.example.com', 'example.com'):
+        for bucket in index.buckets(pattern, list):
+            bucket.append(pattern)
+    assert len(index.buckets('.example.com', list)) == 2
+    assert list(index.match('example.com')) == [['.example.com', 'example.com']]
+    assert list(index.match('www.example.com')) == [['*.example.com', '.example.com']]
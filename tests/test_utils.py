@@ -1,10 +1,17 @@
-from ipaddress import IPv4Address, IPv4Network
+from ipaddress import IPv4Address, IPv4Network, IPv6Address
 
 import pytest
 
 from soxy._errors import PackageError  # Fixed error name
 from soxy._types import Address, SocksVersions
-from soxy._utils import check_protocol_version, match_addresses, port_from_bytes, port_to_bytes
+from soxy._utils import (
+    check_protocol_version,
+    interleave_address_families,
+    match_addresses,
+    match_domain,
+    port_from_bytes,
+    port_to_bytes,
+)
 
 
 def test_match_addresses() -> None:
@@ -17,6 +24,14 @@ def test_match_addresses() -> None:
     assert not match_addresses(address, IPv4Network('10.0.0.0/24'))
 
 
+def test_interleave_address_families() -> None:
+    v6 = [Address(ip=IPv6Address(f'2001:db8::{i}'), port=80) for i in (1, 2)]
+    v4 = [Address(ip=IPv4Address(f'192.0.2.{i}'), port=80) for i in (1, 2, 3)]
+    assert interleave_address_families([v6[0], v6[1], v4[0], v4[1], v4[2]]) == [v6[0], v4[0], v6[1], v4[1], v4[2]]
+    assert interleave_address_families([v4[0], v6[0], v6[1]]) == [v4[0], v6[0], v6[1]]
+    assert interleave_address_families([]) == []
+
+
 def test_port_from_bytes() -> None:
     assert port_from_bytes(b'\x1f\x90') == 8080
     assert port_from_bytes(b'\x00\x50') == 80
@@ -33,3 +48,13 @@ def test_check_protocol_version() -> None:
     with pytest.raises(PackageError):
         check_protocol_version(b'\x04', SocksVersions.SOCKS5)
     check_protocol_version(b'\x05', SocksVersions.SOCKS5)
+
+
+def test_match_domain() -> None:
+    assert match_domain('example.com', 'example.com')
+    assert not match_domain('www.example.com', 'example.com')
+    assert match_domain('www.example.com', '*.example.com')
+    assert not match_domain('example.com', '*.example.com')
+    assert match_domain('example.com', '.example.com')
+    assert match_domain('a.b.Example.com', '.example.com')
+    assert not match_domain('badexample.com', '.example.com')
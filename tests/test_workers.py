@@ -0,0 +1,102 @@
+import os
+import signal
+import socket
+import sys
+import time
+import types
+from collections.abc import Iterator
+from contextlib import contextmanager
+from ipaddress import IPv4Network
+from unittest.mock import patch
+
+import pytest
+
+from soxy import ConnectingRule, Proxy, Ruleset, Socks5, TcpTransport
+from soxy._workers import LoopThread, Supervisor
+
+
+@contextmanager
+def _stop_after(seconds: float) -> Iterator[None]:
+    def on_alarm(signum: int, frame: types.FrameType | None) -> None:  # noqa: ARG001
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, handler)
+
+
+def test_supervisor_stops_workers() -> None:
+    supervisor = Supervisor(target=time.sleep, args=(30,), workers=2)
+    started = time.monotonic()
+    with _stop_after(0.5):
+        supervisor.run()
+    assert time.monotonic() - started < 10  # noqa: PLR2004
+    assert supervisor.restarts == 0
+    assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+
+
+def _ignore_sigterm(seconds: float) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(seconds)
+
+
+def test_supervisor_kills_stuck_workers() -> None:
+    supervisor = Supervisor(target=_ignore_sigterm, args=(30,), workers=2, stop_timeout=0.5)
+    started = time.monotonic()
+    with _stop_after(0.5):
+        supervisor.run()
+    assert time.monotonic() - started < 10  # noqa: PLR2004
+
+
+def test_supervisor_restarts_workers() -> None:
+    supervisor = Supervisor(target=sys.exit, args=(3,), workers=1)
+    with patch('soxy._workers._RESTART_DELAY', 0.05), _stop_after(1.0):
+        supervisor.run()
+    assert supervisor.restarts > 1
+
+
+def test_supervisor_invalid_workers() -> None:
+    with pytest.raises(ValueError, match='invalid number of workers'):
+        Supervisor(target=time.sleep, workers=0)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _handshake(port: int) -> bytes:
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(b'\x05\x01\x00')
+        return sock.recv(2)
+
+
+def test_loop_threads() -> None:
+    port = _free_port()
+    ruleset = Ruleset(
+        allow_connecting_rules=[ConnectingRule(from_addresses=IPv4Network('127.0.0.0/8'))],
+        allow_proxying_rules=[],
+    )
+    threads = [
+        LoopThread(Proxy(protocol=Socks5(), transport=TcpTransport(port=port, reuse_port=True), ruleset=ruleset))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(4):
+            assert _handshake(port) == b'\x05\x00'
+        # every connection is checked by the shared ruleset, whichever loop accepted it
+        assert ruleset.rule_hits()['allow_connecting'][0][1] == 4  # noqa: PLR2004
+        # the address is taken, a proxy without SO_REUSEPORT can't listen on it
+        proxy = Proxy(protocol=Socks5(), transport=TcpTransport(port=port), ruleset=ruleset)
+        with pytest.raises(OSError, match='address already in use'):
+            LoopThread(proxy).start()
+    finally:
+        for thread in threads:
+            thread.stop()
@@ -1,4 +1,7 @@
-from ipaddress import IPv4Address
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ipaddress import IPv4Address, IPv6Address
 
 import pytest
 
@@ -43,7 +46,7 @@ async def test_resolver_wrapper_sync() -> None:
 
     wrapped_resolver = resolver_wrapper(sync_resolver)
     result = await wrapped_resolver('localhost')
-    assert result == IPv4Address('127.0.0.1')
+    assert result == [IPv4Address('127.0.0.1')]
 
 
 @pytest.mark.asyncio
@@ -53,7 +56,7 @@ async def test_resolver_wrapper_async() -> None:
 
     wrapped_resolver = resolver_wrapper(async_resolver)
     result = await wrapped_resolver('localhost')
-    assert result == IPv4Address('127.0.0.1')
+    assert result == [IPv4Address('127.0.0.1')]
 
 
 @pytest.mark.asyncio
@@ -65,3 +68,89 @@ async def test_resolver_wrapper_exception() -> None:
     wrapped_resolver = resolver_wrapper(sync_resolver)
     result = await wrapped_resolver('localhost')
     assert result is None
+
+
+@pytest.mark.asyncio
+async def test_resolver_wrapper_multiple_addresses() -> None:
+    def sync_resolver(name: str) -> list[IPv4Address | IPv6Address]:
+        return [IPv6Address('::1'), IPv4Address('127.0.0.1')]
+
+    wrapped_resolver = resolver_wrapper(sync_resolver)
+    result = await wrapped_resolver('localhost')
+    assert result == [IPv6Address('::1'), IPv4Address('127.0.0.1')]
+
+
+@pytest.mark.asyncio
+async def test_resolver_wrapper_empty() -> None:
+    def sync_resolver(name: str) -> list[IPv4Address]:
+        return []
+
+    wrapped_resolver = resolver_wrapper(sync_resolver)
+    result = await wrapped_resolver('localhost')
+    assert result is None
+
+
+@pytest.mark.asyncio
+async def test_resolver_wrapper_coalesces_lookups() -> None:
+    calls: list[str] = []
+    release = asyncio.Event()
+
+    async def async_resolver(name: str) -> IPv4Address:
+        calls.append(name)
+        await release.wait()
+        return IPv4Address('127.0.0.1')
+
+    wrapped_resolver = resolver_wrapper(async_resolver)
+    lookups = [asyncio.create_task(wrapped_resolver(name)) for name in ('a.com', 'A.com.', 'b.com')]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*lookups)
+    assert results == [[IPv4Address('127.0.0.1')]] * 3
+    assert sorted(calls) == ['a.com', 'b.com']
+    await wrapped_resolver('a.com')
+    assert calls.count('a.com') == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_resolver_wrapper_cancelled_waiter() -> None:
+    release = asyncio.Event()
+
+    async def async_resolver(name: str) -> IPv4Address:
+        await release.wait()
+        return IPv4Address('127.0.0.1')
+
+    wrapped_resolver = resolver_wrapper(async_resolver)
+    first = asyncio.create_task(wrapped_resolver('a.com'))
+    second = asyncio.create_task(wrapped_resolver('a.com'))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == [IPv4Address('127.0.0.1')]
+
+
+@pytest.mark.asyncio
+async def test_resolver_wrapper_event_loops() -> None:
+    release = threading.Event()
+
+    async def async_resolver(name: str) -> IPv4Address:
+        await asyncio.to_thread(release.wait)
+        return IPv4Address('127.0.0.1')
+
+    wrapped_resolver = resolver_wrapper(async_resolver)
+    pending = asyncio.create_task(wrapped_resolver('a.com'))
+    await asyncio.sleep(0)
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    # the loop of another thread makes its own call instead of waiting for a task of this loop
+    assert await asyncio.to_thread(asyncio.run, wrapped_resolver('a.com')) == [IPv4Address('127.0.0.1')]
+    assert await pending == [IPv4Address('127.0.0.1')]
+
+
+@pytest.mark.asyncio
+async def test_auther_wrapper_executor() -> None:
+    def sync_auther(username: str, password: str) -> bool:
+        return threading.current_thread() is not threading.main_thread() and password == 'secret'  # noqa: S105
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        wrapped_auther = auther_wrapper(sync_auther, executor)
+        assert await wrapped_auther('alice', 'secret') is True
+        assert await wrapped_auther('alice', password='wrong') is False  # noqa: S106